@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+_parse_data 清洗阶段微基准：逐行 apply（旧实现） vs 向量化（core.pipeline.parse_data）
+
+用法:
+    python benchmarks/bench_parse.py [行数] [重复次数]
+"""
+
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from core.pipeline import parse_data  # noqa: E402
+
+PREFIXES = ["", "△", "☆", "▲", "*", "# "]
+SERIALS = ["", "一、", "（二）", "3.", "十一、"]
+
+
+def make_statement(rows: int, seed: int = 0) -> pd.DataFrame:
+    """生成左右两栏、共约 rows 行的合成资产负债表 DataFrame（与 get_data 输出的列名一致）"""
+    rng = np.random.default_rng(seed)
+    half = rows // 2
+
+    def block(n, side):
+        names = [
+            f"{PREFIXES[i % len(PREFIXES)]}{SERIALS[i % len(SERIALS)]}{side}项目 {i}"
+            for i in range(n)
+        ]
+        amounts = np.round(rng.uniform(-1e6, 1e6, n), 2)
+        amounts[::13] = np.nan
+        return names, amounts
+
+    left_names, left_amounts = block(half, "资产")
+    right_names, right_amounts = block(half, "负债")
+    return pd.DataFrame({
+        "项目": left_names,
+        "期末余额": left_amounts,
+        "项目.1": right_names,
+        "期末余额.1": right_amounts,
+    })
+
+
+def legacy_parse_data(pdfunit: tuple) -> pd.Series:
+    """基线：重构前 MainWindow._parse_data 的实现"""
+    df, flag = pdfunit
+    colName = '期末余额' if flag == 'OFP' else '本期金额'
+    df1 = df.loc[:, ["项目", colName]]
+    df2 = df.loc[:, ["项目.1", f"{colName}.1"]]
+    df2.columns = df1.columns
+    df = pd.concat([df1, df2], axis=0).reset_index(drop=True)
+    df = df.dropna(subset=[colName])
+    df = df[df['项目'].apply(lambda x: isinstance(x, str))]
+    df = df[~df['项目'].str.strip().isin(["0", ""])]
+    df.loc[:, '项目'] = df['项目'].apply(lambda x: re.sub(r'^[△☆▲*# ]', '', x.strip()))
+    df.loc[:, '项目'] = df['项目'].apply(lambda x: re.sub(r'^[一二三四五六七八九十]+、|^（[一二三四五六七八九十]+）|^\d+\.', '', x.strip()).strip())
+    df.loc[:, '项目'] = df['项目'].str.replace(' ', '', regex=False)
+    return df.set_index('项目')[colName]
+
+
+def bench(func, df, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func((df, "OFP"))
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    df = make_statement(rows)
+
+    old_time, old = bench(legacy_parse_data, df, repeat)
+    new_time, new = bench(parse_data, df, repeat)
+
+    # 两种实现的结果必须一致
+    assert old.index.tolist() == new.index.tolist()
+    assert np.allclose(old.to_numpy(dtype=float), new.to_numpy())
+
+    print(f"行数: {rows:,}  (取 {repeat} 次最优)")
+    print(f"旧实现 apply : {old_time * 1000:8.1f} ms  {rows / old_time:12,.0f} 行/秒")
+    print(f"向量化实现   : {new_time * 1000:8.1f} ms  {rows / new_time:12,.0f} 行/秒")
+    print(f"加速比       : {old_time / new_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+流程分阶段基准：合成 OFP/PROFIT/FLOW 报表与模板，分别统计各阶段耗时与峰值内存
+
+阶段：
+    read     get_data 读取三张报表（识别版式，只解码需要的列）
+    parse    parse_data 清洗
+    merge    合并为 项目 -> 金额
+    plan     编译模板填充计划（不使用缓存）
+    write    openpyxl 加载模板、写入、保存
+    patch    xlsx 补丁方式写入
+
+用法:
+    python benchmarks/bench_pipeline.py                       # 1k / 10k / 100k 行，xlsx 与 xls
+    python benchmarks/bench_pipeline.py --rows 1000 10000 --formats xlsx --json result.json
+不依赖 Qt，可在无界面环境运行；生成 .xls 需要安装 xlwt
+"""
+
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.generators import FLAGS, generate_dataset  # noqa: E402
+from core import pipeline  # noqa: E402
+from core import files as core_files  # noqa: E402
+from core.template import YEAR_COLUMNS, compile_plan, load_plan  # noqa: E402
+from core.reader import select_engine  # noqa: E402
+
+
+def measure(func, *args, memory=True):
+    """
+    返回 (结果, 耗时秒, Python 峰值内存字节)
+    tracemalloc 会明显拖慢执行，因此计时与内存分两次执行
+    """
+    gc.collect()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    if not memory:
+        return result, elapsed, None
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def run_case(files: dict, out_dir: Path, rows: int, ext: str, memory=True) -> dict:
+    stages = {}
+
+    def record(name, func, *args):
+        result, elapsed, peak = measure(func, *args, memory=memory)
+        stages[name] = {
+            "seconds": round(elapsed, 4),
+            "peak_mb": round(peak / 1024 / 1024, 2) if peak is not None else None,
+        }
+        return result
+
+    frames = record("read", lambda: {f: pipeline.get_data(files[f], f) for f in FLAGS})
+    series = record("parse", lambda: {f: pipeline.parse_data((frames[f], f)) for f in FLAGS})
+    data = record("merge", lambda: dict(series["OFP"]) | dict(series["PROFIT"]) | dict(series["FLOW"]))
+    plan = record("plan", compile_plan, files["TMP"], YEAR_COLUMNS)
+    # 写入阶段使用已编译的计划，不重复计入编译耗时
+    load_plan(files["TMP"], YEAR_COLUMNS)
+    record("write", pipeline.write_data, data, files["TMP"], out_dir / f"out_{rows}_{ext}.xlsx", "2024")
+    record("patch", pipeline.write_data, data, files["TMP"], out_dir / f"patch_{rows}_{ext}.xlsx", "2024", "patch")
+
+    matched = sum(1 for item in plan.rows if item in data)
+    return {
+        "rows": rows,
+        "format": ext,
+        "engine": select_engine(files["OFP"]),
+        "items": len(data),
+        "template_items": len(plan.rows),
+        "matched": matched,
+        "stages": stages,
+    }
+
+
+def print_case(case: dict):
+    print(f"\n{case['rows']:,} 行 .{case['format']}  (读取引擎 {case['engine']}, "
+          f"解析 {case['items']:,} 项, 模板 {case['template_items']:,} 项, 匹配 {case['matched']:,})")
+    print(f"  {'阶段':<8}{'耗时(s)':>10}{'峰值内存(MB)':>14}")
+    for name, stat in case["stages"].items():
+        peak = "-" if stat["peak_mb"] is None else f"{stat['peak_mb']:.1f}"
+        print(f"  {name:<8}{stat['seconds']:>10.3f}{peak:>14}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="QuickFinance 流程分阶段基准")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--formats", nargs="+", default=["xlsx", "xls"], choices=["xlsx", "xls"])
+    parser.add_argument("--data-dir", default=None, help="合成数据目录，默认使用临时目录；指定后可复用")
+    parser.add_argument("--json", default=None, help="将结果写入 JSON 文件")
+    parser.add_argument("--no-memory", action="store_true", help="只计时，不统计峰值内存（更快）")
+    parser.add_argument("--engine", default=None, help="指定读取引擎（calamine / xlrd / openpyxl / pandas）")
+    args = parser.parse_args()
+    if args.engine:
+        os.environ["QUICKFINANCE_READER"] = args.engine
+
+    if "xls" in args.formats and importlib.util.find_spec("xlwt") is None:
+        print("未安装 xlwt，跳过 .xls")
+        args.formats = [f for f in args.formats if f != "xls"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(args.data_dir) if args.data_dir else Path(tmp) / "data"
+        out_dir = Path(tmp) / "out"
+        out_dir.mkdir()
+        # 使用独立的缓存目录，避免复用之前运行留下的填充计划
+        core_files.CACHE_ROOT = Path(tmp) / "cache"
+        cases = []
+        for rows in args.rows:
+            for ext in args.formats:
+                files = generate_dataset(data_dir, rows, ext)
+                case = run_case(files, out_dir, rows, ext, memory=not args.no_memory)
+                print_case(case)
+                cases.append(case)
+
+    if args.json:
+        report = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cases": cases,
+        }
+        Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\n结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+启动耗时基准：
+  1. python -X importtime 统计 import main 的导入耗时，列出最慢的模块，
+     并检查 pandas / openpyxl 没有在窗口出现前被导入
+  2. 多次冷启动 main.py，记录窗口首帧绘制耗时（QUICKFINANCE_STARTUP_PROBE=1）
+
+用法:
+    python benchmarks/bench_startup.py [--runs 5] [--top 15] [--max-ms 3000]
+无显示环境下可设置 QT_QPA_PLATFORM=offscreen
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# 这些库只应在点击生成（或首帧之后的预热）时导入
+LAZY_MODULES = ("pandas", "openpyxl", "core.pipeline")
+
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def child_env(**extra):
+    """子进程在临时目录中运行（main 会在当前目录创建 config.yaml），通过 PYTHONPATH 找到项目模块"""
+    env = os.environ.copy()
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(PROJECT_ROOT), env.get("PYTHONPATH")]))
+    env.update(extra)
+    return env
+
+
+def import_report(top: int, workdir: str):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=workdir, capture_output=True, text=True, env=child_env(),
+    )
+    if result.returncode != 0:
+        print(result.stderr)
+        raise SystemExit("import main 失败")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        m = _IMPORTTIME_RE.match(line)
+        if m:
+            self_us, cumulative_us, indent, name = m.groups()
+            entries.append((int(cumulative_us), int(self_us), len(indent) // 2, name))
+
+    total = next((c for c, _, _, name in entries if name == "main"), 0)
+    print(f"import main 总耗时: {total / 1000:.1f} ms")
+    print(f"\n累计耗时最长的 {top} 个直接/间接导入:")
+    print(f"{'累计(ms)':>10} {'自身(ms)':>10}  模块")
+    for cumulative, self_us, _, name in sorted(entries, reverse=True)[1:top + 1]:
+        print(f"{cumulative / 1000:10.1f} {self_us / 1000:10.1f}  {name}")
+
+    imported = {name for _, _, _, name in entries}
+    eager = [m for m in LAZY_MODULES if m in imported]
+    if eager:
+        print(f"\n⚠️ 以下模块在窗口出现前就被导入: {', '.join(eager)}")
+    else:
+        print(f"\n✅ {', '.join(LAZY_MODULES)} 均为延迟导入")
+    return total / 1000, eager
+
+
+def first_paint(runs: int, workdir: str):
+    env = child_env(QUICKFINANCE_STARTUP_PROBE="1")
+    wall, inproc = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, str(PROJECT_ROOT / "main.py")], cwd=workdir,
+            capture_output=True, text=True, env=env, timeout=120,
+        )
+        elapsed = (time.perf_counter() - start) * 1000
+        m = re.search(r"first-paint-ms:\s*([\d.]+)", result.stdout)
+        if not m:
+            print(result.stdout, result.stderr)
+            raise SystemExit("未能获取首帧时间")
+        wall.append(elapsed)
+        inproc.append(float(m.group(1)))
+    print(f"\n首帧绘制（{runs} 次）:")
+    print(f"  进程内(自 main.py 开始执行): 中位数 {statistics.median(inproc):.1f} ms, 最小 {min(inproc):.1f} ms")
+    print(f"  进程启动到退出:             中位数 {statistics.median(wall):.1f} ms, 最小 {min(wall):.1f} ms")
+    return statistics.median(inproc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="QuickFinance 启动耗时基准")
+    parser.add_argument("--runs", type=int, default=5, help="冷启动次数")
+    parser.add_argument("--top", type=int, default=15, help="列出最慢的导入个数")
+    parser.add_argument("--max-ms", type=float, default=None, help="首帧中位数超过该值时返回非 0")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="quickfinance-bench-") as workdir:
+        _, eager = import_report(args.top, workdir)
+        paint_ms = first_paint(args.runs, workdir)
+
+    failed = bool(eager)
+    if args.max_ms is not None and paint_ms > args.max_ms:
+        print(f"\n❌ 首帧耗时 {paint_ms:.1f} ms 超过上限 {args.max_ms:.0f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+合成数据生成：与真实导出一致的左右两栏报表（项目 / 项目.1），以及对应的模板
+
+报表布局：前 3 行为标题，第 4 行为表头
+    项目 | 行次 | 金额列 | 上年金额 | 项目 | 行次 | 金额列 | 上年金额
+rows 为项目总数，左右两栏各占一半
+"""
+
+import random
+from pathlib import Path
+
+import openpyxl
+
+FLAGS = ("OFP", "PROFIT", "FLOW")
+TITLES = {"OFP": "资产负债表", "PROFIT": "利润表", "FLOW": "现金流量表"}
+PREFIXES = ["", "△", "☆", "▲", ""]
+SERIALS = ["", "一、", "（二）", "3.", ""]
+
+
+def amount_header(flag) -> tuple[str, str]:
+    return ("期末余额", "上年年末余额") if flag == "OFP" else ("本期金额", "上期金额")
+
+
+def item_name(flag, side, i) -> str:
+    """模板中使用的规范名称"""
+    return f"{flag}{side}项目{i}"
+
+
+def statement_rows(flag, rows, seed=0):
+    """生成报表的所有行（含标题与表头）"""
+    rng = random.Random(f"{seed}:{flag}")
+    amount, last = amount_header(flag)
+    yield [TITLES[flag]]
+    yield ["编制单位：合成数据有限公司"]
+    yield ["单位：元"]
+    yield ["项目", "行次", amount, last, "项 目", "行次", amount, last]
+    half = (rows + 1) // 2
+    for i in range(half):
+        # 源数据中的名称带前缀符号、序号与空格，检验清洗逻辑
+        left = f"{PREFIXES[i % 5]}{SERIALS[i % 5]}{flag}左 项目{i}"
+        right = f"{PREFIXES[(i + 2) % 5]}{flag}右项目 {i}" if half + i < rows else None
+        row = [left, i + 1, round(rng.uniform(-1e7, 1e7), 2), round(rng.uniform(0, 1e7), 2)]
+        if right is None:
+            row += [None, None, None, None]
+        else:
+            row += [right, half + i + 1, round(rng.uniform(-1e7, 1e7), 2), round(rng.uniform(0, 1e7), 2)]
+        yield row
+
+
+def write_statement(path, flag, rows, seed=0) -> Path:
+    """按扩展名生成 .xlsx（openpyxl 流式写入）或 .xls（需要 xlwt）"""
+    path = Path(path)
+    if path.suffix.lower() == ".xls":
+        import xlwt
+        if (rows + 1) // 2 + 4 > 65536:
+            raise ValueError(".xls 每个工作表最多 65536 行")
+        book = xlwt.Workbook()
+        sheet = book.add_sheet("Sheet1")
+        for r, row in enumerate(statement_rows(flag, rows, seed)):
+            for c, value in enumerate(row):
+                if value is not None:
+                    sheet.write(r, c, value)
+        book.save(str(path))
+    else:
+        book = openpyxl.Workbook(write_only=True)
+        sheet = book.create_sheet("Sheet1")
+        for row in statement_rows(flag, rows, seed):
+            sheet.append(row)
+        book.save(path)
+    return path
+
+
+def write_template(path, rows, sheets=1) -> Path:
+    """
+    生成指标模板：Sheet1 的 B 列为各报表的项目名称（共约 rows 个），
+    第 1 行为年份表头；sheets > 1 时追加若干带数据的其它工作表
+    """
+    path = Path(path)
+    book = openpyxl.Workbook(write_only=True)
+    sheet = book.create_sheet("Sheet1")
+    sheet.append(["序号", "指标", "2022", "2023", "", "2024", "", "2025"])
+    per_flag = max(1, rows // len(FLAGS))
+    n = 0
+    for flag in FLAGS:
+        half = (per_flag + 1) // 2
+        for i in range(per_flag):
+            side, k = ("左", i) if i < half else ("右", i - half)
+            n += 1
+            sheet.append([n, item_name(flag, side, k)])
+    for s in range(1, sheets):
+        other = book.create_sheet(f"Sheet{s + 1}")
+        for r in range(min(rows, 5000)):
+            other.append([r, r * 2.5, f"备注{r}"])
+    book.save(path)
+    return path
+
+
+def generate_dataset(directory, rows, ext="xlsx", template_rows=None, seed=0) -> dict:
+    """
+    在 directory 下生成一组数据，已存在的文件直接复用
+    返回 {"OFP": 路径, "PROFIT": 路径, "FLOW": 路径, "TMP": 模板路径}
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    files = {}
+    for flag in FLAGS:
+        path = directory / f"{flag}_{rows}.{ext}"
+        if not path.exists():
+            write_statement(path, flag, rows, seed)
+        files[flag] = path
+    template_rows = template_rows or rows
+    tmp = directory / f"template_{template_rows}.xlsx"
+    if not tmp.exists():
+        write_template(tmp, template_rows)
+    files["TMP"] = tmp
+    return files
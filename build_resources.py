@@ -2,235 +2,344 @@
 """
 编译Qt资源文件和UI文件的脚本
 支持编译.qrc文件和.ui文件
+
+- resource/ui/*.ui  -> views/Ui_*.py（程序从 views 导入）
+- resource/*.qrc    -> 项目根目录的 *_rc.py（main.py 中 import resource_rc）
+- 按内容哈希增量编译：输入（.qrc 连同其引用的图片等文件）与输出都未变化的跳过，
+  记录保存在 .quickfinance_cache/build_manifest.json；需要编译的文件并行编译
+- 编译工具只在首次或工具文件变化时实际运行检查，结果同样记录在清单中
+- watch 模式轮询输入文件，保存后自动重新编译
 """
 
+import argparse
+import json
 import os
-import sys
+import re
+import shutil
 import subprocess
-import glob
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 
+from core.files import CACHE_ROOT, file_hash
+
+# 清单格式版本，修改编译方式或输出位置时递增，使旧记录失效
+MANIFEST_VERSION = 1
+
+TOOLS = {
+    "pyside6-rcc": "资源文件编译器",
+    "pyside6-uic": "UI文件编译器",
+}
+
+_QRC_FILE_RE = re.compile(r'<file\b[^>]*>([^<]+)</file>')
+
+
+@dataclass
+class BuildTarget:
+    tool: str
+    source: Path
+    output: Path
+    # 除 source 外，内容变化时也需要重新编译的文件（.qrc 中引用的资源）
+    depends: tuple = ()
+
+    @property
+    def inputs(self) -> list[Path]:
+        return [self.source, *self.depends]
+
+
+@lru_cache(maxsize=1)
+def _tool_version() -> str:
+    """PySide6 版本，升级后重新编译所有文件"""
+    try:
+        from importlib.metadata import version
+        return version("PySide6")
+    except Exception:
+        return ""
+
+
 class QtResourceBuilder:
-    def __init__(self):
+    def __init__(self, workers=None):
         self.project_root = Path(__file__).parent
-        print(self.project_root)
         self.resource_dir = self.project_root / "resource"
-        self.views_dir = self.resource_dir / "ui"
-        
+        self.ui_dir = self.resource_dir / "ui"
+        self.views_dir = self.project_root / "views"
+        self.manifest_path = self.project_root / CACHE_ROOT / "build_manifest.json"
+        self.workers = workers or os.cpu_count() or 1
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self) -> dict:
+        try:
+            data = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+            if data.get("version") == MANIFEST_VERSION:
+                return data
+        except (OSError, ValueError):
+            pass
+        return {"version": MANIFEST_VERSION, "tools": {}, "targets": {}}
+
+    def _save_manifest(self):
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_name(f"{self.manifest_path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(self.manifest, ensure_ascii=False, indent=1), encoding="utf-8")
+        tmp.replace(self.manifest_path)
+
+    def _rel(self, path: Path) -> str:
+        try:
+            return path.resolve().relative_to(self.project_root.resolve()).as_posix()
+        except ValueError:
+            return str(path)
+
     def find_qrc_files(self):
         """查找所有的.qrc文件"""
         qrc_files = []
-        
+
         # 查找resource目录下的.qrc文件
         if self.resource_dir.exists():
-            qrc_files.extend(self.resource_dir.glob("*.qrc"))
-        
-        # 查找views目录下的.qrc文件
-        if self.views_dir.exists():
-            qrc_files.extend(self.views_dir.rglob("*.qrc"))
-        
-        return qrc_files
-    
+            qrc_files.extend(self.resource_dir.rglob("*.qrc"))
+
+        return sorted(qrc_files)
+
     def find_ui_files(self):
         """查找所有的.ui文件"""
         ui_files = []
-        
-        # 查找views目录下的.ui文件
-        if self.views_dir.exists():
-            ui_files.extend(self.views_dir.rglob("*.ui"))
-        
-        return ui_files
-    
-    def compile_qrc_file(self, qrc_file):
-        """编译单个.qrc文件"""
-        try:
-            # 生成输出文件名
-            output_file = qrc_file.parent / f"{qrc_file.stem}_rc.py"
-            
-            # 使用pyside6-rcc编译
-            cmd = ["pyside6-rcc", str(qrc_file), "-o", str(output_file)]
-            
-            print(f"编译资源文件: {qrc_file.name} -> {output_file.name}")
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            
-            if result.returncode == 0:
-                print(f"✅ 成功编译: {qrc_file.name}")
-                return True
-            else:
-                print(f"❌ 编译失败: {qrc_file.name}")
-                print(f"错误信息: {result.stderr}")
-                return False
-                
-        except subprocess.CalledProcessError as e:
-            print(f"❌ 编译失败: {qrc_file.name}")
-            print(f"错误信息: {e.stderr}")
+
+        # 查找resource/ui目录下的.ui文件
+        if self.ui_dir.exists():
+            ui_files.extend(self.ui_dir.rglob("*.ui"))
+
+        return sorted(ui_files)
+
+    def qrc_depends(self, qrc_file) -> tuple:
+        """.qrc 中引用的文件（相对 .qrc 所在目录），不存在的文件交给 rcc 报错"""
+        text = qrc_file.read_text(encoding="utf-8")
+        paths = (qrc_file.parent / name.strip() for name in _QRC_FILE_RE.findall(text))
+        return tuple(p for p in paths if p.is_file())
+
+    def targets(self) -> list[BuildTarget]:
+        """所有编译目标：.qrc 输出到项目根目录，.ui 输出到 views/"""
+        targets = [
+            BuildTarget("pyside6-rcc", qrc, self.project_root / f"{qrc.stem}_rc.py", self.qrc_depends(qrc))
+            for qrc in self.find_qrc_files()
+        ]
+        targets += [
+            BuildTarget("pyside6-uic", ui, self.views_dir / f"Ui_{ui.stem}.py")
+            for ui in self.find_ui_files()
+        ]
+        return targets
+
+    def input_hash(self, target: BuildTarget) -> str:
+        parts = [_tool_version(), self._rel(target.output)]
+        parts += [f"{self._rel(p)}:{file_hash(p)}" for p in target.inputs]
+        return "|".join(parts)
+
+    def is_up_to_date(self, target: BuildTarget) -> bool:
+        """输入与上次编译时相同，且输出文件仍是上次生成的内容"""
+        entry = self.manifest["targets"].get(self._rel(target.source))
+        if entry is None or not target.output.exists():
             return False
-        except Exception as e:
-            print(f"❌ 编译异常: {qrc_file.name}")
-            print(f"异常信息: {e}")
+        try:
+            return entry["input"] == self.input_hash(target) and entry["output"] == file_hash(target.output)
+        except (OSError, KeyError):
             return False
-    
-    def compile_ui_file(self, ui_file):
-        """编译单个.ui文件"""
+
+    def compile(self, target: BuildTarget) -> tuple[bool, str]:
+        """编译单个文件：先写入临时文件，成功后再替换输出，返回 (是否成功, 错误信息)"""
+        target.output.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.output.with_name(f"{target.output.name}.{os.getpid()}.tmp")
+        cmd = [target.tool, str(target.source), "-o", str(tmp)]
         try:
-            # 生成输出文件名
-            output_file = ui_file.parent / f"Ui_{ui_file.stem}.py"
-            
-            # 使用pyside6-uic编译
-            cmd = ["pyside6-uic", str(ui_file), "-o", str(output_file)]
-            
-            print(f"编译UI文件: {ui_file.name} -> {output_file.name}")
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            
-            if result.returncode == 0:
-                print(f"✅ 成功编译: {ui_file.name}")
-                return True
-            else:
-                print(f"❌ 编译失败: {ui_file.name}")
-                print(f"错误信息: {result.stderr}")
-                return False
-                
+            subprocess.run(cmd, capture_output=True, text=True, check=True)
+            tmp.replace(target.output)
         except subprocess.CalledProcessError as e:
-            print(f"❌ 编译失败: {ui_file.name}")
-            print(f"错误信息: {e.stderr}")
-            return False
-        except Exception as e:
-            print(f"❌ 编译异常: {ui_file.name}")
-            print(f"异常信息: {e}")
-            return False
-    
-    def check_tools(self):
-        """检查编译工具是否可用"""
-        tools = {
-            "pyside6-rcc": "资源文件编译器",
-            "pyside6-uic": "UI文件编译器"
+            return False, (e.stderr or e.stdout or "").strip()
+        except OSError as e:
+            return False, str(e)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        return True, ""
+
+    def compile_qrc_file(self, qrc_file):
+        """编译单个.qrc文件"""
+        target = BuildTarget("pyside6-rcc", qrc_file, self.project_root / f"{qrc_file.stem}_rc.py",
+                             self.qrc_depends(qrc_file))
+        return self._compile_and_record(target)
+
+    def compile_ui_file(self, ui_file):
+        """编译单个.ui文件"""
+        return self._compile_and_record(BuildTarget("pyside6-uic", ui_file, self.views_dir / f"Ui_{ui_file.stem}.py"))
+
+    def _compile_and_record(self, target: BuildTarget) -> bool:
+        ok, error = self.compile(target)
+        self._report(target, ok, error)
+        if ok:
+            self._record(target)
+            self._save_manifest()
+        return ok
+
+    def _record(self, target: BuildTarget):
+        self.manifest["targets"][self._rel(target.source)] = {
+            "input": self.input_hash(target),
+            "output": file_hash(target.output),
+            "output_path": self._rel(target.output),
         }
-        
+
+    def _report(self, target: BuildTarget, ok: bool, error=""):
+        if ok:
+            print(f"✅ 成功编译: {self._rel(target.source)} -> {self._rel(target.output)}")
+        else:
+            print(f"❌ 编译失败: {self._rel(target.source)}")
+            if error:
+                print(f"错误信息: {error}")
+
+    def check_tools(self, force=False):
+        """
+        检查编译工具是否可用
+        工具路径与修改时间和上次检查时相同时直接使用记录，不再启动工具；force 为 True 时总是实际运行一次
+        """
         missing_tools = []
-        
-        for tool, description in tools.items():
-            try:
-                result = subprocess.run([tool, "--help"], 
-                                      capture_output=True, 
-                                      text=True, 
-                                      timeout=5)
-                if result.returncode == 0:
-                    print(f"✅ {tool} ({description}) - 可用")
-                else:
-                    missing_tools.append(tool)
-                    print(f"❌ {tool} ({description}) - 不可用")
-            except (subprocess.TimeoutExpired, FileNotFoundError):
+        cached = self.manifest["tools"]
+        for tool, description in TOOLS.items():
+            path = shutil.which(tool)
+            if path is None:
                 missing_tools.append(tool)
                 print(f"❌ {tool} ({description}) - 未找到")
-        
+                continue
+            stamp = [path, os.stat(path).st_mtime_ns, _tool_version()]
+            if not force and cached.get(tool) == stamp:
+                continue
+            try:
+                result = subprocess.run([path, "--version"], capture_output=True, text=True, timeout=30)
+                ok = result.returncode == 0
+            except (subprocess.TimeoutExpired, OSError):
+                ok = False
+            if ok:
+                cached[tool] = stamp
+                print(f"✅ {tool} ({description}) - 可用")
+            else:
+                cached.pop(tool, None)
+                missing_tools.append(tool)
+                print(f"❌ {tool} ({description}) - 不可用")
+        self._save_manifest()
         return len(missing_tools) == 0
-    
-    def build_all(self):
-        """编译所有资源文件和UI文件"""
-        print("=" * 50)
-        print("开始编译Qt资源文件和UI文件")
-        print("=" * 50)
-        
-        # 检查工具
+
+    def build_all(self, force=False):
+        """编译有变化的资源文件和UI文件（force 为 True 时全部重新编译），全部成功时返回 True"""
+        targets = self.targets()
+        if not targets:
+            print("未找到.qrc或.ui文件")
+            return True
+        outdated = [t for t in targets if force or not self.is_up_to_date(t)]
+        if not outdated:
+            print(f"✅ {len(targets)} 个文件均为最新，无需编译")
+            return True
+
         if not self.check_tools():
             print("\n❌ 编译工具检查失败，请确保已正确安装PySide6")
             return False
-        
-        print("\n" + "=" * 50)
-        
-        # 编译.qrc文件
-        qrc_files = self.find_qrc_files()
-        if qrc_files:
-            print(f"\n找到 {len(qrc_files)} 个资源文件:")
-            for qrc_file in qrc_files:
-                print(f"  - {qrc_file}")
-            
-            print("\n开始编译资源文件...")
-            qrc_success = 0
-            for qrc_file in qrc_files:
-                if self.compile_qrc_file(qrc_file):
-                    qrc_success += 1
-            
-            print(f"\n资源文件编译结果: {qrc_success}/{len(qrc_files)} 成功")
-        else:
-            print("\n未找到.qrc文件")
-        
-        # 编译.ui文件
-        ui_files = self.find_ui_files()
-        if ui_files:
-            print(f"\n找到 {len(ui_files)} 个UI文件:")
-            for ui_file in ui_files:
-                print(f"  - {ui_file}")
-            
-            print("\n开始编译UI文件...")
-            ui_success = 0
-            for ui_file in ui_files:
-                if self.compile_ui_file(ui_file):
-                    ui_success += 1
-            
-            print(f"\nUI文件编译结果: {ui_success}/{len(ui_files)} 成功")
-        else:
-            print("\n未找到.ui文件")
-        
-        print("\n" + "=" * 50)
-        print("编译完成!")
-        print("=" * 50)
-        
-        return True
-    
+
+        start = time.perf_counter()
+        print(f"编译 {len(outdated)}/{len(targets)} 个文件（并行 {min(self.workers, len(outdated))}）...")
+        success = 0
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(outdated))) as executor:
+            futures = {executor.submit(self.compile, t): t for t in outdated}
+            for future in as_completed(futures):
+                target = futures[future]
+                ok, error = future.result()
+                self._report(target, ok, error)
+                if ok:
+                    self._record(target)
+                    success += 1
+        self._save_manifest()
+        print(f"\n编译结果: {success}/{len(outdated)} 成功，跳过 {len(targets) - len(outdated)} 个未变化的文件"
+              f"（{time.perf_counter() - start:.2f}s）")
+        return success == len(outdated)
+
+    def _snapshot(self) -> dict:
+        """所有输入文件的 (大小, 修改时间)，用于 watch 模式快速判断是否有文件保存过"""
+        snapshot = {}
+        for target in self.targets():
+            for path in target.inputs:
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def watch(self, interval=1.0):
+        """轮询输入文件，有变化时增量编译，按 Ctrl+C 退出"""
+        self.build_all()
+        last = self._snapshot()
+        print(f"\n正在监视 {self._rel(self.resource_dir)}（每 {interval:g}s 检查一次），按 Ctrl+C 退出", flush=True)
+        try:
+            while True:
+                time.sleep(interval)
+                current = self._snapshot()
+                if current == last:
+                    continue
+                # 编辑器可能分几次写入，等文件稳定后再编译
+                time.sleep(min(interval, 0.3))
+                current = self._snapshot()
+                print(f"\n[{time.strftime('%H:%M:%S')}] 检测到文件变化", flush=True)
+                self.build_all()
+                last = current
+        except KeyboardInterrupt:
+            print("已停止监视")
+
     def clean_generated_files(self):
-        """清理生成的文件"""
+        """清理生成的文件（只删除编译目标的输出与清单）"""
         print("清理生成的文件...")
-        
-        # 清理生成的资源文件
-        for pattern in ["*_rc.py", "Ui_*.py"]:
-            for file_path in self.project_root.rglob(pattern):
-                if file_path.is_file():
-                    try:
-                        file_path.unlink()
-                        print(f"删除: {file_path}")
-                    except Exception as e:
-                        print(f"删除失败 {file_path}: {e}")
-        
+
+        outputs = {t.output for t in self.targets()}
+        outputs |= {self.project_root / e["output_path"] for e in self.manifest["targets"].values()
+                    if "output_path" in e}
+        for file_path in sorted(outputs):
+            if file_path.is_file():
+                try:
+                    file_path.unlink()
+                    print(f"删除: {self._rel(file_path)}")
+                except Exception as e:
+                    print(f"删除失败 {file_path}: {e}")
+        self.manifest["targets"] = {}
+        self._save_manifest()
+
         print("清理完成!")
 
-def main():
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="build_resources.py", description="Qt资源文件编译脚本",
+        epilog="示例: python build_resources.py build | build --force | watch | clean | check",
+    )
+    parser.add_argument("command", nargs="?", default="build", choices=["build", "watch", "clean", "check", "help"],
+                        help="build 增量编译（默认）; watch 监视并自动编译; clean 清理生成的文件; check 检查编译工具")
+    parser.add_argument("--force", action="store_true", help="忽略编译记录，全部重新编译")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="并行编译数，默认为 CPU 核数")
+    parser.add_argument("--interval", type=float, default=1.0, help="watch 模式的轮询间隔（秒）")
+    return parser
+
+
+def main(argv=None):
     """主函数"""
-    builder = QtResourceBuilder()
-    
-    if len(sys.argv) > 1:
-        command = sys.argv[1].lower()
-        
-        if command == "clean":
-            builder.clean_generated_files()
-        elif command == "check":
-            builder.check_tools()
-        elif command == "help":
-            print("""
-Qt资源文件编译脚本
-
-用法:
-    python build_resources.py [命令]
-
-命令:
-    build     - 编译所有资源文件和UI文件 (默认)
-    clean     - 清理生成的文件
-    check     - 检查编译工具是否可用
-    help      - 显示帮助信息
-
-示例:
-    python build_resources.py build
-    python build_resources.py clean
-    python build_resources.py check
-            """)
-        else:
-            print(f"未知命令: {command}")
-            print("使用 'python build_resources.py help' 查看帮助")
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    builder = QtResourceBuilder(args.workers)
+
+    if args.command == "clean":
+        builder.clean_generated_files()
+    elif args.command == "check":
+        return 0 if builder.check_tools(force=True) else 1
+    elif args.command == "help":
+        parser.print_help()
+    elif args.command == "watch":
+        builder.watch(args.interval)
     else:
-        # 默认执行编译
-        builder.build_all()
+        return 0 if builder.build_all(force=args.force) else 1
+    return 0
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+QuickFinance 命令行入口，无需打开窗口即可批量生成
+
+用法:
+    python cli.py batch jobs.csv -j 8
+    python cli.py watch jobs.csv --interval 5
+    python cli.py watch --folders folders.yaml
+    python cli.py consolidate entities.csv --template 模板.xlsx --year 2024 --output 合并.xlsx
+    python cli.py fanout targets.yaml --ofp OFP.xlsx --profit PROFIT.xlsx --flow FLOW.xlsx --year 2024
+    python cli.py ledger gl_01.csv gl_02.csv --mapping accounts.csv --template 模板.xlsx --year 2024 --output out.xlsx
+    python cli.py store list|trend|fill ...
+    python cli.py serve --port 8765 -j 2
+    python cli.py cache info|clear
+"""
+
+import argparse
+import sys
+import time
+
+
+def job_options(args) -> dict:
+    """batch / watch 共用的生成参数"""
+    options = {"writer": args.writer, "use_cache": not args.no_cache}
+    if args.columns:
+        from core.pipeline import parse_year_columns
+        options["year_columns"] = parse_year_columns(args.columns)
+    if args.aliases:
+        from core.matching import load_aliases
+        options["aliases"] = load_aliases(args.aliases)
+    if args.formulas:
+        options["formulas"] = True
+    if getattr(args, "store", None):
+        # 传路径而不是连接，各工作进程分别打开
+        options["store"] = args.store
+    return options
+
+
+def format_result(result) -> str:
+    mark = "✅" if result.ok else "❌"
+    files = ", ".join(f"{k} {v:.2f}s" for k, v in result.timings.items())
+    return f"{mark} {result.job.output} ({result.elapsed:.2f}s{'; ' + files if files else ''})"
+
+
+def cmd_batch(args):
+    from core.batch import load_manifest, run_batch, summarize, write_unmatched_report
+    from core.metrics import append_jsonl
+
+    jobs = load_manifest(args.manifest)
+    if not jobs:
+        print("清单中没有任务")
+        return 0
+    print(f"读取到 {len(jobs)} 个任务, 并行进程数: {args.workers or '自动'}")
+
+    done = 0
+
+    def on_result(result):
+        nonlocal done
+        done += 1
+        print(f"[{done}/{len(jobs)}] {format_result(result)}")
+        # 在主进程中追加，避免多个工作进程同时写同一个文件
+        if args.metrics_log and result.metrics:
+            append_jsonl(args.metrics_log, result.metrics)
+
+    start = time.perf_counter()
+    results = run_batch(jobs, workers=args.workers, on_result=on_result, **job_options(args))
+    print("\n" + "=" * 50)
+    print(summarize(results))
+    if args.unmatched_report:
+        count = write_unmatched_report(results, args.unmatched_report)
+        print(f"未匹配的模板项目共 {count} 条，已写入 {args.unmatched_report}")
+    print(f"总耗时: {time.perf_counter() - start:.2f}s")
+    return 0 if all(r.ok for r in results) else 1
+
+
+def cmd_watch(args):
+    import threading
+    from datetime import datetime
+
+    from core.batch import load_manifest
+    from core.metrics import append_jsonl
+    from core.watch import Watcher, load_folders
+
+    if not args.manifest and not args.folders:
+        print("❌ 需要指定任务清单或 --folders 监视目录配置")
+        return 2
+    jobs = load_manifest(args.manifest) if args.manifest else []
+    folders = load_folders(args.folders) if args.folders else []
+    if not jobs and not folders:
+        print("清单中没有任务")
+        return 0
+    lock = threading.Lock()
+
+    def on_result(result):
+        with lock:
+            print(f"[{datetime.now():%H:%M:%S}] {format_result(result)}", flush=True)
+            if not result.ok:
+                print(f"    {result.error}", flush=True)
+            if args.metrics_log and result.metrics:
+                append_jsonl(args.metrics_log, result.metrics)
+
+    watcher = Watcher(jobs, job_options(args), debounce=args.debounce, workers=args.workers,
+                      queue_size=args.queue_size, on_result=on_result, folders=folders)
+    if not args.once:
+        watched = [f"{len(jobs)} 个任务的输入文件"] if jobs else []
+        watched += [f"{rule.directory}（{rule.pattern}）" for rule in folders]
+        print(f"正在监视 {'、'.join(watched)}（每 {args.interval:g}s 检查一次），按 Ctrl+C 退出", flush=True)
+    try:
+        watcher.run(args.interval, once=args.once)
+    except KeyboardInterrupt:
+        print("正在等待当前任务完成...")
+        watcher.shutdown()
+    return 0
+
+
+def cmd_consolidate(args):
+    from core.consolidate import consolidate_to_template, load_entities, write_totals
+    from core.metrics import RunMetrics
+
+    entities = load_entities(args.manifest)
+    if not entities:
+        print("清单中没有单位")
+        return 0
+    print(f"读取到 {len(entities)} 家单位, 并行进程数: {args.workers or '自动'}")
+    done = 0
+
+    def on_entity(name, error):
+        nonlocal done
+        done += 1
+        if error:
+            print(f"[{done}/{len(entities)}] ❌ {name}: {error}")
+        elif done % 100 == 0 or done == len(entities):
+            print(f"[{done}/{len(entities)}] 已读取", flush=True)
+
+    options = job_options(args)
+    metrics = RunMetrics(label=args.output)
+    totals = consolidate_to_template(
+        entities, args.template, args.year, args.output, eliminations=args.eliminations,
+        workers=args.workers, chunk_size=args.chunk_size, on_entity=on_entity, metrics=metrics, **options,
+    )
+    if args.totals:
+        write_totals(totals, args.totals)
+        print(f"合计结果已写入 {args.totals}")
+    if args.metrics_log:
+        metrics.append_jsonl(args.metrics_log)
+    print("\n" + metrics.summary())
+    print(f"✅ 合计 {len(totals)} 个项目，已写入 {args.output}")
+    return 0
+
+
+def cmd_fanout(args):
+    from core.fanout import generate_targets, load_targets
+    from core.metrics import RunMetrics
+
+    targets = load_targets(args.manifest)
+    if not targets:
+        print("清单中没有模板")
+        return 0
+    print(f"读取到 {len(targets)} 个模板, 并行进程数: {args.workers or '自动'}")
+
+    def progress(stage, detail):
+        if stage == "saving":
+            print(f"  已写入 {detail}", flush=True)
+
+    options = job_options(args)
+    metrics = RunMetrics(label=args.manifest)
+    sources = {str(args.year): (args.ofp, args.profit or "", args.flow or "")}
+    outputs = generate_targets(targets, sources, progress=progress, metrics=metrics, workers=args.workers, **options)
+    if args.metrics_log:
+        metrics.append_jsonl(args.metrics_log)
+    print("\n" + metrics.summary())
+    print(f"✅ 已生成 {len(outputs)} 个文件")
+    return 0
+
+
+def cmd_ledger(args):
+    from core import pipeline
+    from core.ledger import UNMAPPED_SAMPLE, load_ledgers, write_totals
+    from core.metrics import RunMetrics
+
+    options = job_options(args)
+    metrics = RunMetrics(label=args.output)
+    columns = {k: getattr(args, f"{k}_column") for k in ("account", "amount", "debit", "credit")
+               if getattr(args, f"{k}_column")}
+    data, unmapped = load_ledgers([args.manifest, *args.more], args.mapping, args.chunk_size,
+                                  options["use_cache"], metrics, **columns)
+    if unmapped:
+        sample = "、".join(unmapped[:UNMAPPED_SAMPLE])
+        print(f"⚠️ {len(unmapped)} 个科目不在映射表中，未计入: {sample}{' 等' if len(unmapped) > UNMAPPED_SAMPLE else ''}")
+    if args.totals:
+        write_totals(data, args.totals)
+        print(f"汇总结果已写入 {args.totals}")
+    pipeline.write_years({str(args.year): data}, args.template, args.output, options["writer"],
+                         year_columns=options.get("year_columns"), metrics=metrics, aliases=options.get("aliases"),
+                         formulas=options.get("formulas", False))
+    metrics.finish()
+    if args.metrics_log:
+        metrics.append_jsonl(args.metrics_log)
+    print("\n" + metrics.summary())
+    print(f"✅ 汇总 {len(data)} 个项目，已写入 {args.output}")
+    return 0
+
+
+def cmd_store(args):
+    from core.store import StatementStore
+
+    store = StatementStore(args.store)
+    if args.action == "list":
+        df = store.statements(args.entity)
+        print(df.to_string(index=False) if not df.empty else "报表库为空")
+    elif args.action == "trend":
+        df = store.trend(args.item or None, [args.entity] if args.entity else None, args.periods)
+        if args.output:
+            df.to_csv(args.output, encoding="utf-8-sig")
+            print(f"已写入 {args.output}")
+        else:
+            print(df.to_string() if not df.empty else "没有符合条件的数据")
+    else:
+        from core import pipeline
+        from core.metrics import RunMetrics
+
+        missing = [f"--{k}" for k in ("entity", "periods", "template", "output") if not getattr(args, k)]
+        if missing:
+            raise ValueError(f"fill 需要参数: {' '.join(missing)}")
+        metrics = RunMetrics(label=args.output)
+        year_columns = pipeline.parse_year_columns(args.columns) if args.columns else None
+        pipeline.generate_from_store(args.template, args.entity, args.periods, args.output, store, args.writer,
+                                     metrics=metrics, year_columns=year_columns, aliases=args.aliases,
+                                     formulas=args.formulas)
+        print(metrics.summary())
+        print(f"✅ 已写入 {args.output}")
+    return 0
+
+
+def cmd_serve(args):
+    import threading
+    from datetime import datetime
+
+    from core.metrics import append_jsonl
+    from core.service import serve
+
+    lock = threading.Lock()
+
+    def ready(server):
+        host, port = server.server_address[:2]
+        print(f"服务已启动: http://{host}:{port}  (并行进程数 {args.workers}，按 Ctrl+C 退出)", flush=True)
+
+    def on_result(job):
+        result = job.result
+        with lock:
+            mark = "✅" if result.ok else "❌"
+            print(f"[{datetime.now():%H:%M:%S}] {mark} {job.id} {job.request['template']} "
+                  f"{job.request['year']} ({result.elapsed:.2f}s)", flush=True)
+            if not result.ok:
+                print(f"    {result.error}", flush=True)
+            if args.metrics_log and result.metrics:
+                append_jsonl(args.metrics_log, result.metrics)
+
+    try:
+        serve(args.host, args.port, args.workers, args.max_pending, ready=ready, on_result=on_result)
+    except KeyboardInterrupt:
+        print("服务已停止")
+    return 0
+
+
+def cmd_cache(args):
+    from core.pipeline import statement_cache
+
+    cache = statement_cache()
+    if args.action == "clear":
+        print(f"已清除 {cache.clear()} 条解析缓存")
+    else:
+        entries = cache.entries()
+        print(f"缓存目录: {cache.root}")
+        print(f"条目数: {len(entries)}, 占用: {cache.size() / 1024 / 1024:.1f} MB / {cache.max_bytes / 1024 / 1024:.0f} MB")
+    return 0
+
+
+def add_job_arguments(p, manifest_help="任务清单 (.csv / .yaml / .json)", optional=False):
+    p.add_argument("manifest", nargs="?" if optional else None, default=None, help=manifest_help)
+    p.add_argument("--writer", choices=["openpyxl", "patch"], default="openpyxl",
+                   help="写入方式: openpyxl 完整加载保存模板; patch 只改写目标工作表 XML")
+    p.add_argument("--no-cache", action="store_true", help="不读写解析缓存，总是重新解析源文件")
+    p.add_argument("--columns", default=None,
+                   help="年份 -> 模板列映射，如 2022=C,2023=D,2024=F,2025=H（默认即为此映射）")
+    p.add_argument("--aliases", default=None,
+                   help="别名表 (.csv 两列 alias,item / .yaml / .json)，将源数据中的别名对应到模板项目")
+    p.add_argument("--formulas", action="store_true",
+                   help="在程序内计算模板中的公式并写入结果，不用 Excel 打开也能读到指标值")
+    p.add_argument("--metrics-log", default=None,
+                   help="将每个任务的分阶段指标（耗时、行数、匹配数、峰值内存）以 JSON 行追加到该文件")
+
+
+def add_store_argument(p):
+    p.add_argument("--store", default=None,
+                   help="报表库 (SQLite) 路径，设置后解析的报表按 单位/期间/报表类型/项目 写入，单位名称取清单的 entity 列或输出文件名")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="quickfinance", description="QuickFinance 命令行工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("batch", help="按任务清单批量填充模板")
+    add_job_arguments(p)
+    add_store_argument(p)
+    p.add_argument("-j", "--workers", type=int, default=None, help="并行进程数，默认为 CPU 核数")
+    p.add_argument("--unmatched-report", default=None,
+                   help="运行结束后将所有任务未匹配的模板项目写入该 CSV 文件")
+    p.set_defaults(func=cmd_batch)
+
+    p = sub.add_parser("watch", help="监视任务清单中的输入文件与监视目录，内容变化或放入新报表时自动生成")
+    add_job_arguments(p, "任务清单 (.csv / .yaml / .json)，只监视目录时可省略", optional=True)
+    p.add_argument("--folders", default=None,
+                   help="监视目录配置 .yaml/.json/.csv（dir,template,output,pattern,year,recursive）")
+    add_store_argument(p)
+    p.add_argument("-j", "--workers", type=int, default=1, help="同时执行的任务数，默认 1")
+    p.add_argument("--interval", type=float, default=2.0, help="轮询间隔（秒）")
+    p.add_argument("--debounce", type=float, default=2.0,
+                   help="文件最后修改后至少经过多少秒才视为写入完成")
+    p.add_argument("--queue-size", type=int, default=64, help="待生成任务队列上限")
+    p.add_argument("--once", action="store_true", help="只检查一次，生成有变化的输出后退出")
+    p.set_defaults(func=cmd_watch)
+
+    p = sub.add_parser("consolidate", help="汇总多家单位的报表（合并报表）并填入模板")
+    add_job_arguments(p)
+    p.add_argument("--template", required=True, help="模板文件")
+    p.add_argument("--year", required=True, help="写入的年份")
+    p.add_argument("--output", required=True, help="输出文件")
+    p.add_argument("--eliminations", default=None, help="抵销分录 .csv（item,amount，金额带符号）")
+    p.add_argument("--totals", default=None, help="将合计结果另存为 CSV（key,item,amount,entities）")
+    p.add_argument("-j", "--workers", type=int, default=None, help="并行进程数，默认为 CPU 核数")
+    p.add_argument("--chunk-size", type=int, default=200, help="每读取多少家单位汇总一次")
+    p.set_defaults(func=cmd_consolidate)
+
+    p = sub.add_parser("fanout", help="报表只读取一次，填入模板清单中的多个模板")
+    add_job_arguments(p)
+    p.add_argument("--ofp", required=True, help="资产负债表")
+    p.add_argument("--profit", default="", help="利润表")
+    p.add_argument("--flow", default="", help="现金流量表")
+    p.add_argument("--year", required=True, help="写入的年份")
+    p.add_argument("-j", "--workers", type=int, default=None, help="同时写入的模板数，默认为 CPU 核数")
+    p.set_defaults(func=cmd_fanout)
+
+    p = sub.add_parser("ledger", help="分块汇总明细账 / 科目余额表，按科目映射填入模板")
+    add_job_arguments(p, "明细账或科目余额表 (.csv / .xlsx)")
+    p.add_argument("more", nargs="*", help="更多明细账文件（如按月导出），金额按项目相加")
+    p.add_argument("--mapping", required=True, help="科目映射表 (.csv 列 account,item[,sign] / .yaml / .json)")
+    p.add_argument("--template", required=True, help="模板文件")
+    p.add_argument("--year", required=True, help="写入的年份")
+    p.add_argument("--output", required=True, help="输出文件")
+    p.add_argument("--totals", default=None, help="将汇总结果另存为 CSV（item,amount）")
+    p.add_argument("--chunk-size", type=int, default=200_000, help="每次读取的行数")
+    p.add_argument("--account-column", default=None, help="科目列表头，默认自动识别")
+    p.add_argument("--amount-column", default=None, help="金额列表头，默认自动识别")
+    p.add_argument("--debit-column", default=None, help="借方列表头（与贷方列一起使用，金额 = 借方 - 贷方）")
+    p.add_argument("--credit-column", default=None, help="贷方列表头")
+    p.set_defaults(func=cmd_ledger)
+
+    p = sub.add_parser("store", help="查询报表库，或直接用报表库中的数据填充模板")
+    p.add_argument("action", choices=["list", "trend", "fill"],
+                   help="list 已保存的报表; trend 多期对比表; fill 按单位与期间填充模板")
+    p.add_argument("--store", default=None, help="报表库路径，默认 .quickfinance_cache/statements.sqlite")
+    p.add_argument("--entity", default=None, help="单位名称")
+    p.add_argument("--periods", nargs="*", default=None, help="期间（年份），可填多个")
+    p.add_argument("--item", action="append", default=None, help="只看这些项目（trend），可重复")
+    p.add_argument("--template", default=None, help="模板文件（fill）")
+    p.add_argument("--output", default=None, help="输出文件（fill 的 xlsx / trend 的 csv）")
+    p.add_argument("--writer", choices=["openpyxl", "patch"], default="openpyxl")
+    p.add_argument("--columns", default=None, help="年份 -> 模板列映射，如 2022=C,2023=D")
+    p.add_argument("--aliases", default=None, help="别名表")
+    p.add_argument("--formulas", action="store_true", help="计算模板中的公式并写入结果（fill）")
+    p.set_defaults(func=cmd_store)
+
+    p = sub.add_parser("serve", help="启动本地生成服务（HTTP），供多人或界面程序提交任务")
+    p.add_argument("--host", default="127.0.0.1", help="监听地址，默认只允许本机访问")
+    p.add_argument("--port", type=int, default=8765, help="监听端口")
+    p.add_argument("-j", "--workers", type=int, default=2, help="并行进程数，默认 2")
+    p.add_argument("--max-pending", type=int, default=32, help="排队任务上限，超过时返回 503")
+    p.add_argument("--metrics-log", default=None, help="将每个任务的分阶段指标以 JSON 行追加到该文件")
+    p.set_defaults(func=cmd_serve)
+
+    p = sub.add_parser("cache", help="管理解析缓存")
+    p.add_argument("action", choices=["info", "clear"])
+    p.set_defaults(func=cmd_cache)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (ValueError, OSError) as e:
+        print(f"❌ {e}")
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,4 @@
+"""
+QuickFinance 无界面数据处理引擎
+读取财务报表 -> 清洗 -> 写入模板，可脱离 Qt 窗口单独调用
+"""
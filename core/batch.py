@@ -0,0 +1,183 @@
+"""
+批量生成：读取任务清单，使用进程池并行填充模板
+"""
+
+import csv
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from core import pipeline
+from core.metrics import RunMetrics
+
+MANIFEST_FIELDS = ("template", "ofp", "profit", "flow", "year", "output", "entity")
+
+
+@dataclass
+class Job:
+    template: str
+    output: str
+    # 年份 -> (资产负债表, 利润表, 现金流量表)，多个年份在一次模板加载/保存中写入
+    years: dict[str, tuple[str, str, str]] = field(default_factory=dict)
+    # 写入报表库时的单位名称，默认为输出文件名
+    entity: str = ""
+
+
+@dataclass
+class JobResult:
+    job: Job
+    ok: bool
+    elapsed: float
+    error: str = ""
+    # 每张报表的读取耗时（秒）
+    timings: dict = field(default_factory=dict)
+    # RunMetrics.to_dict()，各阶段耗时、行数、匹配数与峰值内存
+    metrics: dict = field(default_factory=dict)
+    # 年份 -> 未匹配到数据的模板项目
+    unmatched: dict = field(default_factory=dict)
+
+
+def resolve_path(base: Path, value) -> str:
+    """清单中的相对路径以清单文件所在目录为基准"""
+    if value is None:
+        return ""
+    value = str(value).strip()
+    if value == "" or os.path.isabs(value):
+        return value
+    return str(base / value)
+
+
+def read_rows(path, key) -> list[dict]:
+    """读取清单的所有行：.csv 按表头，.yaml/.json 为列表或 {key: [...]}"""
+    path = Path(path)
+    if path.suffix.lower() == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            return list(csv.DictReader(f))
+    from omegaconf import OmegaConf
+    cfg = OmegaConf.to_container(OmegaConf.load(path))
+    return cfg.get(key, []) if isinstance(cfg, dict) else cfg
+
+
+def _sources(base: Path, entry: dict, where: str) -> tuple[str, str, str]:
+    if not entry.get("ofp"):
+        raise ValueError(f"{where}缺少字段: ofp")
+    return (resolve_path(base, entry["ofp"]), resolve_path(base, entry.get("profit")),
+            resolve_path(base, entry.get("flow")))
+
+
+def load_manifest(path) -> list[Job]:
+    """
+    读取任务清单，支持 .csv（表头为 template,ofp,profit,flow,year,output，可选 entity）
+    以及 .yaml/.yml/.json（任务列表，或 {jobs: [...]}）
+
+    template 与 output 相同的多行合并为一个多年份任务；
+    yaml/json 中也可以写成 {template, output, years: {年份: {ofp, profit, flow}}}
+    """
+    path = Path(path)
+    base = path.parent
+    rows = read_rows(path, "jobs")
+
+    jobs: dict[tuple, Job] = {}
+    for i, row in enumerate(rows, start=1):
+        where = f"清单第 {i} 条任务"
+        missing = [k for k in ("template", "output") if not row.get(k)]
+        if not row.get("years") and not row.get("year"):
+            missing.append("year")
+        if missing:
+            raise ValueError(f"{where}缺少字段: {', '.join(missing)}")
+        template = resolve_path(base, row["template"])
+        output = resolve_path(base, row["output"])
+        entity = str(row.get("entity") or "").strip() or Path(output).stem
+        job = jobs.setdefault((template, output), Job(template, output, entity=entity))
+
+        if row.get("years"):
+            entries = {str(y).strip(): e for y, e in row["years"].items()}
+        else:
+            entries = {str(row["year"]).strip(): row}
+        for year, entry in entries.items():
+            if year in job.years:
+                raise ValueError(f"{where}: {output} 的 {year} 年数据重复")
+            job.years[year] = _sources(base, entry, where)
+    return list(jobs.values())
+
+
+def run_job(job: Job, options: dict | None = None) -> JobResult:
+    """
+    在工作进程中执行单个任务，异常转为失败结果而不是向上抛出
+    options: 透传给 pipeline.generate_years 的参数（writer / use_cache / year_columns 等）
+    """
+    start = time.perf_counter()
+    metrics = RunMetrics(label=job.output)
+    try:
+        output_dir = os.path.dirname(job.output)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        pipeline.generate_years(job.template, job.years, job.output, metrics=metrics, entity=job.entity,
+                                **(options or {}))
+        return JobResult(job, True, time.perf_counter() - start,
+                         timings=metrics.file_timings(), metrics=metrics.to_dict(), unmatched=metrics.unmatched)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        if os.environ.get("QUICKFINANCE_DEBUG"):
+            error += "\n" + traceback.format_exc()
+        metrics.finish()
+        record = metrics.to_dict()
+        record["error"] = error
+        return JobResult(job, False, time.perf_counter() - start, error, metrics.file_timings(), record)
+
+
+def run_batch(jobs: list[Job], workers: int | None = None, on_result=None, **options) -> list[JobResult]:
+    """
+    并行执行所有任务，返回顺序与 jobs 一致
+    on_result: 每完成一个任务回调一次，用于打印进度
+    options: 透传给 pipeline.generate_years 的参数
+    """
+    workers = workers or os.cpu_count() or 1
+    # 多进程批量时任务之间已经并行，单个任务内不再开子进程解码报表
+    options.setdefault("parallel", workers == 1)
+    results: list[JobResult | None] = [None] * len(jobs)
+    if workers == 1:
+        for i, job in enumerate(jobs):
+            results[i] = run_job(job, options)
+            if on_result:
+                on_result(results[i])
+        return results
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs) or 1)) as executor:
+        futures = {executor.submit(run_job, job, options): i for i, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                # 工作进程异常退出等情况
+                results[i] = JobResult(jobs[i], False, 0.0, f"{type(e).__name__}: {e}")
+            if on_result:
+                on_result(results[i])
+    return results
+
+
+def write_unmatched_report(results: list[JobResult], path) -> int:
+    """将所有任务未匹配的模板项目写入一个 CSV（output,year,item），返回行数"""
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(["output", "year", "item"])
+        for r in results:
+            for year, items in r.unmatched.items():
+                for item in items:
+                    writer.writerow([r.job.output, year, item])
+                    count += 1
+    return count
+
+
+def summarize(results: list[JobResult]) -> str:
+    ok = sum(1 for r in results if r.ok)
+    lines = [f"共 {len(results)} 个任务: 成功 {ok}, 失败 {len(results) - ok}"]
+    for r in results:
+        if not r.ok:
+            lines.append(f"  ❌ {r.job.output}: {r.error}")
+    return "\n".join(lines)
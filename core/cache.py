@@ -0,0 +1,98 @@
+"""
+解析结果缓存：按 源文件内容哈希 + 解析器版本 缓存清洗后的 项目 -> 金额 Series
+
+以 .npz（项目名称数组 + float64 金额数组）存放在磁盘上，
+总大小超过上限时按最近使用时间淘汰（LRU，以文件修改时间记录最近一次命中）
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from core.files import CACHE_ROOT, file_hash
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class StatementCache:
+    def __init__(self, version, root=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.version = str(version)
+        self.root = Path(root) if root else CACHE_ROOT / "parsed"
+        self.max_bytes = max_bytes
+
+    def key(self, path, flag) -> str:
+        payload = f"{file_hash(path)}:{flag}:{self.version}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _file(self, key) -> Path:
+        return self.root / f"{key}.npz"
+
+    def get(self, path, flag) -> pd.Series | None:
+        cache_file = self._file(self.key(path, flag))
+        try:
+            with np.load(cache_file, allow_pickle=False) as npz:
+                items = npz["items"]
+                amounts = npz["amounts"]
+                name = str(npz["name"])
+        except (OSError, KeyError, ValueError):
+            return None
+        # 记录最近使用时间
+        try:
+            os.utime(cache_file)
+        except OSError:
+            pass
+        return pd.Series(amounts, index=pd.Index(items.astype(object), name="项目"), name=name)
+
+    def put(self, path, flag, series: pd.Series):
+        self.root.mkdir(parents=True, exist_ok=True)
+        key = self.key(path, flag)
+        tmp = self.root / f"{key}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp,
+            items=np.asarray(series.index.astype(str), dtype=str),
+            amounts=series.to_numpy(dtype="float64"),
+            name=np.asarray(str(series.name)),
+        )
+        os.replace(tmp, self._file(key))
+        self.evict()
+
+    def entries(self) -> list[os.DirEntry]:
+        if not self.root.exists():
+            return []
+        return [e for e in os.scandir(self.root) if e.name.endswith(".npz") and ".tmp" not in e.name]
+
+    def size(self) -> int:
+        return sum(e.stat().st_size for e in self.entries())
+
+    def evict(self):
+        """超过容量上限时删除最久未使用的条目"""
+        entries = []
+        for e in self.entries():
+            try:
+                st = e.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, e.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self) -> int:
+        """清空缓存，返回删除的条目数"""
+        removed = 0
+        for e in self.entries():
+            try:
+                os.unlink(e.path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
@@ -0,0 +1,76 @@
+"""
+生成服务（core.service）的客户端，只依赖标准库，界面程序作为瘦客户端时不需要导入 pandas
+"""
+
+import json
+import os
+import time
+import urllib.error
+import urllib.request
+
+
+class ServiceError(Exception):
+    """服务返回错误或无法连接"""
+
+
+class ServiceClient:
+    def __init__(self, url="http://127.0.0.1:8765", timeout=10.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, method, path, payload=None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(self.url + path, data=data, method=method,
+                                         headers={"Content-Type": "application/json"} if data else {})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.headers.get_content_type(), response.read()
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error") or e.reason
+            except ValueError:
+                message = e.reason
+            raise ServiceError(f"生成服务返回 {e.code}: {message}") from None
+        except OSError as e:
+            raise ServiceError(f"无法连接生成服务 {self.url}: {e}") from None
+
+    def _json(self, method, path, payload=None) -> dict:
+        return json.loads(self._request(method, path, payload)[1])
+
+    def health(self) -> dict:
+        return self._json("GET", "/health")
+
+    def submit(self, **request) -> dict:
+        """提交任务，参数见 core.service；返回 {id, status, deduplicated}"""
+        return self._json("POST", "/jobs", request)
+
+    def status(self, job_id) -> dict:
+        return self._json("GET", f"/jobs/{job_id}")
+
+    def download(self, job_id, path):
+        """下载生成结果并写入 path（先写临时文件再替换，避免留下不完整的文件）"""
+        _, body = self._request("GET", f"/jobs/{job_id}/result")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(body)
+        os.replace(tmp, path)
+        return path
+
+    def wait(self, job_id, interval=0.5, on_status=None, cancelled=None) -> dict:
+        """
+        轮询直到任务结束，返回最终状态
+        on_status: 状态变化时回调 on_status(状态)
+        cancelled: 返回 True 时停止等待（服务端任务可能仍在执行，其它客户端仍可复用结果）
+        """
+        last = None
+        while True:
+            info = self.status(job_id)
+            if info["status"] != last:
+                last = info["status"]
+                if on_status:
+                    on_status(last)
+            if last in ("done", "failed"):
+                return info
+            if cancelled and cancelled():
+                return info
+            time.sleep(interval)
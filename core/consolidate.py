@@ -0,0 +1,203 @@
+"""
+合并报表：汇总多家子公司的报表，按规范化项目键求和，再扣除抵销分录，结果按原有方式填入模板
+
+- 每家单位内部：资产负债表、利润表、现金流量表按规范化键合并，同一项目以后出现的报表为准
+  （与单家生成时 dict(o) | dict(p) | dict(f) 的优先级一致）；
+- 单位之间：按规范化键求和（groupby），同时记录每个项目由几家单位贡献；
+- 单位分批读取，每批汇总后并入累计结果，内存只与批大小和项目数有关，与单位数量无关；
+- 抵销分录（item,amount）按规范化键加到合计上，金额带符号
+
+单位清单 .csv 表头为 entity,ofp,profit,flow（.yaml/.json 为 {entities: [...]}），相对路径以清单所在目录为基准
+"""
+
+import csv
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+
+import pandas as pd
+
+from core import pipeline
+from core.batch import read_rows, resolve_path
+from core.matching import alias_keys, match_key
+from core.metrics import stage
+
+
+@dataclass
+class Entity:
+    name: str
+    ofp: str
+    profit: str = ""
+    flow: str = ""
+
+
+def load_entities(path) -> list[Entity]:
+    path = Path(path)
+    entities = []
+    names = set()
+    for i, row in enumerate(read_rows(path, "entities"), start=1):
+        if not row.get("ofp"):
+            raise ValueError(f"单位清单第 {i} 行缺少字段: ofp")
+        name = str(row.get("entity") or "").strip() or f"#{i}"
+        if name in names:
+            raise ValueError(f"单位清单第 {i} 行: 单位 {name} 重复")
+        names.add(name)
+        entities.append(Entity(name, resolve_path(path.parent, row["ofp"]),
+                               resolve_path(path.parent, row.get("profit")),
+                               resolve_path(path.parent, row.get("flow"))))
+    return entities
+
+
+def load_eliminations(path) -> pd.DataFrame:
+    """读取抵销分录 .csv（表头至少包含 item,amount），返回列为 item, amount 的 DataFrame"""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        rows = list(csv.DictReader(f))
+    if rows and not {"item", "amount"} <= rows[0].keys():
+        raise ValueError(f"抵销分录 {path} 需要 item,amount 两列")
+    df = pd.DataFrame(rows, columns=["item", "amount"])
+    df["amount"] = pipeline.to_amount(df["amount"].astype(object))
+    bad = df[df["amount"].isna()]
+    if not bad.empty:
+        raise ValueError(f"抵销分录 {path} 中的金额无法识别: {', '.join(map(str, bad['item'].head(5)))}")
+    return df
+
+
+def item_keys(names: pd.Index, aliases: dict) -> pd.Index:
+    """项目名称 -> 规范化键（再按别名映射）"""
+    keys = names.map(match_key)
+    if aliases:
+        keys = keys.map(lambda k: aliases.get(k, k))
+    return keys
+
+
+def entity_amounts(entity: Entity, aliases: dict | None = None, use_cache=True) -> pd.DataFrame:
+    """
+    读取一家单位的报表，返回以规范化键为索引、列为 name（原项目名称）与 amount 的 DataFrame
+    aliases: alias_keys() 的结果
+    """
+    sources = pipeline.statement_sources(entity.ofp, entity.profit, entity.flow)
+    series = [pipeline.load_statement(path, flag, use_cache) for flag, path in sources.items()]
+    # 按 OFP, PROFIT, FLOW 的顺序拼接，同键保留最后一个
+    order = {"OFP": 0, "PROFIT": 1, "FLOW": 2}
+    series = [s for _, s in sorted(zip(sources, series), key=lambda x: order[x[0]])]
+    combined = pd.concat(series) if series else pd.Series(dtype="float64")
+    keys = item_keys(combined.index, aliases or {})
+    frame = pd.DataFrame({"name": combined.index.to_numpy(dtype=object), "amount": combined.to_numpy()},
+                         index=keys)
+    frame = frame[frame.index.notna()]
+    return frame[~frame.index.duplicated(keep="last")]
+
+
+def _fold(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    把多家单位（或多批次的累计结果）按键汇总
+    frames 中的 entities 列为已汇总的单位数，单家单位的结果没有该列时按 1 计
+    """
+    stacked = pd.concat(frames)
+    if "entities" not in stacked:
+        stacked["entities"] = 1
+    stacked["entities"] = stacked["entities"].fillna(1).astype("int64")
+    return stacked.groupby(level=0, sort=False).agg(
+        name=("name", "first"), amount=("amount", "sum"), entities=("entities", "sum"),
+    )
+
+
+def _entity_task(entity, aliases, use_cache):
+    try:
+        return entity.name, entity_amounts(entity, aliases, use_cache), ""
+    except Exception as e:
+        return entity.name, None, f"{type(e).__name__}: {e}"
+
+
+def _iter_amounts(entities, aliases, use_cache, workers):
+    """依次产出 (单位, 结果, 错误)；多进程时同时在途的任务不超过 workers * 2，避免结果堆积"""
+    if workers == 1:
+        for entity in entities:
+            yield _entity_task(entity, aliases, use_cache)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        todo = iter(entities)
+        while True:
+            for entity in todo:
+                pending.add(executor.submit(_entity_task, entity, aliases, use_cache))
+                if len(pending) >= workers * 2:
+                    break
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def consolidate(entities: list[Entity], eliminations=None, aliases=None, workers=None, chunk_size=200,
+                use_cache=True, on_entity=None, metrics=None) -> pd.DataFrame:
+    """
+    汇总所有单位，返回以规范化键为索引、列为 name, amount, entities 的 DataFrame
+    eliminations: load_eliminations() 的结果或其文件路径
+    aliases: {别名: 项目名称} 或别名表文件路径
+    on_entity: 每读完一家单位回调 on_entity(单位, 错误)
+    任一单位读取失败时，全部读完后抛出 ValueError 列出所有失败的单位
+    """
+    workers = workers or min(os.cpu_count() or 1, len(entities)) or 1
+    keys = alias_keys(pipeline.resolve_aliases(aliases))
+    totals = None
+    chunk: list[pd.DataFrame] = []
+    errors = []
+
+    with stage(metrics, "consolidate", entities=len(entities)) as st:
+        for name, frame, error in _iter_amounts(entities, keys, use_cache, workers):
+            if error:
+                errors.append(f"{name}: {error}")
+            else:
+                chunk.append(frame)
+            if on_entity:
+                on_entity(name, error)
+            if len(chunk) >= chunk_size:
+                totals = _fold([totals, _fold(chunk)] if totals is not None else [_fold(chunk)])
+                chunk = []
+        if chunk:
+            totals = _fold([totals, _fold(chunk)] if totals is not None else [_fold(chunk)])
+        if errors:
+            raise ValueError(f"{len(errors)} 家单位读取失败:\n" + "\n".join(errors))
+        if totals is None:
+            totals = pd.DataFrame(columns=["name", "amount", "entities"])
+        st["rows"] = len(totals)
+
+    if eliminations is not None:
+        with stage(metrics, "eliminate") as st:
+            if not isinstance(eliminations, pd.DataFrame):
+                eliminations = load_eliminations(eliminations)
+            entries = pd.DataFrame(
+                {"name": eliminations["item"].to_numpy(dtype=object),
+                 "amount": eliminations["amount"].to_numpy(), "entities": 0},
+                index=item_keys(pd.Index(eliminations["item"]), keys),
+            )
+            totals = _fold([totals, entries[entries.index.notna()]])
+            st["rows"] = len(entries)
+    return totals
+
+
+def totals_data(totals: pd.DataFrame) -> dict:
+    """合计结果转为 {项目名称: 金额}，供模板填充（模板按规范化键匹配）"""
+    return dict(zip(totals["name"], totals["amount"]))
+
+
+def write_totals(totals: pd.DataFrame, path):
+    """合计结果写入 CSV：key,item,amount,entities"""
+    out = totals.rename(columns={"name": "item"})
+    out.index.name = "key"
+    out.to_csv(path, encoding="utf-8-sig")
+
+
+def consolidate_to_template(entities, template_path, year, output_path, eliminations=None, writer="openpyxl",
+                            use_cache=True, year_columns=None, aliases=None, workers=None, chunk_size=200,
+                            on_entity=None, metrics=None, formulas=False) -> pd.DataFrame:
+    """汇总所有单位并把合计填入模板，返回合计结果"""
+    totals = consolidate(entities, eliminations, aliases, workers, chunk_size, use_cache, on_entity, metrics)
+    pipeline.write_years({str(year): totals_data(totals)}, template_path, output_path, writer,
+                         year_columns=year_columns, metrics=metrics, aliases=aliases, formulas=formulas)
+    if metrics is not None:
+        metrics.finish()
+    return totals
@@ -0,0 +1,139 @@
+"""
+一次读取、填充多个模板：同一家单位的报表只读取、清洗一次，再分别写入多个模板
+（如指标表、银行契约表、税务汇总表），每个模板可以有自己的工作表、项目列与年份列
+
+模板清单 .csv 表头为 template,output,sheet,item_column,columns（columns 形如 2023=D,2024=F），
+.yaml/.json 为 {targets: [{template, output, sheet, item_column, columns: {2024: F}}]}；
+sheet / item_column / columns 可省略，分别默认 Sheet1 / B / 运行参数中的年份列
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+
+from core import pipeline
+from core.batch import read_rows, resolve_path
+from core.metrics import RunMetrics
+from core.shared import attach, release, share
+
+
+@dataclass
+class Target:
+    template: str
+    output: str
+    sheet: str = "Sheet1"
+    item_column: str = "B"
+    # 年份 -> 列字母，None 时使用运行参数中的 year_columns
+    year_columns: dict | None = None
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.output)
+
+
+def load_targets(path) -> list[Target]:
+    path = Path(path)
+    targets = []
+    outputs = set()
+    for i, row in enumerate(read_rows(path, "targets"), start=1):
+        missing = [k for k in ("template", "output") if not row.get(k)]
+        if missing:
+            raise ValueError(f"模板清单第 {i} 行缺少字段: {', '.join(missing)}")
+        output = resolve_path(path.parent, row["output"])
+        if output in outputs:
+            raise ValueError(f"模板清单第 {i} 行: 输出 {output} 重复")
+        outputs.add(output)
+        columns = row.get("columns") or None
+        if isinstance(columns, str):
+            columns = pipeline.parse_year_columns(columns)
+        elif columns:
+            columns = {str(y): str(c).strip().upper() for y, c in columns.items()}
+        targets.append(Target(resolve_path(path.parent, row["template"]), output,
+                              str(row.get("sheet") or "Sheet1"), str(row.get("item_column") or "B"), columns))
+    return targets
+
+
+def _write_target(target: Target, data_by_year: dict, writer, year_columns, aliases, formulas=False):
+    """写入单个模板，返回 (各阶段记录, 匹配数, 未匹配项目)；可在工作进程中执行"""
+    metrics = RunMetrics(label=target.output)
+    output_dir = os.path.dirname(target.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    pipeline.write_years(data_by_year, target.template, target.output, writer,
+                         year_columns=target.year_columns or year_columns, metrics=metrics, aliases=aliases,
+                         sheet=target.sheet, item_column=target.item_column, formulas=formulas)
+    for record in metrics.stages:
+        record["target"] = target.name
+    return metrics.stages, metrics.counts, metrics.unmatched
+
+
+def _write_task(target, data_by_year, writer, year_columns, aliases, formulas=False):
+    """data_by_year 为字符串时是 core.shared 的共享文件路径（工作进程中映射读取，不复制）"""
+    try:
+        if isinstance(data_by_year, str):
+            with attach(data_by_year) as data:
+                return _write_target(target, data.mappings(), writer, year_columns, aliases, formulas), ""
+        return _write_target(target, data_by_year, writer, year_columns, aliases, formulas), ""
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def generate_targets(targets: list[Target], sources: dict, writer="openpyxl", use_cache=True, progress=None,
+                     parallel=True, metrics=None, year_columns=None, aliases=None, workers=None,
+                     formulas=False) -> list[str]:
+    """
+    sources: {年份: (资产负债表, 利润表, 现金流量表)}，所有年份只读取、清洗一次
+    之后各模板在进程池中同时写入（单核或 parallel 为 False 时依次写入），返回输出文件列表；
+    多进程时清洗结果经 core.shared 的内存映射文件交给各工作进程
+    formulas: 为 True 时计算各模板中的公式并写入结果
+    任一模板写入失败时，其余模板照常写入，最后抛出 ValueError 列出所有失败的模板
+    """
+    data_by_year = {}
+    for year, (ofp, profit, flow) in sources.items():
+        info = {"year": str(year)} if len(sources) > 1 else {}
+        data_by_year[str(year)] = pipeline.process_data(ofp, profit, flow, use_cache, progress, parallel,
+                                                        metrics, **info)
+    # 别名表只读取一次，传给各模板的是映射本身
+    aliases = pipeline.resolve_aliases(aliases)
+    workers = workers or min(os.cpu_count() or 1, len(targets)) or 1
+    results = {}
+
+    if not parallel or workers == 1 or len(targets) == 1:
+        for target in targets:
+            pipeline._report(progress, "writing", target.name)
+            results[target.output] = _write_task(target, data_by_year, writer, year_columns, aliases, formulas)
+    else:
+        # 各年份数据只写入一次共享文件，工作进程映射同一文件，不再为每个模板 pickle 一份
+        shared = share(data_by_year)
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {}
+                for target in targets:
+                    pipeline._report(progress, "writing", target.name)
+                    futures[executor.submit(_write_task, target, shared, writer, year_columns, aliases,
+                                            formulas)] = target
+                for future in as_completed(futures):
+                    results[futures[future].output] = future.result()
+        finally:
+            release(shared)
+
+    errors = []
+    for target in targets:
+        result, error = results[target.output]
+        if error:
+            errors.append(f"{target.name}: {error}")
+            continue
+        pipeline._report(progress, "saving", target.name)
+        if metrics is not None:
+            records, counts, unmatched = result
+            metrics.extend(records)
+            for key, value in counts.items():
+                metrics.count(key, value)
+            for year, items in unmatched.items():
+                metrics.unmatched[f"{target.name}/{year}"] = items
+    if metrics is not None:
+        metrics.finish()
+    if errors:
+        raise ValueError(f"{len(errors)} 个模板写入失败:\n" + "\n".join(errors))
+    return [target.output for target in targets]
@@ -0,0 +1,33 @@
+"""
+文件哈希与缓存目录
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+# 缓存根目录，可通过环境变量 QUICKFINANCE_CACHE 修改
+CACHE_ROOT = Path(os.environ.get("QUICKFINANCE_CACHE", ".quickfinance_cache"))
+
+# (路径, 大小, 修改时间) -> 内容哈希，同一进程内文件未变化时不再重复计算
+_digest_memo: dict[tuple, str] = {}
+
+
+def file_hash(path) -> str:
+    """文件内容的 sha256"""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    digest = _digest_memo.get(key)
+    if digest is None:
+        with open(path, "rb") as f:
+            digest = hashlib.file_digest(f, "sha256").hexdigest()
+        _digest_memo[key] = digest
+    return digest
+
+
+def cache_dir(*parts) -> Path:
+    """返回（并创建）缓存子目录"""
+    path = CACHE_ROOT.joinpath(*parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
@@ -0,0 +1,697 @@
+"""
+模板公式计算：在进程内计算指标模板中的公式，并把结果作为缓存值写入输出文件
+
+openpyxl 保存的文件只有公式没有结果，pandas / openpyxl(data_only=True) 读取时
+公式单元格都是空值，必须先用 Excel 打开重算一次。这里按模板（内容哈希）解析一次
+全部公式，建立单元格依赖图并缓存在内存与磁盘中：
+
+    graph = load_graph("tmpl.xlsx")
+    graph.recalc({("Sheet1", 2, 3): 1200.0})      # 只重算受影响的下游公式单元格
+    set_cached_values("out.xlsx", graph.cached_values())
+
+支持四则运算、乘方、百分号、& 连接、比较，以及 FUNCTIONS 中列出的函数；
+含有其它函数、名称、数组公式、循环引用的单元格（以及依赖它们的单元格）不计算，
+保持没有缓存值，由 Excel 打开时计算
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+from dataclasses import dataclass
+from decimal import ROUND_DOWN, ROUND_HALF_UP, ROUND_UP, Decimal
+
+from core.files import cache_dir, file_hash
+
+# 依赖图格式版本，修改解析/计算逻辑时递增以使旧缓存失效
+FORMULA_VERSION = 1
+
+_graphs: dict[str, dict] = {}
+
+
+@dataclass(frozen=True)
+class CellError:
+    """公式的错误值，如 #DIV/0!"""
+    code: str
+
+    def __str__(self):
+        return self.code
+
+
+DIV0 = CellError("#DIV/0!")
+VALUE = CellError("#VALUE!")
+NUM = CellError("#NUM!")
+REF = CellError("#REF!")
+
+
+class Unsupported(Exception):
+    """公式中含有无法在进程内计算的内容"""
+
+
+class _Range(list):
+    """区域引用展开后的值（按行优先）"""
+
+
+# ---------------------------------------------------------------- 解析
+
+# 二元运算符优先级（与 Excel 相同，均为左结合；负号优先于乘方：-2^2 = 4）
+BINARY = {"=": 1, "<>": 1, "<": 1, ">": 1, "<=": 1, ">=": 1, "&": 2, "+": 3, "-": 3, "*": 4, "/": 4, "^": 5}
+
+_PART = r"\$?[A-Za-z]{1,3}\$?\d+|\$?[A-Za-z]{1,3}|\$?\d+"
+_REF_RE = re.compile(
+    rf"^(?:(?P<sheet>'(?:[^']|'')+'|[^!:'\[\]]+)!)?(?P<a>{_PART})(?::(?P<b>{_PART}))?$"
+)
+_PART_RE = re.compile(r"^\$?([A-Za-z]{0,3})\$?(\d*)$")
+
+
+def _split_part(part: str) -> tuple[int | None, int | None]:
+    """"$C$2" -> (2, 3)；整列 "C" -> (None, 3)；整行 "2" -> (2, None)"""
+    from openpyxl.utils import column_index_from_string
+
+    letters, digits = _PART_RE.match(part).groups()
+    return (int(digits) if digits else None), (column_index_from_string(letters.upper()) if letters else None)
+
+
+class _Parser:
+    """把 openpyxl Tokenizer 的记号解析为可 JSON 序列化的语法树（嵌套列表）"""
+
+    def __init__(self, formula: str, sheet: str, bounds: dict):
+        from openpyxl.formula import Tokenizer
+        from openpyxl.formula.tokenizer import Token
+
+        self.Token = Token
+        self.sheet = sheet
+        # 工作表名称 -> (最大行, 最大列)，用于展开整行/整列引用
+        self.bounds = bounds
+        self.tokens = [t for t in Tokenizer(formula).items if t.type != Token.WSPACE]
+        self.i = 0
+
+    def _peek(self):
+        return self.tokens[self.i] if self.i < len(self.tokens) else None
+
+    def _next(self):
+        token = self._peek()
+        if token is None:
+            raise Unsupported("公式不完整")
+        self.i += 1
+        return token
+
+    def parse(self):
+        node = self._expr(0)
+        if self._peek() is not None:
+            raise Unsupported(f"无法解析: {self._peek().value}")
+        return node
+
+    def _expr(self, min_prec):
+        left = self._unary()
+        while True:
+            token = self._peek()
+            if token is None or token.type != self.Token.OP_IN:
+                return left
+            prec = BINARY.get(token.value)
+            if prec is None:
+                raise Unsupported(f"不支持的运算符: {token.value}")
+            if prec < min_prec:
+                return left
+            self.i += 1
+            left = ["bin", token.value, left, self._expr(prec + 1)]
+
+    def _unary(self):
+        token = self._peek()
+        if token is not None and token.type == self.Token.OP_PRE:
+            self.i += 1
+            operand = self._unary()
+            return ["neg", operand] if token.value == "-" else operand
+        node = self._primary()
+        while (token := self._peek()) is not None and token.type == self.Token.OP_POST:
+            self.i += 1
+            node = ["pct", node]
+        return node
+
+    def _primary(self):
+        Token = self.Token
+        token = self._next()
+        if token.type == Token.OPERAND:
+            if token.subtype == Token.NUMBER:
+                return ["num", float(token.value)]
+            if token.subtype == Token.TEXT:
+                return ["str", token.value[1:-1].replace('""', '"')]
+            if token.subtype == Token.LOGICAL:
+                return ["bool", token.value.upper() == "TRUE"]
+            if token.subtype == Token.ERROR:
+                return ["err", token.value]
+            return self._reference(token.value)
+        if token.type == Token.FUNC and token.subtype == Token.OPEN:
+            name = token.value[:-1].upper().removeprefix("_XLFN.")
+            if name not in FUNCTIONS:
+                raise Unsupported(f"不支持的函数: {name}")
+            args = []
+            if self._peek() is not None and self._peek().type == Token.FUNC and self._peek().subtype == Token.CLOSE:
+                self.i += 1
+                return ["fn", name, args]
+            while True:
+                args.append(self._expr(0))
+                token = self._next()
+                if token.type == Token.SEP and token.subtype == Token.ARG:
+                    continue
+                if token.type == Token.FUNC and token.subtype == Token.CLOSE:
+                    return ["fn", name, args]
+                raise Unsupported(f"无法解析: {token.value}")
+        if token.type == Token.PAREN and token.subtype == Token.OPEN:
+            node = self._expr(0)
+            token = self._next()
+            if token.type != Token.PAREN or token.subtype != Token.CLOSE:
+                raise Unsupported("括号不匹配")
+            return node
+        raise Unsupported(f"无法解析: {token.value}")
+
+    def _reference(self, text: str):
+        m = _REF_RE.match(text)
+        if m is None:
+            # 名称、外部引用等
+            raise Unsupported(f"不支持的引用: {text}")
+        sheet = m.group("sheet")
+        if sheet is None:
+            sheet = self.sheet
+        elif sheet.startswith("'"):
+            sheet = sheet[1:-1].replace("''", "'")
+        if sheet not in self.bounds:
+            return ["err", REF.code]
+        max_row, max_col = self.bounds[sheet]
+        r1, c1 = _split_part(m.group("a"))
+        if m.group("b") is None:
+            if r1 is None or c1 is None:
+                raise Unsupported(f"不支持的引用: {text}")
+            return ["ref", sheet, r1, c1]
+        r2, c2 = _split_part(m.group("b"))
+        if (r1 is None) != (r2 is None) or (c1 is None) != (c2 is None):
+            raise Unsupported(f"不支持的引用: {text}")
+        # 整列 / 整行引用只展开到工作表已使用的范围
+        r1, r2 = (1, max_row) if r1 is None else (min(r1, r2), max(r1, r2))
+        c1, c2 = (1, max_col) if c1 is None else (min(c1, c2), max(c1, c2))
+        return ["range", sheet, r1, c1, r2, c2]
+
+
+def parse_formula(formula: str, sheet: str, bounds: dict):
+    """解析 "=..." 公式，返回语法树；无法在进程内计算时抛出 Unsupported"""
+    return _Parser(formula, sheet, bounds).parse()
+
+
+def precedents(node) -> set:
+    """语法树直接引用的单元格 {(工作表, 行, 列)}"""
+    cells = set()
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        kind = node[0]
+        if kind == "ref":
+            cells.add((node[1], node[2], node[3]))
+        elif kind == "range":
+            _, sheet, r1, c1, r2, c2 = node
+            cells.update((sheet, r, c) for r in range(r1, r2 + 1) for c in range(c1, c2 + 1))
+        elif kind in ("neg", "pct"):
+            stack.append(node[1])
+        elif kind == "bin":
+            stack.extend(node[2:])
+        elif kind == "fn":
+            stack.extend(node[2])
+    return cells
+
+
+# ---------------------------------------------------------------- 计算
+
+def _number(value):
+    """算术运算中的取值：空单元格为 0，数字文本按数字处理"""
+    if value is None:
+        return 0.0
+    if isinstance(value, (bool, int, float)):
+        return float(value)
+    if isinstance(value, CellError):
+        return value
+    if isinstance(value, str):
+        try:
+            return float(value.replace(",", ""))
+        except ValueError:
+            return VALUE
+    return VALUE
+
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else f"{value:.15g}"
+    return str(value)
+
+
+def _bool(value):
+    if value is None:
+        return False
+    if isinstance(value, (bool, CellError)):
+        return value
+    if isinstance(value, (int, float)):
+        return value != 0
+    if isinstance(value, str) and value.upper() in ("TRUE", "FALSE"):
+        return value.upper() == "TRUE"
+    return VALUE
+
+
+def _first_error(*values):
+    return next((v for v in values if isinstance(v, CellError)), None)
+
+
+def _compare(op, a, b) -> bool:
+    # 空单元格与另一侧同类型比较；不同类型之间：数字 < 文本 < 逻辑值；文本不区分大小写
+    if a is None:
+        a = "" if isinstance(b, str) else False if isinstance(b, bool) else 0.0
+    if b is None:
+        b = "" if isinstance(a, str) else False if isinstance(a, bool) else 0.0
+
+    def rank(v):
+        return 2 if isinstance(v, bool) else 1 if isinstance(v, str) else 0
+
+    if rank(a) != rank(b):
+        a, b = rank(a), rank(b)
+    elif isinstance(a, str):
+        a, b = a.lower(), b.lower()
+    else:
+        a, b = float(a), float(b)
+    return {"=": a == b, "<>": a != b, "<": a < b, ">": a > b, "<=": a <= b, ">=": a >= b}[op]
+
+
+def _binary(op, a, b):
+    if isinstance(a, _Range) or isinstance(b, _Range):
+        return VALUE
+    if op in ("=", "<>", "<", ">", "<=", ">="):
+        return _first_error(a, b) or _compare(op, a, b)
+    if op == "&":
+        return _first_error(a, b) or _text(a) + _text(b)
+    a, b = _number(a), _number(b)
+    error = _first_error(a, b)
+    if error:
+        return error
+    if op == "+":
+        return a + b
+    if op == "-":
+        return a - b
+    if op == "*":
+        return a * b
+    if op == "/":
+        return DIV0 if b == 0 else a / b
+    # ^
+    if a == 0 and b < 0:
+        return DIV0
+    if a < 0 and not b.is_integer():
+        return NUM
+    return float(a ** b)
+
+
+def _numbers(args, strict=True) -> list | CellError:
+    """聚合函数的参数：区域中只取数字，直接给出的参数按数字转换（strict 为 False 时跳过非数字）"""
+    values = []
+    for arg in args:
+        if isinstance(arg, _Range):
+            for v in arg:
+                if isinstance(v, CellError):
+                    return v
+                if isinstance(v, (int, float)) and not isinstance(v, bool):
+                    values.append(float(v))
+            continue
+        v = _number(arg)
+        if isinstance(v, CellError):
+            if strict or isinstance(arg, CellError):
+                return v
+            continue
+        values.append(v)
+    return values
+
+
+def _aggregate(fn, empty=0.0, strict=True):
+    def call(*args):
+        values = _numbers(args, strict)
+        if isinstance(values, CellError):
+            return values
+        return fn(values) if values else empty
+    return call
+
+
+def _round(mode):
+    def call(value, digits=0.0):
+        value, digits = _number(value), _number(digits)
+        error = _first_error(value, digits)
+        if error:
+            return error
+        # 按十进制舍入，避免 2.675 之类的二进制误差；ROUND 为四舍五入（远离零）
+        exp = Decimal(1).scaleb(-int(digits))
+        return float(Decimal(repr(value)).quantize(exp, rounding=mode))
+    return call
+
+
+def _scalar(fn):
+    """单个数字参数的函数"""
+    def call(value):
+        value = _number(value)
+        return value if isinstance(value, CellError) else fn(value)
+    return call
+
+
+def _if(condition, when_true=True, when_false=False):
+    condition = _bool(condition)
+    if isinstance(condition, CellError):
+        return condition
+    return when_true if condition else when_false
+
+
+def _iferror(value, fallback):
+    return fallback if isinstance(value, CellError) else value
+
+
+def _logical(fn):
+    def call(*args):
+        values = []
+        for arg in args:
+            for v in (arg if isinstance(arg, _Range) else [arg]):
+                if isinstance(arg, _Range) and (v is None or isinstance(v, str)):
+                    continue
+                v = _bool(v)
+                if isinstance(v, CellError):
+                    return v
+                values.append(v)
+        return fn(values) if values else VALUE
+    return call
+
+
+def _not(value):
+    value = _bool(value)
+    return value if isinstance(value, CellError) else not value
+
+
+def _mod(a, b):
+    a, b = _number(a), _number(b)
+    error = _first_error(a, b)
+    if error:
+        return error
+    return DIV0 if b == 0 else a - b * math.floor(a / b)
+
+
+def _power(a, b):
+    return _binary("^", a, b)
+
+
+def _sqrt(value):
+    value = _number(value)
+    if isinstance(value, CellError):
+        return value
+    return NUM if value < 0 else math.sqrt(value)
+
+
+def _count(*args):
+    total = 0
+    for arg in args:
+        for v in (arg if isinstance(arg, _Range) else [arg]):
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                total += 1
+    return float(total)
+
+
+def _counta(*args):
+    return float(sum(1 for arg in args for v in (arg if isinstance(arg, _Range) else [arg]) if v is not None))
+
+
+FUNCTIONS = {
+    "SUM": _aggregate(sum),
+    "AVERAGE": _aggregate(lambda v: sum(v) / len(v), empty=DIV0),
+    "MIN": _aggregate(min),
+    "MAX": _aggregate(max),
+    "COUNT": _count,
+    "COUNTA": _counta,
+    "ABS": _scalar(abs),
+    "INT": _scalar(lambda v: float(math.floor(v))),
+    "SQRT": _sqrt,
+    "POWER": _power,
+    "MOD": _mod,
+    "ROUND": _round(ROUND_HALF_UP),
+    "ROUNDUP": _round(ROUND_UP),
+    "ROUNDDOWN": _round(ROUND_DOWN),
+    "IF": _if,
+    "IFERROR": _iferror,
+    "AND": _logical(all),
+    "OR": _logical(any),
+    "NOT": _not,
+}
+
+
+def evaluate(node, get):
+    """计算语法树，get(工作表, 行, 列) 返回单元格当前值（空单元格为 None）"""
+    kind = node[0]
+    if kind in ("num", "str", "bool"):
+        return node[1]
+    if kind == "err":
+        return CellError(node[1])
+    if kind == "ref":
+        return get(node[1], node[2], node[3])
+    if kind == "range":
+        _, sheet, r1, c1, r2, c2 = node
+        return _Range(get(sheet, r, c) for r in range(r1, r2 + 1) for c in range(c1, c2 + 1))
+    if kind == "neg":
+        value = _number(evaluate(node[1], get))
+        return value if isinstance(value, CellError) else -value
+    if kind == "pct":
+        value = _number(evaluate(node[1], get))
+        return value if isinstance(value, CellError) else value / 100
+    if kind == "bin":
+        return _binary(node[1], evaluate(node[2], get), evaluate(node[3], get))
+    if kind == "fn":
+        args = [evaluate(arg, get) for arg in node[2]]
+        try:
+            return FUNCTIONS[node[1]](*args)
+        except TypeError:
+            # 参数个数不对
+            return VALUE
+    raise Unsupported(f"未知的语法节点: {kind}")
+
+
+# ---------------------------------------------------------------- 依赖图
+
+def _encode(value):
+    if isinstance(value, CellError):
+        return ["e", value.code]
+    return value
+
+
+def _decode(value):
+    if isinstance(value, list):
+        return CellError(value[1])
+    return value
+
+
+def _cell_value(value):
+    """模板中非公式单元格的值，日期等其它类型按文本处理"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return float(value) if isinstance(value, int) and not isinstance(value, bool) else value
+    return str(value)
+
+
+class FormulaGraph:
+    """
+    某个模板中全部公式单元格的依赖图与当前值
+    单元格以 (工作表, 行, 列) 表示
+    """
+
+    def __init__(self, formulas: dict, order: list, values: dict, unsupported: dict):
+        # 公式单元格 -> (语法树, 直接引用的单元格)，不含 unsupported 中的单元格
+        self.formulas = formulas
+        # 公式单元格 -> 拓扑序号（被引用的在前）
+        self.order = {cell: i for i, cell in enumerate(order)}
+        # 被引用的常量单元格与各公式单元格的当前值
+        self.values = values
+        # 不计算的公式单元格 -> 原因
+        self.unsupported = unsupported
+        # 单元格 -> 直接引用它的公式单元格
+        self.dependents: dict[tuple, list] = {}
+        for cell, (_, deps) in formulas.items():
+            for dep in deps:
+                self.dependents.setdefault(dep, []).append(cell)
+        # 被写入常量覆盖的公式单元格，写回公式时恢复
+        self._overridden: dict[tuple, tuple] = {}
+
+    def _get(self, sheet, row, col):
+        return self.values.get((sheet, row, col))
+
+    def _evaluate(self, cell):
+        try:
+            value = evaluate(self.formulas[cell][0], self._get)
+        except (OverflowError, ValueError, ArithmeticError):
+            return NUM
+        if value is None:
+            # 只引用空单元格的公式显示为 0
+            return 0.0
+        if isinstance(value, _Range):
+            return VALUE
+        if isinstance(value, float) and not math.isfinite(value):
+            return NUM
+        return value
+
+    def recalc(self, changes: dict) -> set:
+        """
+        changes: {(工作表, 行, 列): 新值}，只重算受这些单元格影响的公式单元格，返回重算的单元格
+        写入公式单元格的常量会替代该公式；写回以 "=" 开头的原公式时恢复计算
+        """
+        dirty, stack = set(), []
+        for cell, value in changes.items():
+            if isinstance(value, str) and value.startswith("="):
+                if cell in self._overridden:
+                    self.formulas[cell] = self._overridden.pop(cell)
+                    dirty.add(cell)
+                    stack.append(cell)
+                continue
+            if cell in self.formulas:
+                self._overridden[cell] = self.formulas.pop(cell)
+            value = _cell_value(value)
+            old = self.values.get(cell)
+            if type(old) is type(value) and old == value:
+                continue
+            self.values[cell] = value
+            stack.append(cell)
+        while stack:
+            for dependent in self.dependents.get(stack.pop(), ()):
+                if dependent not in dirty and dependent in self.formulas:
+                    dirty.add(dependent)
+                    stack.append(dependent)
+        for cell in sorted(dirty, key=self.order.__getitem__):
+            self.values[cell] = self._evaluate(cell)
+        return dirty
+
+    def cached_values(self) -> dict:
+        """{工作表: {(行, 列): 值}}，全部可计算的公式单元格的当前值"""
+        result: dict[str, dict] = {}
+        for sheet, row, col in self.formulas:
+            result.setdefault(sheet, {})[(row, col)] = self.values[(sheet, row, col)]
+        return result
+
+    def to_dict(self) -> dict:
+        order = sorted(self.formulas, key=self.order.__getitem__)
+        return {
+            "version": FORMULA_VERSION,
+            "formulas": [[list(cell), ast, [list(d) for d in deps]]
+                         for cell in order for ast, deps in [self.formulas[cell]]],
+            "values": [[list(cell), _encode(v)] for cell, v in self.values.items()],
+            "unsupported": [[list(cell), reason] for cell, reason in self.unsupported.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FormulaGraph":
+        formulas, order = {}, []
+        for cell, ast, deps in data["formulas"]:
+            cell = tuple(cell)
+            formulas[cell] = (ast, [tuple(d) for d in deps])
+            order.append(cell)
+        values = {tuple(cell): _decode(v) for cell, v in data["values"]}
+        unsupported = {tuple(cell): reason for cell, reason in data["unsupported"]}
+        return cls(formulas, order, values, unsupported)
+
+
+def build_graph(template_path) -> FormulaGraph:
+    """以只读流式方式扫描模板全部工作表，解析公式、排出计算顺序，并按模板原值计算一遍"""
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(template_path, read_only=True)
+    sources, constants, bounds = {}, {}, {}
+    try:
+        for ws in workbook.worksheets:
+            max_row = max_col = 0
+            for row in ws.iter_rows():
+                for cell in row:
+                    value = getattr(cell, "value", None)
+                    if value is None:
+                        continue
+                    pos = (ws.title, cell.row, cell.column)
+                    max_row, max_col = max(max_row, cell.row), max(max_col, cell.column)
+                    if isinstance(value, str) and value.startswith("=") and len(value) > 1:
+                        sources[pos] = value
+                    elif type(value).__name__ in ("ArrayFormula", "DataTableFormula"):
+                        sources[pos] = None
+                    else:
+                        constants[pos] = _cell_value(value)
+            bounds[ws.title] = (max_row, max_col)
+    finally:
+        workbook.close()
+
+    parsed, unsupported = {}, {}
+    for cell, formula in sources.items():
+        if formula is None:
+            unsupported[cell] = "数组公式"
+            continue
+        try:
+            ast = parse_formula(formula, cell[0], bounds)
+        except Unsupported as e:
+            unsupported[cell] = str(e)
+            continue
+        parsed[cell] = (ast, sorted(precedents(ast)))
+
+    # 拓扑排序（Kahn）：只统计公式之间的依赖；引用了不计算的单元格的公式同样不计算
+    waiting = {cell: sum(1 for d in deps if d in parsed) for cell, (_, deps) in parsed.items()}
+    users: dict[tuple, list] = {}
+    for cell, (_, deps) in parsed.items():
+        for dep in deps:
+            if dep in parsed:
+                users.setdefault(dep, []).append(cell)
+    ready = sorted(cell for cell, n in waiting.items() if n == 0)
+    order = []
+    while ready:
+        cell = ready.pop()
+        order.append(cell)
+        for user in users.get(cell, ()):
+            waiting[user] -= 1
+            if waiting[user] == 0:
+                ready.append(user)
+    for cell in parsed.keys() - set(order):
+        unsupported[cell] = "循环引用"
+    formulas = {}
+    for cell in order:
+        ast, deps = parsed[cell]
+        blocked = next((d for d in deps if d in unsupported), None)
+        if blocked is not None:
+            unsupported[cell] = f"引用了不计算的单元格 {blocked[0]}!R{blocked[1]}C{blocked[2]}"
+            continue
+        formulas[cell] = (ast, deps)
+
+    # 只保留被公式引用的常量单元格
+    referenced = {d for _, deps in formulas.values() for d in deps}
+    values = {cell: v for cell, v in constants.items() if cell in referenced}
+    graph = FormulaGraph(formulas, [c for c in order if c in formulas], values, unsupported)
+    for cell in order:
+        if cell in formulas:
+            graph.values[cell] = graph._evaluate(cell)
+    return graph
+
+
+def load_graph(template_path, use_cache=True) -> FormulaGraph:
+    """
+    获取模板的公式依赖图（已按模板原值计算），按 模板内容哈希 缓存在内存与磁盘中
+    每次返回新的对象，调用方可以随意 recalc
+    """
+    if not use_cache:
+        return build_graph(template_path)
+
+    key = hashlib.sha256(json.dumps([FORMULA_VERSION, file_hash(template_path)]).encode("utf-8")).hexdigest()
+    data = _graphs.get(key)
+    if data is None:
+        graph_file = cache_dir("formulas") / f"{key}.json"
+        if graph_file.exists():
+            try:
+                data = json.loads(graph_file.read_text(encoding="utf-8"))
+                if data.get("version") != FORMULA_VERSION:
+                    data = None
+            except (OSError, ValueError):
+                data = None
+        if data is None:
+            data = build_graph(template_path).to_dict()
+            tmp = graph_file.with_name(f"{key}.{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+            tmp.replace(graph_file)
+        _graphs[key] = data
+    return FormulaGraph.from_dict(data)
@@ -0,0 +1,303 @@
+"""
+明细账 / 科目余额表汇总：分块读取总账导出文件，按科目映射表汇总为 项目 -> 金额
+
+- 支持 .csv（UTF-8 或 GBK）与 .xlsx，每次只读取 chunk_size 行，内存占用与科目数有关，与分录行数无关；
+- 表头在前 20 行中自动查找：科目列（科目编码/科目代码/科目），金额列（金额/期末余额 等）或 借方/贷方 两列；
+- 金额 = 金额列，或 借方 - 贷方；每块先按科目求和再并入累计结果；
+- 科目映射表按最长前缀匹配：映射 1001 时 100101、1001.02 等下级科目都计入同一项目；
+  sign 为 -1 时金额取反（如负债、权益、收入类科目的贷方余额记为正数）
+
+科目映射表 .csv 表头为 account,item[,sign]（表头可省略），.yaml/.json 为 {科目: 项目} 或 {科目: {item, sign}}
+结果与 pipeline.parse_data 的输出相同（以 项目 为索引的 float64 Series），可直接用于模板填充
+"""
+
+import csv
+import hashlib
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import pandas as pd
+
+from core import pipeline
+from core.metrics import stage
+from core.reader import HEADER_SCAN_ROWS, header_name
+
+ACCOUNT_HEADERS = ("科目编码", "科目代码", "会计科目编码", "科目编号", "科目", "会计科目", "account")
+AMOUNT_HEADERS = ("金额", "期末余额", "期末金额", "本期发生额", "余额", "amount")
+DEBIT_HEADERS = ("借方", "借方金额", "借方发生额", "本期借方", "debit")
+CREDIT_HEADERS = ("贷方", "贷方金额", "贷方发生额", "本期贷方", "credit")
+
+DEFAULT_CHUNK_SIZE = 200_000
+# 结果中的金额列名
+AMOUNT_NAME = "金额"
+# 记录的未映射科目样例数
+UNMAPPED_SAMPLE = 20
+
+
+def account_code(value) -> str | None:
+    """科目编码统一为字符串，Excel 中的数字编码 1001.0 -> "1001\""""
+    if value is None:
+        return None
+    if isinstance(value, float):
+        if value != value:
+            return None
+        if value.is_integer():
+            value = int(value)
+    code = str(value).strip()
+    return code or None
+
+
+@dataclass
+class AccountMap:
+    # 科目前缀 -> (项目, 符号)
+    prefixes: dict[str, tuple[str, float]]
+    _resolved: dict = field(default_factory=dict, repr=False)
+
+    def lookup(self, account) -> tuple[str, float] | None:
+        """最长前缀匹配，结果按科目缓存"""
+        if account in self._resolved:
+            return self._resolved[account]
+        found = None
+        for n in range(len(account), 0, -1):
+            found = self.prefixes.get(account[:n])
+            if found is not None:
+                break
+        self._resolved[account] = found
+        return found
+
+    def digest(self) -> str:
+        payload = json.dumps(sorted(self.prefixes.items()), ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _sign(value) -> float:
+    if value in (None, ""):
+        return 1.0
+    sign = float(value)
+    if sign not in (1.0, -1.0):
+        raise ValueError(f"科目映射表中的 sign 只能为 1 或 -1: {value}")
+    return sign
+
+
+def load_account_map(path) -> AccountMap:
+    path = Path(path)
+    prefixes = {}
+    if path.suffix.lower() == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            rows = [r for r in csv.reader(f) if len(r) >= 2 and r[0].strip()]
+        if rows and [c.strip().lower() for c in rows[0][:2]] == ["account", "item"]:
+            rows = rows[1:]
+        for row in rows:
+            prefixes[row[0].strip()] = (row[1].strip(), _sign(row[2].strip() if len(row) > 2 else None))
+    else:
+        from omegaconf import OmegaConf
+        data = OmegaConf.to_container(OmegaConf.load(path))
+        if not isinstance(data, dict):
+            raise ValueError(f"科目映射表格式错误: {path}，应为 科目: 项目 的映射")
+        for account, target in data.items():
+            if isinstance(target, dict):
+                prefixes[account_code(account)] = (str(target["item"]), _sign(target.get("sign")))
+            else:
+                prefixes[account_code(account)] = (str(target), 1.0)
+    return AccountMap(prefixes)
+
+
+def _find(names, candidates, given=None, required=False, what=""):
+    if given:
+        key = header_name(given).lower()
+        if key not in names:
+            raise ValueError(f"明细账中没有{what}列: {given}")
+        return names.index(key)
+    for candidate in candidates:
+        if candidate in names:
+            return names.index(candidate)
+    if required:
+        raise ValueError(f"明细账中找不到{what}列（可接受: {'、'.join(candidates)}）")
+    return None
+
+
+def detect_columns(rows: list[list], account_column=None, amount_column=None, debit_column=None,
+                   credit_column=None) -> tuple[int, dict]:
+    """
+    在前几行中查找表头，返回 (表头行序号, {"account": 列序号, "amount"/"debit"/"credit": 列序号})
+    指定了借方或贷方列，或表头中没有金额列时，按 借方 - 贷方 计算
+    """
+    for i, row in enumerate(rows):
+        names = [header_name(v).lower() for v in row]
+        if _find(names, ACCOUNT_HEADERS, account_column) is None:
+            continue
+        columns = {"account": _find(names, ACCOUNT_HEADERS, account_column, True, "科目")}
+        amount = None if (debit_column or credit_column) else _find(names, AMOUNT_HEADERS, amount_column)
+        if amount is not None:
+            columns["amount"] = amount
+        else:
+            columns["debit"] = _find(names, DEBIT_HEADERS, debit_column, True, "借方")
+            columns["credit"] = _find(names, CREDIT_HEADERS, credit_column, True, "贷方")
+        return i, columns
+    raise ValueError(f"未在前 {len(rows)} 行中找到明细账表头（科目列: {'、'.join(ACCOUNT_HEADERS)}）")
+
+
+def _csv_encoding(path) -> str:
+    with open(path, "rb") as f:
+        head = f.read(1 << 16)
+    try:
+        head.decode("utf-8-sig")
+        return "utf-8-sig"
+    except UnicodeDecodeError as e:
+        # 截断在多字节字符中间时仍视为 UTF-8
+        return "utf-8-sig" if e.start >= len(head) - 3 else "gb18030"
+
+
+def _csv_chunks(path, chunk_size, **columns):
+    encoding = _csv_encoding(path)
+    with open(path, newline="", encoding=encoding) as f:
+        reader = csv.reader(f)
+        head = [row for _, row in zip(range(HEADER_SCAN_ROWS), reader)]
+    header_row, cols = detect_columns(head, **columns)
+    names = {v: k for k, v in cols.items()}
+    # 金额列由 C 解析器直接按千分位解析为数值，括号负数等无法解析的列保留文本，由 to_amount 处理
+    chunks = pd.read_csv(path, encoding=encoding, header=None, skiprows=header_row + 1, usecols=list(names),
+                         dtype={cols["account"]: str}, thousands=",", chunksize=chunk_size)
+    for chunk in chunks:
+        yield chunk.rename(columns=names)
+
+
+def _xlsx_chunks(path, chunk_size, **columns):
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        head = []
+        for row in rows:
+            head.append(list(row))
+            if len(head) >= HEADER_SCAN_ROWS:
+                break
+        header_row, cols = detect_columns(head, **columns)
+        fields = list(cols.items())
+
+        def pick(row):
+            return [row[i] if i < len(row) else None for _, i in fields]
+
+        buffer = [pick(row) for row in head[header_row + 1:]]
+        for row in rows:
+            buffer.append(pick(row))
+            if len(buffer) >= chunk_size:
+                yield pd.DataFrame(buffer, columns=[k for k, _ in fields], dtype=object)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=[k for k, _ in fields], dtype=object)
+    finally:
+        workbook.close()
+
+
+def iter_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE, **columns):
+    """逐块产出列为 account 与 amount（或 debit / credit）的 DataFrame"""
+    suffix = Path(path).suffix.lower()
+    if suffix in (".csv", ".txt"):
+        return _csv_chunks(path, chunk_size, **columns)
+    if suffix in (".xlsx", ".xlsm"):
+        return _xlsx_chunks(path, chunk_size, **columns)
+    raise ValueError(f"不支持的明细账格式: {suffix}（支持 .csv / .xlsx）")
+
+
+def _chunk_totals(chunk: pd.DataFrame) -> pd.Series:
+    """一块分录按科目求和"""
+    if "amount" in chunk:
+        amounts = pipeline.to_amount(chunk["amount"]).fillna(0.0)
+    else:
+        amounts = pipeline.to_amount(chunk["debit"]).fillna(0.0) - pipeline.to_amount(chunk["credit"]).fillna(0.0)
+    # 先按原始科目值求和，再只对不同的科目值做规范化
+    totals = amounts.groupby(chunk["account"].to_numpy(dtype=object), sort=False, dropna=True).sum()
+    codes = totals.index.map(account_code)
+    keep = codes.notna()
+    return totals[keep].groupby(codes[keep], sort=False).sum()
+
+
+def account_totals(path, chunk_size=DEFAULT_CHUNK_SIZE, metrics=None, **columns) -> pd.Series:
+    """分块读取明细账，返回 科目 -> 金额 合计"""
+    totals = None
+    with stage(metrics, "ledger", file=Path(path).name) as st:
+        rows = chunks = 0
+        for chunk in iter_chunks(path, chunk_size, **columns):
+            part = _chunk_totals(chunk)
+            totals = part if totals is None else totals.add(part, fill_value=0.0)
+            rows += len(chunk)
+            chunks += 1
+        st["rows"] = rows
+        st["chunks"] = chunks
+    return totals if totals is not None else pd.Series(dtype="float64")
+
+
+def map_accounts(totals: pd.Series, account_map: AccountMap) -> tuple[pd.Series, list[str]]:
+    """科目合计按映射表汇总为 项目 -> 金额，返回 (结果, 未映射的科目)"""
+    items, signs, unmapped = [], [], []
+    for account in totals.index:
+        found = account_map.lookup(account)
+        if found is None:
+            unmapped.append(account)
+            items.append(None)
+            signs.append(0.0)
+        else:
+            items.append(found[0])
+            signs.append(found[1])
+    amounts = totals.to_numpy(dtype="float64") * pd.Series(signs, dtype="float64").to_numpy()
+    mapped = pd.Series(amounts, index=pd.Index(items, dtype=object))
+    mapped = mapped[mapped.index.notna()]
+    series = mapped.groupby(level=0, sort=False).sum()
+    series.index.name = "项目"
+    series.name = AMOUNT_NAME
+    return series, unmapped
+
+
+def load_ledger(path, account_map, chunk_size=DEFAULT_CHUNK_SIZE, use_cache=True, metrics=None,
+                **columns) -> tuple[pd.Series, list[str]]:
+    """
+    读取一个明细账 / 科目余额表，返回 (项目 -> 金额, 未映射的科目)
+    account_map: AccountMap 或科目映射表路径
+    结果按 文件内容 + 映射表 + 列参数 缓存在解析缓存中（未映射科目不缓存，命中时返回空列表）
+    """
+    if not isinstance(account_map, AccountMap):
+        account_map = load_account_map(account_map)
+    flag = "LEDGER:" + hashlib.sha256(
+        json.dumps([account_map.digest(), columns], sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    cache = pipeline.statement_cache() if use_cache else None
+    if cache is not None:
+        series = pipeline._cached_statement(cache, path, flag, metrics)
+        if series is not None:
+            return series, []
+    totals = account_totals(path, chunk_size, metrics, **columns)
+    with stage(metrics, "parse", file=Path(path).name) as st:
+        series, unmapped = map_accounts(totals, account_map)
+        st["rows"] = len(series)
+    if metrics is not None:
+        metrics.count("unmapped_accounts", len(unmapped))
+    if cache is not None:
+        cache.put(path, flag, series)
+    return series, unmapped
+
+
+def load_ledgers(paths, account_map, chunk_size=DEFAULT_CHUNK_SIZE, use_cache=True, metrics=None,
+                 **columns) -> tuple[dict, list[str]]:
+    """多个明细账文件（如按月导出）依次读取后按项目相加，返回 ({项目: 金额}, 未映射的科目)"""
+    if not isinstance(account_map, AccountMap):
+        account_map = load_account_map(account_map)
+    total = None
+    unmapped = []
+    for path in paths:
+        series, missing = load_ledger(path, account_map, chunk_size, use_cache, metrics, **columns)
+        total = series if total is None else total.add(series, fill_value=0.0)
+        unmapped.extend(a for a in missing if a not in unmapped)
+    with stage(metrics, "merge") as st:
+        data = dict(total) if total is not None else {}
+        st["rows"] = len(data)
+    return data, unmapped
+
+
+def write_totals(data: dict, path):
+    """汇总结果写入 CSV：item,amount"""
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(["item", "amount"])
+        writer.writerows(data.items())
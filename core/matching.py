@@ -0,0 +1,132 @@
+"""
+项目名称匹配：精确匹配之外，按规范化键与用户别名表把源数据项目对应到模板行
+
+规范化键：Unicode NFKC（全角转半角）-> 去掉开头的序号（一、 / (一) / 1. / 1、 / (1)）
+          -> 去掉标点、符号与空白 -> 忽略大小写
+例如 "（一）营业收入"、"(一) 营业收入"、"营业收入：" 的键都是 "营业收入"
+
+别名表（别名 -> 模板中的项目名称）同样按规范化键比较，支持：
+    .csv          两列 alias,item（表头可省略）
+    .yaml/.json   {别名: 项目名称}
+"""
+
+import csv
+import re
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+
+# NFKC 之后的序号：一、 / (一) / 1. / 1、 / (1)，以及序号前的 △☆▲*# 符号
+NUMBERING_RE = re.compile(
+    r'^\s*[△☆▲*#]?\s*(?:[一二三四五六七八九十]+[、.]|\([一二三四五六七八九十\d]+\)|\d+[.、](?!\d))?'
+)
+
+
+_strip_table = None
+
+
+def _punctuation_table() -> dict:
+    """str.translate 用的删除表：基本多文种平面内的标点 (P)、符号 (S)、空白 (Z) 与控制字符 (C)"""
+    global _strip_table
+    if _strip_table is None:
+        _strip_table = dict.fromkeys(
+            i for i in range(0x10000) if unicodedata.category(chr(i))[0] in "PSZC"
+        )
+    return _strip_table
+
+
+@lru_cache(maxsize=1 << 18)
+def match_key(name) -> str | None:
+    """项目名称的规范化键，非字符串或规范化后为空时返回 None"""
+    if not isinstance(name, str):
+        return None
+    text = NUMBERING_RE.sub("", unicodedata.normalize("NFKC", name), count=1)
+    key = text.translate(_punctuation_table()).casefold()
+    return key or None
+
+
+def load_aliases(path) -> dict[str, str]:
+    """读取别名表，返回 {别名: 项目名称}"""
+    path = Path(path)
+    if path.suffix.lower() == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            rows = [r for r in csv.reader(f) if len(r) >= 2 and r[0].strip()]
+        if rows and [c.strip().lower() for c in rows[0][:2]] == ["alias", "item"]:
+            rows = rows[1:]
+        return {r[0].strip(): r[1].strip() for r in rows}
+    from omegaconf import OmegaConf
+    data = OmegaConf.to_container(OmegaConf.load(path))
+    if not isinstance(data, dict):
+        raise ValueError(f"别名表格式错误: {path}，应为 别名: 项目名称 的映射")
+    return {str(k): str(v) for k, v in data.items()}
+
+
+def alias_keys(aliases: dict | None) -> dict[str, str]:
+    """别名表编译为 {别名的规范化键: 目标项目的规范化键}"""
+    keys = {}
+    for alias, item in (aliases or {}).items():
+        alias_key, item_key = match_key(alias), match_key(item)
+        if alias_key is not None and item_key is not None:
+            keys[alias_key] = item_key
+    return keys
+
+
+class ItemIndex:
+    """
+    模板项目的匹配索引，由模板项目与别名表编译一次，之后每次填充：
+        1. 精确匹配（与原逻辑一致）
+        2. 源数据项目 -> 别名 -> 规范化键，与模板项目的规范化键比较
+    每个模板项目与源数据项目都只做一次哈希查找
+    """
+
+    def __init__(self, keys: dict, aliases: dict | None = None):
+        """
+        keys: {模板项目: 规范化键}（FillPlan.keys，随填充计划一起缓存）
+        aliases: {别名: 项目名称}
+        """
+        self.keys = keys
+        # 别名的规范化键 -> 目标项目的规范化键
+        self.aliases = alias_keys(aliases)
+
+    def resolve(self, data: dict) -> tuple[dict, list[str]]:
+        """
+        data: {源数据项目: 金额}
+        返回 ({模板项目: 金额}, [未匹配的模板项目])
+        """
+        values = {item: data[item] for item in self.keys if item in data}
+        if len(values) == len(self.keys):
+            return values, []
+
+        # 只有存在未精确匹配的模板项目时才计算源数据的规范化键；同键时后出现的覆盖先出现的
+        by_key = {}
+        for name, value in data.items():
+            key = match_key(name)
+            if key is not None:
+                by_key[self.aliases.get(key, key)] = value
+        unmatched = []
+        for item, key in self.keys.items():
+            if item in values:
+                continue
+            if key is not None and key in by_key:
+                values[item] = by_key[key]
+            else:
+                unmatched.append(item)
+        return values, unmatched
+
+    def match(self, data) -> dict:
+        """
+        与 resolve 相同的匹配规则，返回 {模板项目: 取值的源数据项目}（未匹配的模板项目不在其中）
+        用于预览匹配明细，data 只需支持 in 与迭代项目名称
+        """
+        sources = {item: item for item in self.keys if item in data}
+        if len(sources) == len(self.keys):
+            return sources
+        by_key = {}
+        for name in data:
+            key = match_key(name)
+            if key is not None:
+                by_key[self.aliases.get(key, key)] = name
+        for item, key in self.keys.items():
+            if item not in sources and key is not None and key in by_key:
+                sources[item] = by_key[key]
+        return sources
@@ -0,0 +1,189 @@
+"""
+运行指标：记录每个阶段的耗时、行数、匹配情况与进程峰值内存，可输出为 JSON 行日志
+"""
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+STAGE_NAMES = {
+    "cache": "查询缓存",
+    "header": "定位表头",
+    "read": "读取",
+    "parse": "清洗",
+    "ledger": "汇总明细账",
+    "merge": "合并",
+    "store": "报表库",
+    "consolidate": "汇总单位",
+    "eliminate": "抵销",
+    "template_load": "加载模板",
+    "cell_write": "写入单元格",
+    "save": "保存",
+    "formula": "计算公式",
+}
+
+COUNT_NAMES = {
+    "matched": "匹配",
+    "unmatched_template": "模板未匹配",
+    "unmatched_source": "源数据未使用",
+    "unmapped_accounts": "未映射科目",
+    "formula_unsupported": "未计算公式",
+}
+
+# JSON 日志中每个年份最多记录的未匹配模板项目数
+UNMATCHED_SAMPLE = 20
+
+
+def peak_rss_bytes() -> int:
+    """当前进程的峰值常驻内存（字节），无法获取时返回 0"""
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [
+                    ("cb", wintypes.DWORD),
+                    ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t),
+                    ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t),
+                    ("PeakPagefileUsage", ctypes.c_size_t),
+                ]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                return counters.PeakWorkingSetSize
+        except Exception:
+            pass
+        return 0
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 单位为字节，Linux 为 KB
+        return peak if sys.platform == "darwin" else peak * 1024
+    except Exception:
+        return 0
+
+
+class RunMetrics:
+    def __init__(self, label=""):
+        self.label = label
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self._start = time.perf_counter()
+        self.total_seconds = 0.0
+        self.stages: list[dict] = []
+        self.counts: dict[str, int] = {}
+        # 年份 -> 未匹配到数据的模板项目
+        self.unmatched: dict[str, list[str]] = {}
+
+    @contextmanager
+    def stage(self, name, **info):
+        """
+        记录一个阶段；with 块内可向返回的 dict 补充信息（如 rows）
+            with metrics.stage("parse", file="OFP") as st:
+                ...
+                st["rows"] = len(series)
+        """
+        record = {"stage": name, **info}
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = round(time.perf_counter() - start, 6)
+            record["peak_rss_mb"] = round(peak_rss_bytes() / 1024 / 1024, 1)
+            self.stages.append(record)
+
+    def extend(self, records: list[dict]):
+        """合并子进程中记录的阶段"""
+        self.stages.extend(records)
+
+    def count(self, key, value):
+        self.counts[key] = self.counts.get(key, 0) + int(value)
+
+    def finish(self):
+        self.total_seconds = round(time.perf_counter() - self._start, 6)
+        return self
+
+    def file_timings(self) -> dict[str, float]:
+        """每张报表 读取 + 清洗 的耗时，多年份时键为 "年份/报表类型\""""
+        timings = {}
+        for record in self.stages:
+            if "file" in record and record["stage"] in ("cache", "header", "read", "ledger", "parse"):
+                key = f"{record['year']}/{record['file']}" if "year" in record else record["file"]
+                timings[key] = timings.get(key, 0.0) + record["seconds"]
+        return timings
+
+    def peak_rss_mb(self) -> float:
+        return max((r.get("peak_rss_mb", 0.0) for r in self.stages), default=0.0)
+
+    def to_dict(self) -> dict:
+        return {
+            "label": self.label,
+            "started": self.started,
+            "total_seconds": self.total_seconds,
+            "peak_rss_mb": self.peak_rss_mb(),
+            "counts": self.counts,
+            "unmatched": {y: items[:UNMATCHED_SAMPLE] for y, items in self.unmatched.items()},
+            "stages": self.stages,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RunMetrics":
+        """由 to_dict() 的结果还原（如生成服务返回的指标），用于展示汇总"""
+        metrics = cls(data.get("label", ""))
+        metrics.started = data.get("started", metrics.started)
+        metrics.total_seconds = data.get("total_seconds", 0.0)
+        metrics.stages = list(data.get("stages", []))
+        metrics.counts = dict(data.get("counts", {}))
+        metrics.unmatched = dict(data.get("unmatched", {}))
+        return metrics
+
+    def append_jsonl(self, path):
+        append_jsonl(path, self.to_dict())
+
+    def summary(self) -> str:
+        """按阶段汇总的多行文本，用于界面展示"""
+        totals: dict[str, list] = {}
+        for record in self.stages:
+            entry = totals.setdefault(record["stage"], [0.0, 0])
+            entry[0] += record["seconds"]
+            entry[1] += record.get("rows", 0)
+        lines = []
+        for name, (seconds, rows) in totals.items():
+            label = STAGE_NAMES.get(name, name)
+            lines.append(f"{label}: {seconds:.3f}s" + (f"，{rows:,} 行" if rows else ""))
+        if self.counts:
+            lines.append("，".join(f"{COUNT_NAMES.get(k, k)} {v:,} 项" for k, v in self.counts.items()))
+        for year, items in self.unmatched.items():
+            if items:
+                more = f" 等 {len(items):,} 项" if len(items) > 5 else ""
+                lines.append(f"{year} 未匹配: {'、'.join(items[:5])}{more}")
+        lines.append(f"总耗时 {self.total_seconds:.2f}s，峰值内存 {self.peak_rss_mb():.0f} MB")
+        return "\n".join(lines)
+
+
+def append_jsonl(path, record: dict):
+    """以 JSON 行的形式追加到日志文件"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+@contextmanager
+def stage(metrics, name, **info):
+    """metrics 为 None 时不记录"""
+    if metrics is None:
+        yield {}
+    else:
+        with metrics.stage(name, **info) as record:
+            yield record
@@ -0,0 +1,489 @@
+"""
+报表读取、清洗与模板写入流程
+原 MainWindow 中的 _get_data / _parse_data / _process_data / _write_data
+"""
+
+import atexit
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import openpyxl
+
+from core.cache import StatementCache
+from core.formula import load_graph
+from core.matching import ItemIndex, load_aliases
+from core.metrics import RunMetrics, stage
+from core.reader import read_blocks, read_statement
+from core.shared import attach, release, share
+from core.store import DEFAULT_STORE, open_store
+from core.template import YEAR_COLUMNS, load_plan
+from core.xlsx_patch import PatchUnsupported, patch_workbook, set_cached_values
+
+ACCOUNTING_FORMAT = '#,##0.00'
+
+# 解析器版本，修改 get_data / parse_data 的输出时递增，使旧的解析缓存失效
+PARSER_VERSION = 3
+
+_statement_cache = None
+
+# 进度阶段：读取 -> 解析 -> 写入 -> 保存
+STAGES = ("reading", "parsing", "writing", "saving")
+
+
+class GenerationCancelled(Exception):
+    """由进度回调抛出，用于中止本次生成"""
+
+
+def _report(progress, stage, detail=""):
+    """
+    progress(stage, detail) 在每个阶段开始前调用
+    回调中抛出 GenerationCancelled 即可在阶段之间取消
+    """
+    if progress is not None:
+        progress(stage, detail)
+
+
+def statement_cache() -> StatementCache:
+    global _statement_cache
+    if _statement_cache is None:
+        _statement_cache = StatementCache(PARSER_VERSION)
+    return _statement_cache
+
+
+# 各报表可接受的金额列表头，按优先级排列；读取后统一命名为 amount_column(flag)
+AMOUNT_HEADERS = {
+    'OFP': ('期末余额', '期末数', '期末金额', '年末余额', '年末数'),
+    'PROFIT': ('本期金额', '本期数', '本年金额', '本年累计金额', '本年累计数'),
+    'FLOW': ('本期金额', '本期数', '本年金额', '本年累计金额', '本年累计数'),
+}
+
+
+def amount_column(flag) -> str:
+    return '期末余额' if flag == 'OFP' else '本期金额'
+
+
+def parse_year_columns(text) -> dict:
+    """解析 "2022=C,2023=D" 形式的年份 -> 列映射"""
+    mapping = {}
+    for part in str(text).split(","):
+        if not part.strip():
+            continue
+        year, sep, col = part.partition("=")
+        if not sep or not year.strip() or not col.strip().isalpha():
+            raise ValueError(f"年份列映射格式错误: {part!r}，应为 年份=列，如 2024=F")
+        mapping[year.strip()] = col.strip().upper()
+    return mapping
+
+
+def get_data(path, flag=None, metrics=None, **info) -> pd.DataFrame:
+    """
+    读取报表
+    指定 flag 时自动识别表头行与各栏，只解码 项目 / 金额 列，列名为 项目, 金额, 项目.1, 金额.1, ...
+    flag 为 None 时读取全部列
+    """
+    if flag is None:
+        return read_statement(path, metrics=metrics, **info)
+    return read_blocks(path, AMOUNT_HEADERS[flag], amount_column(flag), metrics=metrics, **info)
+
+
+def statement_blocks(df, flag) -> list[tuple[str, str]]:
+    """df 中各栏的 (项目列, 金额列) 列名：项目/金额, 项目.1/金额.1, ..."""
+    col = amount_column(flag)
+    blocks = []
+    while True:
+        suffix = f".{len(blocks)}" if blocks else ""
+        if f"项目{suffix}" not in df.columns or f"{col}{suffix}" not in df.columns:
+            return blocks
+        blocks.append((f"项目{suffix}", f"{col}{suffix}"))
+
+
+# 项目名称开头的符号 (△☆▲*#) 与序号 (一、 / （一） / 1.)，只在开头匹配
+ITEM_PREFIX_RE = re.compile(r'^[△☆▲*# ]?\s*(?:[一二三四五六七八九十]+、|（[一二三四五六七八九十]+）|\d+\.)?\s*')
+# 金额文本：千分位逗号，以及括号表示的负数 (500.00) / （500.00）
+AMOUNT_THOUSANDS_RE = re.compile(r'[,，\s]')
+AMOUNT_PAREN_RE = re.compile(r'^[(（](.*)[)）]$')
+
+
+def to_amount(values: pd.Series) -> pd.Series:
+    """
+    批量转换金额列，"1,234.56" -> 1234.56，"(500.00)" -> -500.0，无法识别的记为 NaN
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype('float64')
+    numbers = pd.to_numeric(values, errors='coerce').astype('float64')
+    # 只对数值解析失败的文本再做一次清洗
+    rest = values[numbers.isna() & values.notna()]
+    if rest.empty:
+        return numbers
+    text = rest.astype(str).str.replace(AMOUNT_THOUSANDS_RE, '', regex=True)
+    text = text.str.replace(AMOUNT_PAREN_RE, r'-\1', regex=True)
+    return numbers.fillna(pd.to_numeric(text, errors='coerce'))
+
+
+def clean_items(items: pd.Series) -> pd.Series:
+    """
+    批量清洗项目名称，非字符串、'0' 与空字符串记为 NaN
+    """
+    if pd.api.types.infer_dtype(items, skipna=True) not in ("string", "mixed", "mixed-integer"):
+        # 整列都不是字符串（如空栏）
+        return pd.Series(np.nan, index=items.index, dtype=object)
+    stripped = items.str.strip()
+    stripped = stripped.mask(stripped.isin(["0", ""]))
+    cleaned = stripped.str.replace(ITEM_PREFIX_RE, '', regex=True)
+    return cleaned.str.replace(' ', '', regex=False)
+
+
+def parse_data(pdfunit: tuple) -> pd.Series:
+    """
+    解析df单元格数据
+    """
+    df, flag = pdfunit
+    colName = amount_column(flag)
+    blocks = statement_blocks(df, flag)
+    # 各栏按列优先展开（第一栏全部行、第二栏全部行 ...），一次完成宽表到长表的转换
+    items = df[[item for item, _ in blocks]].to_numpy(dtype=object).ravel(order="F")
+    amounts = df[[amount for _, amount in blocks]].to_numpy(dtype=object).ravel(order="F")
+    items = clean_items(pd.Series(items, dtype=object))
+    amounts = to_amount(pd.Series(amounts, dtype=object))
+    keep = items.notna().to_numpy() & amounts.notna().to_numpy()
+    dseries = pd.Series(amounts.to_numpy()[keep], index=pd.Index(items.to_numpy()[keep], name='项目'), name=colName)
+    return dseries
+
+
+def _cached_statement(cache, path, flag, metrics=None, **info):
+    """查询解析缓存，未命中返回 None"""
+    with stage(metrics, "cache", file=flag, **info) as st:
+        series = cache.get(path, flag)
+        st["hit"] = series is not None
+        if series is not None:
+            st["rows"] = len(series)
+    return series
+
+
+def _parse_statement(df, flag, metrics=None, **info) -> pd.Series:
+    with stage(metrics, "parse", file=flag, **info) as st:
+        series = parse_data((df, flag))
+        st["rows"] = len(series)
+    return series
+
+
+def load_statement(path, flag, use_cache=True, progress=None, metrics=None, **info) -> pd.Series:
+    """读取并清洗单张报表，源文件内容未变化时直接使用缓存结果"""
+    _report(progress, "reading", flag)
+    cache = statement_cache() if use_cache else None
+    if cache is not None:
+        series = _cached_statement(cache, path, flag, metrics, **info)
+        if series is not None:
+            _report(progress, "parsing", flag)
+            return series
+    df = get_data(path, flag, metrics, file=flag, **info)
+    _report(progress, "parsing", flag)
+    series = _parse_statement(df, flag, metrics, **info)
+    if cache is not None:
+        cache.put(path, flag, series)
+    return series
+
+
+def _decode_statement(path, flag, info=None) -> tuple[str, list[dict]]:
+    """
+    在工作进程中读取并清洗单张报表，返回 (共享文件路径, 各阶段记录)
+    结果写入 core.shared 的内存映射文件交回主进程，由 _receive_statement 读取，不经过 pickle
+    """
+    metrics = RunMetrics()
+    info = info or {}
+    df = get_data(path, flag, metrics, file=flag, pid=os.getpid(), **info)
+    series = _parse_statement(df, flag, metrics, pid=os.getpid(), **info)
+    return share({flag: series}), metrics.stages
+
+
+def _receive_statement(shared, flag) -> pd.Series:
+    """读取工作进程写入的共享文件并删除；金额复制一份，文件随即释放"""
+    try:
+        with attach(shared) as data:
+            return data.series(flag, copy=True)
+    finally:
+        release(shared)
+
+
+def _discard_shared(future):
+    if not future.cancelled() and future.exception() is None:
+        release(future.result()[0])
+
+
+_decode_executor = None
+
+
+def decode_executor() -> ProcessPoolExecutor:
+    """解码报表用的进程池，进程内复用，避免每次生成都重新启动子进程"""
+    global _decode_executor
+    if _decode_executor is None:
+        _decode_executor = ProcessPoolExecutor(max_workers=min(3, os.cpu_count() or 1))
+        atexit.register(_decode_executor.shutdown, wait=False, cancel_futures=True)
+    return _decode_executor
+
+
+def load_statements(sources: dict, use_cache=True, progress=None, parallel=True, metrics=None, **info) -> dict:
+    """
+    读取多张报表 {报表类型: 路径}，返回 {报表类型: Series}
+    parallel 为 True 时未命中缓存的报表在进程池中同时解码，总耗时约等于最慢的一张
+    metrics: RunMetrics，记录各报表的读取、定位表头、清洗阶段（子进程中的记录会合并回来）
+    """
+    if not parallel or (os.cpu_count() or 1) < 2:
+        return {flag: load_statement(path, flag, use_cache, progress, metrics, **info)
+                for flag, path in sources.items()}
+
+    cache = statement_cache() if use_cache else None
+    results = {}
+    pending = {}
+    for flag, path in sources.items():
+        _report(progress, "reading", flag)
+        series = _cached_statement(cache, path, flag, metrics, **info) if cache is not None else None
+        if series is not None:
+            results[flag] = series
+            _report(progress, "parsing", flag)
+        else:
+            pending[flag] = path
+
+    if len(pending) == 1:
+        flag, path = next(iter(pending.items()))
+        results[flag] = load_statement(path, flag, False, None, metrics, **info)
+        _report(progress, "parsing", flag)
+    elif pending:
+        executor = decode_executor()
+        futures = {executor.submit(_decode_statement, path, flag, info): flag for flag, path in pending.items()}
+        received = set()
+        try:
+            for future in as_completed(futures):
+                flag = futures[future]
+                shared, records = future.result()
+                received.add(future)
+                results[flag] = _receive_statement(shared, flag)
+                if metrics is not None:
+                    metrics.extend(records)
+                _report(progress, "parsing", flag)
+        finally:
+            # 取消或出错时不再等待其余报表；已完成但未读取的结果删除其共享文件
+            for future in futures:
+                if not future.cancel() and future not in received:
+                    future.add_done_callback(_discard_shared)
+
+    if cache is not None:
+        for flag, path in pending.items():
+            cache.put(path, flag, results[flag])
+    return {flag: results[flag] for flag in sources}
+
+
+def statement_sources(input_ofp_path, input_profit_path, input_flow_path) -> dict:
+    """{报表类型: 路径}；利润表、现金流量表都为空时只读取资产负债表"""
+    sources = {}
+    if input_profit_path != '' or input_flow_path != '':
+        sources['PROFIT'] = input_profit_path
+        sources['FLOW'] = input_flow_path
+    sources['OFP'] = input_ofp_path
+    return sources
+
+
+def merge_statements(series: dict, metrics=None, **info) -> dict:
+    """合并为 项目 -> 金额，同名项目按 资产负债表 < 利润表 < 现金流量表 的顺序覆盖"""
+    oseries = series['OFP']
+    pseries = series.get('PROFIT', pd.Series())
+    fseries = series.get('FLOW', pd.Series())
+
+    with stage(metrics, "merge", **info) as st:
+        data = dict(oseries) | dict(pseries) | dict(fseries)
+        st["rows"] = len(data)
+    return data
+
+
+def process_data(input_ofp_path, input_profit_path, input_flow_path, use_cache=True, progress=None,
+                 parallel=True, metrics=None, store=None, entity=None, period=None, **info) -> dict:
+    """
+    store: StatementStore 或其路径，设置时将各报表按 (entity, period, 报表类型, 项目) 写入报表库
+    """
+    sources = statement_sources(input_ofp_path, input_profit_path, input_flow_path)
+    series = load_statements(sources, use_cache, progress, parallel, metrics, **info)
+    store = open_store(store)
+    if store is not None:
+        if not entity:
+            raise ValueError("写入报表库需要指定单位名称")
+        with stage(metrics, "store", **info) as st:
+            store.put_statements(entity, period, series, sources)
+            st["rows"] = sum(len(s) for s in series.values())
+    return merge_statements(series, metrics, **info)
+
+
+def fill_cells(plan, data, year) -> tuple[dict, dict]:
+    """
+    按填充计划计算需要写入的单元格，data 为 {模板项目: 金额}（见 ItemIndex.resolve）
+    返回 ({(行, 列): 值}, {(行, 列): 数字格式})
+    """
+    year = str(year)
+    col = plan.column_for(year)
+    cells = {(1, col): f"{year}-12-31"}
+    formats = {}
+    # 只访问计划中命中的行
+    for item, rows in plan.rows.items():
+        value = data.get(item)
+        if value is None:
+            continue
+        for row in rows:
+            cells[(row, col)] = value
+            formats[(row, col)] = ACCOUNTING_FORMAT
+    return cells, formats
+
+
+def resolve_aliases(aliases) -> dict:
+    """aliases 可以是 {别名: 项目名称} 或别名表文件路径"""
+    if not aliases:
+        return {}
+    if isinstance(aliases, dict):
+        return aliases
+    return load_aliases(aliases)
+
+
+def record_matches(metrics, year, data, values, unmatched):
+    """记录匹配数与未匹配的模板项目；values / unmatched 为 ItemIndex.resolve 的结果"""
+    matched = len(values)
+    metrics.count("matched", matched)
+    metrics.count("unmatched_template", len(unmatched))
+    metrics.count("unmatched_source", max(len(data) - matched, 0))
+    metrics.unmatched[str(year)] = unmatched
+
+
+def write_formula_values(temp_path, output_path, sheet, cells, metrics=None):
+    """
+    计算模板中的公式并写入输出文件作为缓存值：依赖图按模板缓存，只重算受 cells 影响的公式单元格
+    cells: 本次写入工作表 sheet 的 {(行, 列): 值}
+    """
+    with stage(metrics, "formula") as st:
+        graph = load_graph(temp_path)
+        recalculated = graph.recalc({(sheet, row, col): value for (row, col), value in cells.items()})
+        values = graph.cached_values()
+        # 无法计算的公式所在的工作表也要改写，删除其中模板保存的旧结果
+        for unsupported_sheet, _, _ in graph.unsupported:
+            values.setdefault(unsupported_sheet, {})
+        set_cached_values(output_path, values)
+        st["rows"] = len(recalculated)
+    if metrics is not None and graph.unsupported:
+        metrics.count("formula_unsupported", len(graph.unsupported))
+
+
+def write_years(data_by_year: dict, temp_path, output_path, writer="openpyxl", progress=None,
+                year_columns=None, metrics=None, aliases=None, sheet="Sheet1", item_column="B",
+                formulas=False):
+    """
+    一次加载模板，将多个年份的数据 {年份: {项目: 金额}} 分别写入各自的列，一次保存
+    writer: "openpyxl" 完整加载/保存模板；
+            "patch" 只改写目标工作表的 XML，其余部件原样复制（模板不支持时自动回退）
+    year_columns: 年份 -> 列字母，默认 YEAR_COLUMNS
+    metrics: RunMetrics，记录 加载模板 / 写入单元格 / 保存 阶段与匹配数
+    aliases: 别名表 {别名: 项目名称} 或其文件路径
+    sheet / item_column: 写入的工作表与项目名称所在列
+    formulas: 为 True 时在进程内计算模板公式，输出文件中带有公式结果（见 core.formula）
+    """
+    _report(progress, "writing")
+    with stage(metrics, "template_load", step="plan"):
+        plan = load_plan(temp_path, year_columns or YEAR_COLUMNS, sheet, item_column)
+        index = ItemIndex(plan.keys, resolve_aliases(aliases))
+    cells, formats = {}, {}
+    with stage(metrics, "cell_write", step="plan") as st:
+        for year, data in data_by_year.items():
+            values, unmatched = index.resolve(data)
+            year_cells, year_formats = fill_cells(plan, values, year)
+            cells.update(year_cells)
+            formats.update(year_formats)
+            if metrics is not None:
+                record_matches(metrics, year, data, values, unmatched)
+        st["rows"] = len(cells)
+    if writer == "patch":
+        _report(progress, "saving")
+        try:
+            # 补丁方式一次完成读取模板、改写与保存，整体计入保存阶段
+            with stage(metrics, "save", writer="patch"):
+                patch_workbook(temp_path, output_path, plan.sheet, cells, formats)
+            if formulas:
+                write_formula_values(temp_path, output_path, plan.sheet, cells, metrics)
+            return
+        except PatchUnsupported:
+            pass
+    elif writer != "openpyxl":
+        raise ValueError(f"未知的写入方式: {writer}")
+
+    with stage(metrics, "template_load", step="workbook"):
+        worksheet = openpyxl.load_workbook(temp_path)
+    with stage(metrics, "cell_write", step="workbook"):
+        sheet = worksheet[plan.sheet]
+        for (row, col), value in cells.items():
+            cell = sheet.cell(row=row, column=col, value=value)
+            fmt = formats.get((row, col))
+            if fmt:
+                cell.number_format = fmt
+    _report(progress, "saving")
+    with stage(metrics, "save", writer="openpyxl"):
+        worksheet.save(output_path)
+    if formulas:
+        write_formula_values(temp_path, output_path, plan.sheet, cells, metrics)
+
+
+def write_data(data, temp_path, output_path, year, writer="openpyxl", progress=None, year_columns=None,
+               metrics=None, aliases=None):
+    write_years({str(year): data}, temp_path, output_path, writer, progress, year_columns, metrics, aliases)
+
+
+def generate_years(template_path, sources: dict, output_path, writer="openpyxl", use_cache=True,
+                   progress=None, parallel=True, metrics=None, year_columns=None, aliases=None, store=None,
+                   entity=None, formulas=False):
+    """
+    多个年份一次生成：sources 为 {年份: (资产负债表, 利润表, 现金流量表)}
+    各年份分别读取清洗后，在同一次模板加载/保存中写入各自的列
+    metrics: 传入 RunMetrics 时记录各阶段耗时、行数、匹配数与峰值内存
+    aliases: 别名表 {别名: 项目名称} 或其文件路径
+    store / entity: 报表库及单位名称，设置时各年份的报表以年份为期间写入报表库
+    formulas: 为 True 时计算模板公式并写入结果
+    """
+    store = open_store(store)
+    data_by_year = {}
+    for year, (ofp, profit, flow) in sources.items():
+        # 多年份时记录中带上年份，便于区分同类型的报表
+        info = {"year": str(year)} if len(sources) > 1 else {}
+        data_by_year[str(year)] = process_data(ofp, profit, flow, use_cache, progress, parallel, metrics,
+                                               store, entity, str(year), **info)
+    write_years(data_by_year, template_path, output_path, writer, progress, year_columns, metrics, aliases,
+                formulas=formulas)
+    if metrics is not None:
+        metrics.finish()
+    return output_path
+
+
+def generate(template_path, input_ofp_path, input_profit_path, input_flow_path, year, output_path,
+             writer="openpyxl", use_cache=True, progress=None, parallel=True, metrics=None, year_columns=None,
+             aliases=None, store=None, entity=None, formulas=False):
+    """完整执行一次 读取 -> 清洗 -> 写入"""
+    return generate_years(template_path, {str(year): (input_ofp_path, input_profit_path, input_flow_path)},
+                          output_path, writer, use_cache, progress, parallel, metrics, year_columns, aliases,
+                          store, entity, formulas)
+
+
+def generate_from_store(template_path, entity, periods, output_path, store=None, writer="openpyxl",
+                        progress=None, metrics=None, year_columns=None, aliases=None, formulas=False):
+    """
+    不读取 Excel，直接从报表库取出某单位各期间的数据填入模板（期间即写入的年份列）
+    报表库中没有某期间的数据时抛出 ValueError
+    """
+    store = open_store(store or DEFAULT_STORE)
+    data_by_year = {}
+    with stage(metrics, "store", step="query") as st:
+        for period in periods:
+            data = store.data(entity, period)
+            if not data:
+                raise ValueError(f"报表库中没有 {entity} {period} 的数据")
+            data_by_year[str(period)] = data
+        st["rows"] = sum(len(d) for d in data_by_year.values())
+    write_years(data_by_year, template_path, output_path, writer, progress, year_columns, metrics, aliases,
+                formulas=formulas)
+    if metrics is not None:
+        metrics.finish()
+    return output_path
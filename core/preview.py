@@ -0,0 +1,80 @@
+"""
+匹配明细预览：在保存之前列出每条源数据的金额、对应的模板项目与行号，以及模板中未匹配的项目
+
+    table = match_table({"OFP": 资产负债表, "PROFIT": 利润表}, plan, index)
+
+结果为一张长表（列见 PREVIEW_COLUMNS），由界面的预览表格按需取值显示
+本模块只在计算时导入 numpy / pandas，界面可直接引用列名与状态常量
+"""
+
+PREVIEW_COLUMNS = ("报表", "项目", "金额", "模板项目", "模板行", "状态")
+
+# 状态
+MATCHED = "已匹配"
+OVERRIDDEN = "被覆盖"
+UNUSED = "未使用"
+TEMPLATE_UNMATCHED = "模板未匹配"
+STATUSES = (MATCHED, OVERRIDDEN, UNUSED, TEMPLATE_UNMATCHED)
+
+
+def match_table(series: dict, plan, index) -> "pd.DataFrame":
+    """
+    series: {报表类型: Series(项目 -> 金额)}，按 资产负债表 < 利润表 < 现金流量表 的覆盖顺序合并（同 merge_statements）
+    plan / index: 模板的 FillPlan 与 ItemIndex
+    每条源数据一行：被模板使用的为“已匹配”，同名项目被后面的报表（或同一报表中后出现的行）覆盖的为“被覆盖”，
+    其余为“未使用”；之后每个未匹配的模板项目一行
+    """
+    import numpy as np
+    import pandas as pd
+
+    flags = [flag for flag in ("OFP", "PROFIT", "FLOW") if flag in series]
+    items = np.concatenate([series[f].index.to_numpy(dtype=object) for f in flags]) if flags else np.array([], object)
+    amounts = np.concatenate([series[f].to_numpy(dtype="float64") for f in flags]) if flags else np.array([])
+    statements = np.repeat(np.array(flags, dtype=object), [len(series[f]) for f in flags])
+
+    # 合并后每个项目取最后一次出现的值；项目顺序与合并后的 dict 相同（首次出现的位置），规范化键相同时后者为准
+    effective = ~pd.Index(items).duplicated(keep="last")
+    sources = index.match(dict.fromkeys(items))
+
+    # 源数据项目 -> 使用它的模板项目（可能有多个）
+    used: dict[str, list[str]] = {}
+    for item, source in sources.items():
+        used.setdefault(source, []).append(item)
+    targets = [used.get(item) if keep else None for item, keep in zip(items, effective)]
+    template_items = np.array(["、".join(t) if t else "" for t in targets], dtype=object)
+    template_rows = np.array(
+        ["、".join(str(r) for item in t for r in plan.rows.get(item, ())) if t else "" for t in targets], dtype=object
+    )
+    status = np.where(effective, np.where(template_items != "", MATCHED, UNUSED), OVERRIDDEN).astype(object)
+
+    unmatched = [item for item in plan.rows if item not in sources]
+    table = pd.DataFrame({
+        "报表": np.concatenate([statements, np.full(len(unmatched), "", dtype=object)]),
+        "项目": np.concatenate([items, np.full(len(unmatched), "", dtype=object)]),
+        "金额": np.concatenate([amounts, np.full(len(unmatched), np.nan)]),
+        "模板项目": np.concatenate([template_items, np.array(unmatched, dtype=object)]),
+        "模板行": np.concatenate([
+            template_rows, np.array(["、".join(map(str, plan.rows[item])) for item in unmatched], dtype=object),
+        ]),
+        "状态": np.concatenate([status, np.full(len(unmatched), TEMPLATE_UNMATCHED, dtype=object)]),
+    })
+    return table
+
+
+def search_mask(table: "pd.DataFrame", text="", status=None) -> "np.ndarray":
+    """
+    按关键字（项目或模板项目中包含，忽略大小写）与状态筛选，返回满足条件的行号
+    只计算行号，不复制表格
+    """
+    import numpy as np
+
+    mask = np.ones(len(table), dtype=bool)
+    if status:
+        mask &= (table["状态"] == status).to_numpy()
+    text = text.strip()
+    if text:
+        hit = np.zeros(len(table), dtype=bool)
+        for column in ("项目", "模板项目"):
+            hit |= table[column].str.contains(text, case=False, regex=False, na=False).to_numpy()
+        mask &= hit
+    return np.flatnonzero(mask)
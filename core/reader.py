@@ -0,0 +1,281 @@
+"""
+报表读取：先流式读取前几行定位表头与所需列，再只解码这些列
+
+版式识别（detect_layout）：在前 HEADER_SCAN_ROWS 行中找到同时含有项目列（项目 / 资产 / 负债和所有者权益 等）
+与金额列（期末余额 / 本期金额 等）的第一行作为表头，每个项目列与其右侧第一个金额列组成一栏，
+不限栏数，也不要求表头在固定的行
+
+按优先级选择读取引擎：
+    calamine  已安装 python-calamine 时使用（xls/xlsx 均支持，速度最快）
+    xlrd      .xls，按列取值
+    openpyxl  .xlsx，只读流式逐行读取
+其它情况回退到 pandas.read_excel(usecols=...)
+"""
+
+import importlib.util
+import os
+import re
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+
+import pandas as pd
+
+from core.metrics import stage
+
+# 未找到含“项目”的表头时使用的默认表头行（从 0 开始）
+HEADER_ROW = 3
+# 最多在前多少行中查找表头
+HEADER_SCAN_ROWS = 20
+# 这些值视为空（与原 read_excel(na_values=['0']) 一致）
+NA_VALUES = {"", "0", 0}
+# 项目列的表头（去空格、去掉括号中的说明后比较）
+ITEM_HEADERS = ("项目", "项目名称", "资产", "负债和所有者权益", "负债和股东权益", "负债及所有者权益")
+_HEADER_NOTE_RE = re.compile(r"[(（].*$")
+
+
+class _Source(ABC):
+    """单个工作表的读取接口：head 返回前 n 行，columns 返回指定列从 start 行开始的值"""
+
+    @abstractmethod
+    def head(self, n: int) -> list[list]:
+        ...
+
+    @abstractmethod
+    def columns(self, positions: list[int], start: int) -> dict[int, list]:
+        ...
+
+    def close(self):
+        pass
+
+
+class _CalamineSource(_Source):
+    def __init__(self, path):
+        from python_calamine import CalamineWorkbook
+        self.sheet = CalamineWorkbook.from_path(os.fspath(path)).get_sheet_by_index(0)
+        self._rows = None
+
+    def _all(self):
+        if self._rows is None:
+            self._rows = self.sheet.to_python(skip_empty_area=False)
+        return self._rows
+
+    def head(self, n):
+        return self.sheet.to_python(skip_empty_area=False, nrows=n)
+
+    def columns(self, positions, start):
+        rows = self._all()[start:]
+        return {p: [r[p] if p < len(r) else None for r in rows] for p in positions}
+
+
+class _XlrdSource(_Source):
+    def __init__(self, path):
+        import xlrd
+        self.book = xlrd.open_workbook(os.fspath(path), on_demand=True)
+        self.sheet = self.book.sheet_by_index(0)
+
+    def head(self, n):
+        return [self.sheet.row_values(i) for i in range(min(n, self.sheet.nrows))]
+
+    def columns(self, positions, start):
+        ncols = self.sheet.ncols
+        return {
+            p: self.sheet.col_values(p, start_rowx=start) if p < ncols else [None] * (self.sheet.nrows - start)
+            for p in positions
+        }
+
+    def close(self):
+        self.book.release_resources()
+
+
+class _OpenpyxlSource(_Source):
+    def __init__(self, path):
+        import openpyxl
+        self.book = openpyxl.load_workbook(path, read_only=True, data_only=True, keep_links=False)
+        self.sheet = self.book.worksheets[0]
+        # 部分导出文件的尺寸信息不准确，按实际内容读取
+        self.sheet.reset_dimensions()
+
+    def head(self, n):
+        return [list(r) for r in self.sheet.iter_rows(max_row=n, values_only=True)]
+
+    def columns(self, positions, start):
+        result = {p: [] for p in positions}
+        appenders = [(p, result[p].append) for p in positions]
+        max_col = max(positions) + 1
+        for row in self.sheet.iter_rows(min_row=start + 1, max_col=max_col, values_only=True):
+            width = len(row)
+            for p, append in appenders:
+                append(row[p] if p < width else None)
+        return result
+
+    def close(self):
+        self.book.close()
+
+
+class _PandasSource(_Source):
+    """兜底：交给 pandas.read_excel，仍然只取需要的列"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def head(self, n):
+        df = pd.read_excel(self.path, header=None, nrows=n, dtype=object)
+        return df.astype(object).where(df.notna(), None).values.tolist()
+
+    def columns(self, positions, start):
+        df = pd.read_excel(self.path, header=None, skiprows=start, usecols=positions, dtype=object)
+        return {p: df[p].tolist() if p in df.columns else [] for p in positions}
+
+
+ENGINES = {
+    "calamine": _CalamineSource,
+    "xlrd": _XlrdSource,
+    "openpyxl": _OpenpyxlSource,
+    "pandas": _PandasSource,
+}
+
+
+def has_calamine() -> bool:
+    return importlib.util.find_spec("python_calamine") is not None
+
+
+def select_engine(path) -> str:
+    """选择读取引擎，可通过环境变量 QUICKFINANCE_READER 指定"""
+    engine = os.environ.get("QUICKFINANCE_READER")
+    if engine:
+        if engine not in ENGINES:
+            raise ValueError(f"未知的读取引擎: {engine}")
+        return engine
+    if has_calamine():
+        return "calamine"
+    ext = os.path.splitext(os.fspath(path))[1].lower()
+    if ext == ".xls":
+        return "xlrd"
+    if ext in (".xlsx", ".xlsm"):
+        return "openpyxl"
+    return "pandas"
+
+
+def header_name(value) -> str:
+    return "" if value is None else str(value).replace(" ", "").replace("\u3000", "")
+
+
+def normalize_header(values) -> list[str]:
+    """表头去掉空格，重复列名依次加 .1 .2 下标"""
+    names = pd.Series([header_name(v) for v in values], dtype=object)
+    nth = names.groupby(names, sort=False).cumcount()
+    return names.where(nth == 0, names + "." + nth.astype(str)).tolist()
+
+
+def is_item_header(name) -> bool:
+    return _HEADER_NOTE_RE.sub("", name) in ITEM_HEADERS
+
+
+@dataclass
+class Layout:
+    # 表头所在行（从 0 开始）
+    header_row: int
+    # 每一栏的 (项目列, 金额列) 位置，从左到右
+    blocks: list[tuple[int, int]]
+
+
+def detect_layout(rows: list[list], amount_headers) -> Layout | None:
+    """
+    rows: 工作表前若干行
+    amount_headers: 可接受的金额列表头，按优先级排列（如 ("期末余额", "期末数")）
+    返回第一个能组成至少一栏 (项目, 金额) 的表头行，找不到时返回 None
+    """
+    for i, row in enumerate(rows):
+        names = [header_name(v) for v in row]
+        items = [p for p, name in enumerate(names) if is_item_header(name)]
+        blocks = []
+        for k, start in enumerate(items):
+            end = items[k + 1] if k + 1 < len(items) else len(names)
+            # 本栏内每个表头第一次出现的位置
+            first = {}
+            for p in range(start + 1, end):
+                first.setdefault(names[p], p)
+            amount = next((first[h] for h in amount_headers if h in first), None)
+            if amount is not None:
+                blocks.append((start, amount))
+        if blocks:
+            return Layout(i, blocks)
+    return None
+
+
+def find_header(rows: list[list]) -> int:
+    """返回第一个包含“项目”单元格的行号，找不到时使用 HEADER_ROW"""
+    for i, row in enumerate(rows):
+        if any(isinstance(v, str) and v.replace(" ", "") == "项目" for v in row):
+            return i
+    return HEADER_ROW
+
+
+def _to_na(values: list) -> list:
+    return [None if v is None or v in NA_VALUES else v for v in values]
+
+
+def read_statement(path, columns=None, engine=None, metrics=None, **info) -> pd.DataFrame:
+    """
+    读取报表，返回以表头命名（去空格、重复列加下标）的 DataFrame
+    columns: 需要的列名（如 ["项目", "期末余额", "项目.1", "期末余额.1"]），None 表示全部列
+    metrics: RunMetrics，记录 read（打开文件、解码数据列）与 header（定位表头、规范列名）阶段，
+             info 为附加到记录中的信息（如报表类型）
+    """
+    engine = engine or select_engine(path)
+    with stage(metrics, "read", engine=engine, step="open", **info):
+        source = ENGINES[engine](path)
+    try:
+        with stage(metrics, "header", engine=engine, **info) as st:
+            head = source.head(HEADER_SCAN_ROWS)
+            header = find_header(head)
+            names = normalize_header(head[header] if header < len(head) else [])
+            st["header_row"] = header
+        if columns is None:
+            positions = [i for i, n in enumerate(names) if n]
+        else:
+            wanted = set(columns)
+            positions = [i for i, n in enumerate(names) if n in wanted]
+        if not positions:
+            return pd.DataFrame(columns=list(columns or []))
+        with stage(metrics, "read", engine=engine, **info) as st:
+            data = source.columns(positions, header + 1)
+            df = pd.DataFrame({names[p]: pd.Series(_to_na(data[p]), dtype=object) for p in positions})
+            st["rows"] = len(df)
+    finally:
+        source.close()
+    return df
+
+
+def read_blocks(path, amount_headers, amount_name, engine=None, metrics=None, **info) -> pd.DataFrame:
+    """
+    按 detect_layout 识别的版式读取报表，只解码各栏的项目列与金额列
+    返回列名统一为 项目, amount_name, 项目.1, amount_name.1, ... 的 DataFrame
+    metrics / info 同 read_statement
+    """
+    engine = engine or select_engine(path)
+    with stage(metrics, "read", engine=engine, step="open", **info):
+        source = ENGINES[engine](path)
+    try:
+        with stage(metrics, "header", engine=engine, **info) as st:
+            layout = detect_layout(source.head(HEADER_SCAN_ROWS), amount_headers)
+            if layout is None:
+                raise ValueError(
+                    f"{os.path.basename(os.fspath(path))}: 前 {HEADER_SCAN_ROWS} 行中未找到"
+                    f"“项目”与“{amount_name}”表头"
+                )
+            st["header_row"] = layout.header_row
+            st["blocks"] = len(layout.blocks)
+        positions = sorted({p for block in layout.blocks for p in block})
+        with stage(metrics, "read", engine=engine, **info) as st:
+            data = source.columns(positions, layout.header_row + 1)
+            columns = {}
+            for k, (item, amount) in enumerate(layout.blocks):
+                suffix = f".{k}" if k else ""
+                columns[f"项目{suffix}"] = pd.Series(_to_na(data[item]), dtype=object)
+                columns[f"{amount_name}{suffix}"] = pd.Series(_to_na(data[amount]), dtype=object)
+            df = pd.DataFrame(columns)
+            st["rows"] = len(df)
+    finally:
+        source.close()
+    return df
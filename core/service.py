@@ -0,0 +1,265 @@
+"""
+本地生成服务：多人共用一个进程池与解析缓存，相同的文件只解码一次
+
+    python cli.py serve --port 8765 -j 2
+
+接口（JSON）：
+    POST /jobs               {template, ofp, profit, flow, year, writer?, year_columns?, aliases?, formulas?}
+                             aliases 为 {别名: 项目名称} 或别名表路径
+                             -> {id, status, deduplicated}
+    GET  /jobs/<id>          -> {id, status, error, elapsed, metrics}
+    GET  /jobs/<id>/result   -> 生成的 xlsx
+    GET  /health             -> {status, workers, pending}
+
+- 路径为服务所在机器上的路径（共享目录）；默认只监听 127.0.0.1；
+- 任务按 输入文件内容哈希 + 参数 去重：相同任务正在排队/执行时直接返回同一个 id，
+  已完成且结果文件仍在时不再重新生成；
+- 待执行任务超过 max_pending 时返回 503；
+- 结果文件保存在 .quickfinance_cache/service/ 中
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from core.batch import Job, JobResult, run_job
+from core.files import cache_dir, file_hash
+from core.pipeline import PARSER_VERSION
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+# 最多保留多少条已结束任务的状态
+MAX_FINISHED = 1000
+
+
+class ServiceBusy(Exception):
+    """待执行任务已满"""
+
+
+@dataclass
+class ServiceJob:
+    id: str
+    request: dict
+    output: str
+    created: float = field(default_factory=time.time)
+    future: object = None
+    result: JobResult | None = None
+
+    @property
+    def status(self) -> str:
+        if self.result is not None:
+            return "done" if self.result.ok else "failed"
+        if self.future is not None and self.future.running():
+            return "running"
+        return "queued"
+
+    def to_dict(self) -> dict:
+        data = {"id": self.id, "status": self.status, "created": self.created}
+        if self.result is not None:
+            data.update(error=self.result.error, elapsed=self.result.elapsed, metrics=self.result.metrics)
+        return data
+
+
+def _file_digest(path) -> str:
+    return file_hash(path) if path else ""
+
+
+class GenerationService:
+    def __init__(self, workers=2, max_pending=32, results_dir=None, on_result=None):
+        """on_result: 每完成一个任务回调一次 on_result(任务)"""
+        self.workers = workers
+        self.max_pending = max_pending
+        self.results_dir = results_dir or cache_dir("service")
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.on_result = on_result
+        self.jobs: dict[str, ServiceJob] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def parse_request(request: dict) -> dict:
+        """校验并规范化提交的参数"""
+        missing = [k for k in ("template", "ofp", "year") if not request.get(k)]
+        if missing:
+            raise ValueError(f"缺少字段: {', '.join(missing)}")
+        parsed = {
+            "template": str(request["template"]),
+            "ofp": str(request["ofp"]),
+            "profit": str(request.get("profit") or ""),
+            "flow": str(request.get("flow") or ""),
+            "year": str(request["year"]),
+            "writer": request.get("writer") or "openpyxl",
+        }
+        if parsed["writer"] not in ("openpyxl", "patch"):
+            raise ValueError(f"未知的写入方式: {parsed['writer']}")
+        year_columns = request.get("year_columns")
+        if year_columns and not isinstance(year_columns, dict):
+            raise ValueError("year_columns 应为对象")
+        parsed["year_columns"] = year_columns or None
+        aliases = request.get("aliases")
+        if aliases and not isinstance(aliases, (dict, str)):
+            raise ValueError("aliases 应为对象或别名表路径")
+        parsed["aliases"] = aliases or None
+        parsed["formulas"] = bool(request.get("formulas"))
+        return parsed
+
+    def job_key(self, request: dict) -> str:
+        """输入文件内容 + 参数 的哈希；文件不存在时抛出 OSError"""
+        aliases = request["aliases"]
+        payload = [
+            PARSER_VERSION,
+            [_file_digest(request[k]) for k in ("template", "ofp", "profit", "flow")],
+            [request[k] for k in ("year", "writer", "year_columns", "formulas")],
+            # 别名表路径按文件内容计入
+            _file_digest(aliases) if isinstance(aliases, str) else aliases,
+        ]
+        return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def pending(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.result is None)
+
+    def submit(self, request: dict) -> tuple[ServiceJob, bool]:
+        """提交任务，返回 (任务, 是否与已有任务重复)"""
+        request = self.parse_request(request)
+        key = self.job_key(request)
+        job_id = key[:16]
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                if job.result is None or (job.result.ok and os.path.exists(job.output)):
+                    return job, True
+            if self.pending() >= self.max_pending:
+                raise ServiceBusy(f"排队任务已达上限 {self.max_pending}")
+            output = str(self.results_dir / f"{key}.xlsx")
+            job = ServiceJob(job_id, request, output)
+            sources = {request["year"]: (request["ofp"], request["profit"], request["flow"])}
+            options = {
+                "writer": request["writer"],
+                "year_columns": request["year_columns"],
+                "aliases": request["aliases"],
+                "formulas": request["formulas"],
+                "parallel": False,
+            }
+            job.future = self.executor.submit(run_job, Job(request["template"], output, sources), options)
+            self.jobs[job_id] = job
+            self._prune()
+        # 任务已经结束时回调会在当前线程中立即执行，_finished 需要获取锁，因此在释放锁之后注册
+        job.future.add_done_callback(lambda f, job=job: self._finished(job, f))
+        return job, False
+
+    def _finished(self, job: ServiceJob, future):
+        try:
+            result = future.result()
+        except Exception as e:
+            # 工作进程异常退出等情况
+            result = JobResult(None, False, 0.0, f"{type(e).__name__}: {e}")
+        with self._lock:
+            job.result = result
+        if self.on_result:
+            self.on_result(job)
+
+    def _prune(self):
+        finished = [job for job in self.jobs.values() if job.result is not None]
+        for job in sorted(finished, key=lambda j: j.created)[:max(0, len(finished) - MAX_FINISHED)]:
+            del self.jobs[job.id]
+
+    def get(self, job_id) -> ServiceJob | None:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+_JOB_RE = re.compile(r"^/jobs/([0-9a-f]+)(/result)?$")
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    server_version = "QuickFinance"
+
+    @property
+    def service(self) -> GenerationService:
+        return self.server.service
+
+    def _json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message):
+        self._json(status, {"error": message})
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._json(HTTPStatus.OK, {"status": "ok", "workers": self.service.workers,
+                                       "pending": self.service.pending()})
+            return
+        m = _JOB_RE.match(self.path)
+        job = self.service.get(m.group(1)) if m else None
+        if job is None:
+            self._error(HTTPStatus.NOT_FOUND, "任务不存在")
+            return
+        if not m.group(2):
+            self._json(HTTPStatus.OK, job.to_dict())
+            return
+        if job.status != "done":
+            self._error(HTTPStatus.CONFLICT, f"任务状态为 {job.status}")
+            return
+        try:
+            with open(job.output, "rb") as f:
+                body = f.read()
+        except OSError:
+            self._error(HTTPStatus.GONE, "结果文件已被删除，请重新提交")
+            return
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", XLSX_MIME)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Content-Disposition", f'attachment; filename="{job.id}.xlsx"')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path != "/jobs":
+            self._error(HTTPStatus.NOT_FOUND, "未知的接口")
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("请求体应为 JSON 对象")
+            job, deduplicated = self.service.submit(request)
+        except ServiceBusy as e:
+            self._error(HTTPStatus.SERVICE_UNAVAILABLE, str(e))
+        except (ValueError, OSError) as e:
+            self._error(HTTPStatus.BAD_REQUEST, str(e))
+        else:
+            data = job.to_dict()
+            data["deduplicated"] = deduplicated
+            self._json(HTTPStatus.ACCEPTED, data)
+
+    def log_message(self, format, *args):
+        if os.environ.get("QUICKFINANCE_DEBUG"):
+            super().log_message(format, *args)
+
+
+def serve(host="127.0.0.1", port=8765, workers=2, max_pending=32, ready=None, on_result=None):
+    """启动服务并阻塞，直到 KeyboardInterrupt；ready(server) 在开始监听后调用"""
+    service = GenerationService(workers, max_pending, on_result=on_result)
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.daemon_threads = True
+    server.service = service
+    if ready:
+        ready(server)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        service.shutdown()
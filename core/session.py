@@ -0,0 +1,216 @@
+"""
+工作簿会话：在内存中保留已加载的模板与最近一次填充结果，反复修改时只重算、改写受影响的单元格
+
+    session = WorkbookSession("tmpl.xlsx")
+    session.update("2024", "OFP.xlsx", "PROFIT.xlsx", "FLOW.xlsx")   # 首次：加载模板并填充
+    session.update("2024", "OFP.xlsx", "PROFIT_v2.xlsx", "FLOW.xlsx") # 只重新读取利润表，只改写变化的单元格
+    session.remove_year("2024")                                       # 该列恢复为模板原值
+    session.save("out.xlsx")                                          # 保存由调用方决定何时进行
+
+源文件按内容哈希判断是否变化，未变化的报表直接复用内存中的解析结果；
+模板文件内容变化时整个会话重新加载。formulas 为 True 时会话同时保留模板的公式依赖图，
+每次改写后只重算受影响的公式单元格，保存时把公式结果一并写入
+"""
+
+import threading
+
+import openpyxl
+import pandas as pd
+
+from core import pipeline
+from core.files import file_hash
+from core.formula import load_graph
+from core.matching import ItemIndex
+from core.metrics import stage
+from core.preview import PREVIEW_COLUMNS, match_table
+from core.template import YEAR_COLUMNS, load_plan
+from core.xlsx_patch import set_cached_values
+
+
+class WorkbookSession:
+    def __init__(self, template_path, year_columns=None, aliases=None, use_cache=True, formulas=False):
+        self.template_path = template_path
+        # 创建会话时的参数，调用方据此判断能否复用
+        self.args = {"year_columns": year_columns, "aliases": aliases, "use_cache": use_cache, "formulas": formulas}
+        self.year_columns = year_columns or YEAR_COLUMNS
+        self.aliases = pipeline.resolve_aliases(aliases)
+        self.use_cache = use_cache
+        self.formulas = formulas
+        # 模板公式依赖图，formulas 为 True 时随模板加载
+        self.graph = None
+        self.workbook = None
+        self.plan = None
+        self.index = None
+        self._template_hash = None
+        # (年份, 报表类型) -> (路径, 内容哈希, Series)
+        self._series: dict[tuple, tuple] = {}
+        # 年份 -> 当前写入的 {(行, 列): 值}
+        self._cells: dict[str, dict] = {}
+        # 被改写过的单元格 -> 模板中的原值与数字格式，用于撤销
+        self._original: dict[tuple, tuple] = {}
+        # 模板重新加载后需要重新写入的其它年份
+        self._pending_years: list[str] = []
+        self.dirty = False
+        # GUI 中更新与保存可能来自不同线程
+        self._lock = threading.Lock()
+
+    @property
+    def years(self) -> list[str]:
+        return list(self._cells)
+
+    def _ensure_template(self, metrics=None):
+        """首次使用或模板内容变化时（重新）加载模板"""
+        digest = file_hash(self.template_path)
+        if self.workbook is not None and digest == self._template_hash:
+            return
+        with stage(metrics, "template_load", step="plan"):
+            self.plan = load_plan(self.template_path, self.year_columns)
+            self.index = ItemIndex(self.plan.keys, self.aliases)
+        with stage(metrics, "template_load", step="workbook"):
+            self.workbook = openpyxl.load_workbook(self.template_path)
+        if self.formulas:
+            with stage(metrics, "formula", step="graph"):
+                self.graph = load_graph(self.template_path)
+        self._template_hash = digest
+        self._original.clear()
+        # 已有年份需要在新模板上重新写入
+        previous, self._cells = self._cells, {}
+        self._pending_years = list(previous)
+        self.dirty = True
+
+    def _statement(self, year, flag, path, progress=None, metrics=None) -> tuple[tuple, bool]:
+        """
+        报表内容未变化时复用内存中的解析结果，返回 ((路径, 内容哈希, Series), 是否重新读取)
+        不修改会话，由 update 在写入工作簿成功后一并记录
+        """
+        digest = file_hash(path)
+        cached = self._series.get((year, flag))
+        if cached is not None and cached[0] == path and cached[1] == digest:
+            pipeline._report(progress, "reading", flag)
+            pipeline._report(progress, "parsing", flag)
+            return cached, False
+        series = pipeline.load_statement(path, flag, self.use_cache, progress, metrics)
+        return (path, digest, series), True
+
+    def _apply(self, year, cells, formats):
+        """只改写与上次不同的单元格，上次写过、这次没有的单元格恢复为模板原值"""
+        sheet = self.workbook[self.plan.sheet]
+        old = self._cells.get(year, {})
+        changed = 0
+        # 本次改写的单元格 -> 新值，用于重算公式
+        written = {}
+        for pos in old.keys() - cells.keys():
+            # 上次改写中途失败时该单元格可能已经恢复过
+            original = self._original.pop(pos, None)
+            if original is None:
+                continue
+            value, fmt = original
+            cell = sheet.cell(row=pos[0], column=pos[1])
+            cell.value = value
+            cell.number_format = fmt
+            written[pos] = value
+            changed += 1
+        for pos, value in cells.items():
+            if pos in old and old[pos] == value:
+                continue
+            cell = sheet.cell(row=pos[0], column=pos[1])
+            if pos not in self._original:
+                self._original[pos] = (cell.value, cell.number_format)
+            cell.value = value
+            fmt = formats.get(pos)
+            if fmt:
+                cell.number_format = fmt
+            written[pos] = value
+            changed += 1
+        if self.graph is not None and written:
+            self.graph.recalc({(self.plan.sheet, row, col): value for (row, col), value in written.items()})
+        self._cells[year] = cells
+        if changed:
+            self.dirty = True
+        return changed
+
+    def update(self, year, input_ofp_path, input_profit_path, input_flow_path, progress=None, metrics=None) -> int:
+        """
+        设置某个年份的源文件并刷新该列，返回改写的单元格数
+        只重新读取内容变化的报表；不保存，需调用 save
+        """
+        year = str(year)
+        with self._lock:
+            self._ensure_template(metrics)
+            sources = pipeline.statement_sources(input_ofp_path, input_profit_path, input_flow_path)
+            # 该年份尚未写入（首次或模板重新加载后）时必须写入
+            # 新读取的结果先放在 staged 中，工作簿改写成功后才记入会话：
+            # 读取或写入中途取消、出错时会话仍对应工作簿中的旧值，重试时会重新写入
+            staged, changed = {}, year not in self._cells
+            for flag, path in sources.items():
+                staged[flag], reloaded = self._statement(year, flag, path, progress, metrics)
+                changed = changed or reloaded
+            # 不再使用的报表（如清空了利润表）不再保留
+            stale = [k for k in self._series if k[0] == year and k[1] not in sources]
+            if not (changed or stale):
+                # 所有输入都未变化，工作簿无需改动
+                pipeline._report(progress, "writing")
+                return 0
+            series = {flag: entry[2] for flag, entry in staged.items()}
+            data = pipeline.merge_statements(series, metrics)
+
+            pipeline._report(progress, "writing")
+            with stage(metrics, "cell_write", step="session") as st:
+                values, unmatched = self.index.resolve(data)
+                cells, formats = pipeline.fill_cells(self.plan, values, year)
+                changed = self._apply(year, cells, formats)
+                st["rows"] = changed
+            for key in stale:
+                del self._series[key]
+            for flag, entry in staged.items():
+                self._series[(year, flag)] = entry
+            if metrics is not None:
+                pipeline.record_matches(metrics, year, data, values, unmatched)
+            # 模板重新加载后，其它年份用内存中的数据重新写入
+            for other in self._pending_years:
+                if other != year:
+                    self._refill(other)
+            self._pending_years = []
+            return changed
+
+    def _refill(self, year):
+        series = {flag: s for (y, flag), (_, _, s) in self._series.items() if y == year}
+        if "OFP" not in series:
+            return
+        values, _ = self.index.resolve(pipeline.merge_statements(series))
+        self._apply(year, *pipeline.fill_cells(self.plan, values, year))
+
+    def remove_year(self, year) -> int:
+        """撤销某个年份写入的内容（恢复模板原值），返回改写的单元格数"""
+        year = str(year)
+        with self._lock:
+            if year not in self._cells:
+                return 0
+            changed = self._apply(year, {}, {})
+            del self._cells[year]
+            for key in [k for k in self._series if k[0] == year]:
+                del self._series[key]
+            return changed
+
+    def preview(self, year) -> pd.DataFrame:
+        """某个年份的匹配明细（见 core.preview.match_table），不改动工作簿；该年份没有数据时返回空表"""
+        year = str(year)
+        with self._lock:
+            series = {flag: s for (y, flag), (_, _, s) in self._series.items() if y == year}
+            if self.plan is None or "OFP" not in series:
+                return pd.DataFrame(columns=list(PREVIEW_COLUMNS))
+            return match_table(series, self.plan, self.index)
+
+    def save(self, output_path, progress=None, metrics=None):
+        """保存当前工作簿；会话保持打开，可继续修改后再次保存"""
+        with self._lock:
+            if self.workbook is None:
+                raise ValueError("会话中还没有任何数据")
+            pipeline._report(progress, "saving")
+            with stage(metrics, "save", writer="session"):
+                self.workbook.save(output_path)
+            if self.graph is not None:
+                with stage(metrics, "formula", step="save"):
+                    set_cached_values(output_path, self.graph.cached_values())
+            self.dirty = False
+        return output_path
@@ -0,0 +1,242 @@
+"""
+解析结果的进程间传递：把若干张 项目 -> 金额 表写入一个内存映射文件，工作进程映射同一文件读取，不经过 pickle
+
+    path = share({"2023": {项目: 金额}, "2024": series})   # 写入一次，返回文件路径（可直接传给子进程）
+    with attach(path) as data:                              # 映射文件，金额数组不复制
+        data["2023"]          # 只读的 {项目: 金额} 映射，可直接交给 ItemIndex.resolve / write_years
+        data.series("2024")   # pd.Series，金额直接引用映射的内存（copy=True 时复制）
+    release(path)
+
+文件格式：MAGIC + 头部长度(uint32) + JSON 头部，之后为按 64 字节对齐的数组
+    keys          所有表的项目名称去重后以 \\0 连接的 UTF-8 字节
+    <i>.ids       第 i 张表各行的项目编号 (int32)，保持原有顺序
+    <i>.amounts   第 i 张表各行的金额 (float64)
+项目名称只存一份，多个年份 / 报表共用；文件放在临时目录（可用环境变量 QUICKFINANCE_SHARED 修改）
+"""
+
+import json
+import os
+import tempfile
+import time
+from collections.abc import Mapping
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b"QFSHARE1"
+ALIGN = 64
+SUFFIX = ".qfshare"
+
+# 超过该时间仍未删除的文件（进程被强制结束、Windows 下仍被映射等）在下次写入时清理
+STALE_SECONDS = 24 * 3600
+
+SHARED_DIR = Path(os.environ.get("QUICKFINANCE_SHARED", Path(tempfile.gettempdir()) / "quickfinance-shared"))
+
+
+def _sweep(root: Path):
+    cutoff = time.time() - STALE_SECONDS
+    for entry in os.scandir(root):
+        try:
+            if entry.name.endswith(SUFFIX) and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def _columns(table) -> tuple[np.ndarray, np.ndarray, dict]:
+    """Series 或 {项目: 金额} -> (项目数组, float64 金额数组, 表信息)"""
+    if isinstance(table, pd.Series):
+        info = {"label": None if table.name is None else str(table.name), "index": table.index.name}
+        return table.index.to_numpy(dtype=object), table.to_numpy(dtype="float64"), info
+    items = np.fromiter(table.keys(), dtype=object, count=len(table))
+    return items, np.fromiter(table.values(), dtype="float64", count=len(table)), {}
+
+
+def share(tables: dict, root=None) -> str:
+    """
+    tables: {名称: pd.Series 或 {项目: 金额}}，项目名称按字符串保存
+    写入新的共享文件并返回其路径，用完后由创建方调用 release
+    """
+    root = Path(root) if root else SHARED_DIR
+    root.mkdir(parents=True, exist_ok=True)
+    _sweep(root)
+
+    columns = [_columns(table) for table in tables.values()]
+    all_items = np.concatenate([items for items, _, _ in columns]) if columns else np.array([], dtype=object)
+    codes, uniques = pd.factorize(all_items)
+    if (codes < 0).any():
+        raise ValueError("项目名称不能为空")
+    try:
+        text = "\0".join(uniques)
+    except TypeError:
+        text = "\0".join(map(str, uniques))
+    if text.count("\0") != max(len(uniques) - 1, 0):
+        raise ValueError("项目名称中不能包含 \\0 字符")
+    arrays = {"keys": np.frombuffer(text.encode("utf-8"), dtype=np.uint8)}
+    meta = {}
+    start = 0
+    for i, (name, (items, amounts, info)) in enumerate(zip(tables, columns)):
+        arrays[f"{i}.ids"] = codes[start:start + len(items)].astype(np.int32)
+        arrays[f"{i}.amounts"] = amounts
+        meta[str(name)] = dict(info, id=i, rows=len(items))
+        start += len(items)
+
+    layout = {}
+    offset = 0
+    for key, array in arrays.items():
+        layout[key] = [array.dtype.str, len(array), offset]
+        offset += -(-array.nbytes // ALIGN) * ALIGN
+    header = json.dumps({"count": len(uniques), "tables": meta, "arrays": layout}, ensure_ascii=False).encode("utf-8")
+    base = -(-(len(MAGIC) + 4 + len(header)) // ALIGN) * ALIGN
+
+    fd, path = tempfile.mkstemp(suffix=SUFFIX, dir=root)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC + len(header).to_bytes(4, "little") + header)
+            for key, array in arrays.items():
+                f.seek(base + layout[key][2])
+                f.write(memoryview(np.ascontiguousarray(array)).cast("B"))
+            f.truncate(base + offset)
+    except BaseException:
+        release(path)
+        raise
+    return path
+
+
+def release(path):
+    """删除共享文件；Windows 下文件仍被映射时保留，由之后的 share 按时间清理"""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class SharedTable(Mapping):
+    """
+    共享文件中一张表的只读 {项目: 金额} 视图，与 dict(zip(项目, 金额)) 一致：
+    同名项目以最后一行的金额为准，迭代按项目首次出现的顺序，长度为去重后的项目数
+    """
+
+    def __init__(self, data: "SharedData", ids: np.ndarray, amounts: np.ndarray):
+        self._data = data
+        self.ids = ids
+        self.amounts = amounts
+        self._positions = None
+        self._keys = None
+
+    def _index(self):
+        """首次使用时建立 项目编号 -> 行号（最后一行）与去重后的项目编号（按首次出现顺序）"""
+        if self._positions is None:
+            positions = np.full(self._data.count, -1, dtype=np.int64)
+            positions[self.ids] = np.arange(len(self.ids))
+            _, first = np.unique(self.ids, return_index=True)
+            self._keys = self.ids[np.sort(first)]
+            self._positions = positions
+        return self._positions, self._keys
+
+    def _position(self, item):
+        key_id = self._data.key_ids.get(item)
+        if key_id is None:
+            return -1
+        return self._index()[0][key_id]
+
+    def __contains__(self, item):
+        return self._position(item) >= 0
+
+    def __getitem__(self, item):
+        position = self._position(item)
+        if position < 0:
+            raise KeyError(item)
+        return float(self.amounts[position])
+
+    def __iter__(self):
+        names = self._data.names
+        return (names[i] for i in self._index()[1].tolist())
+
+    def __len__(self):
+        return len(self._index()[1])
+
+    def items(self):
+        names = self._data.names
+        positions, keys = self._index()
+        return zip([names[i] for i in keys.tolist()], self.amounts[positions[keys]].tolist())
+
+
+class SharedData:
+    """attach 的结果；数组都是映射内存上的只读视图"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._map = np.memmap(self.path, dtype=np.uint8, mode="r")
+        if bytes(self._map[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"不是共享数据文件: {self.path}")
+        size = int.from_bytes(bytes(self._map[len(MAGIC):len(MAGIC) + 4]), "little")
+        start = len(MAGIC) + 4
+        header = json.loads(bytes(self._map[start:start + size]).decode("utf-8"))
+        base = -(-(start + size) // ALIGN) * ALIGN
+        self.count = header["count"]
+        self.tables = header["tables"]
+        self._arrays = {}
+        for key, (dtype, length, offset) in header["arrays"].items():
+            dtype = np.dtype(dtype)
+            begin = base + offset
+            self._arrays[key] = self._map[begin:begin + length * dtype.itemsize].view(dtype)
+        self._names = None
+        self._key_ids = None
+
+    @property
+    def names(self) -> list[str]:
+        """项目名称列表（下标为项目编号），首次使用时解码一次"""
+        if self._names is None:
+            text = bytes(self._arrays["keys"]).decode("utf-8")
+            self._names = text.split("\0") if self.count else []
+        return self._names
+
+    @property
+    def key_ids(self) -> dict[str, int]:
+        if self._key_ids is None:
+            self._key_ids = dict(zip(self.names, range(self.count)))
+        return self._key_ids
+
+    def _table(self, name):
+        if name not in self.tables:
+            raise KeyError(name)
+        i = self.tables[name]["id"]
+        return self._arrays[f"{i}.ids"], self._arrays[f"{i}.amounts"]
+
+    def __contains__(self, name):
+        return name in self.tables
+
+    def __getitem__(self, name) -> SharedTable:
+        return SharedTable(self, *self._table(name))
+
+    def keys(self):
+        return self.tables.keys()
+
+    def mappings(self) -> dict[str, SharedTable]:
+        """{名称: 只读映射}，可直接代替 {年份: {项目: 金额}} 使用"""
+        return {name: self[name] for name in self.tables}
+
+    def series(self, name, copy=False) -> pd.Series:
+        ids, amounts = self._table(name)
+        info = self.tables[name]
+        names = np.array(self.names, dtype=object)
+        index = pd.Index(names[ids], name=info.get("index"))
+        values = np.array(amounts) if copy else amounts
+        return pd.Series(values, index=index, name=info.get("label"), copy=False)
+
+    def close(self):
+        """释放映射；仍在使用的视图（series(copy=False) 的结果等）会保持映射直到被回收"""
+        self._arrays = {}
+        self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach(path) -> SharedData:
+    return SharedData(path)
@@ -0,0 +1,172 @@
+"""
+报表库：把每次解析的报表按 (单位, 期间, 报表类型, 项目) 保存在本地 SQLite 中
+
+    store = StatementStore("statements.sqlite")
+    pipeline.generate_years(..., store=store, entity="甲公司")    # 生成时顺带写入
+    store.data("甲公司", "2023")                                  # {项目: 金额}，不再读取 Excel
+    store.trend(["货币资金", "营业收入"], entities=["甲公司"])      # 多期、多单位的对比
+
+- 同一 (单位, 期间, 报表类型) 再次写入时整体替换，并记录来源文件与内容哈希；
+- 主键即 (单位, 期间, 报表类型, 项目)，另有 (项目, 期间) 索引，按项目跨单位、跨期间查询同样走索引；
+- WAL 模式，批量生成时多个工作进程可同时写入
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from core.files import CACHE_ROOT, file_hash
+
+DEFAULT_STORE = CACHE_ROOT / "statements.sqlite"
+# 合并为 {项目: 金额} 时的覆盖顺序，与 pipeline.merge_statements 一致
+STATEMENT_ORDER = ("OFP", "PROFIT", "FLOW")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS statements (
+    entity TEXT NOT NULL,
+    period TEXT NOT NULL,
+    statement TEXT NOT NULL,
+    source TEXT,
+    source_hash TEXT,
+    rows INTEGER,
+    loaded_at TEXT,
+    PRIMARY KEY (entity, period, statement)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS amounts (
+    entity TEXT NOT NULL,
+    period TEXT NOT NULL,
+    statement TEXT NOT NULL,
+    item TEXT NOT NULL,
+    amount REAL,
+    PRIMARY KEY (entity, period, statement, item)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS amounts_item ON amounts (item, period);
+"""
+
+
+class StatementStore:
+    def __init__(self, path=None):
+        self.path = str(path or DEFAULT_STORE)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 每个线程一个连接（sqlite3 连接不能跨线程使用）
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def put(self, entity, period, statement, series: pd.Series, source=None):
+        """写入一张报表（替换同一单位、期间、报表类型的旧数据）；同名项目以后出现的为准"""
+        entity, period = str(entity), str(period)
+        source_hash = file_hash(source) if source else None
+        source = os.path.abspath(source) if source else None
+        rows = [(entity, period, statement, str(item), float(amount)) for item, amount in series.items()]
+        with self._connect() as conn:
+            conn.execute("DELETE FROM amounts WHERE entity = ? AND period = ? AND statement = ?",
+                         (entity, period, statement))
+            conn.executemany("INSERT OR REPLACE INTO amounts VALUES (?, ?, ?, ?, ?)", rows)
+            conn.execute("INSERT OR REPLACE INTO statements VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (entity, period, statement, source, source_hash, len(rows),
+                          datetime.now().isoformat(timespec="seconds")))
+
+    def put_statements(self, entity, period, series: dict, sources: dict | None = None):
+        """series: {报表类型: Series}，sources: {报表类型: 来源文件}"""
+        for statement, values in series.items():
+            self.put(entity, period, statement, values, (sources or {}).get(statement))
+
+    def get(self, entity, period, statement) -> pd.Series:
+        rows = self._connect().execute(
+            "SELECT item, amount FROM amounts WHERE entity = ? AND period = ? AND statement = ?",
+            (str(entity), str(period), statement),
+        ).fetchall()
+        items = [r[0] for r in rows]
+        return pd.Series([r[1] for r in rows], index=pd.Index(items, dtype=object, name="项目"), dtype="float64")
+
+    def data(self, entity, period) -> dict:
+        """某单位某期间合并后的 {项目: 金额}，覆盖顺序与生成时相同（资产负债表 < 利润表 < 现金流量表）"""
+        rows = self._connect().execute(
+            "SELECT statement, item, amount FROM amounts WHERE entity = ? AND period = ?",
+            (str(entity), str(period)),
+        ).fetchall()
+        order = {s: i for i, s in enumerate(STATEMENT_ORDER)}
+        rows.sort(key=lambda r: order.get(r[0], len(order)))
+        return {item: amount for _, item, amount in rows}
+
+    def statements(self, entity=None) -> pd.DataFrame:
+        """已保存的报表清单"""
+        sql = "SELECT entity, period, statement, rows, source, loaded_at FROM statements"
+        params = ()
+        if entity is not None:
+            sql += " WHERE entity = ?"
+            params = (str(entity),)
+        return pd.read_sql_query(sql + " ORDER BY entity, period, statement", self._connect(), params=params)
+
+    def is_current(self, entity, period, statement, source) -> bool:
+        """来源文件内容与保存时相同"""
+        row = self._connect().execute(
+            "SELECT source_hash FROM statements WHERE entity = ? AND period = ? AND statement = ?",
+            (str(entity), str(period), statement),
+        ).fetchone()
+        return row is not None and row[0] == file_hash(source)
+
+    def query(self, items=None, entities=None, periods=None, statements=None) -> pd.DataFrame:
+        """按条件查询，返回列为 entity, period, statement, item, amount 的长表"""
+        clauses, params = [], []
+        for column, values in (("item", items), ("entity", entities), ("period", periods),
+                               ("statement", statements)):
+            if values:
+                values = [str(v) for v in values]
+                clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        sql = "SELECT entity, period, statement, item, amount FROM amounts"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        return pd.read_sql_query(sql, self._connect(), params=params)
+
+    def trend(self, items=None, entities=None, periods=None) -> pd.DataFrame:
+        """多期对比表：行为 (单位, 项目)，列为期间；同一期间多张报表有同名项目时按生成时的覆盖顺序取值"""
+        df = self.query(items, entities, periods)
+        if df.empty:
+            return pd.DataFrame()
+        order = {s: i for i, s in enumerate(STATEMENT_ORDER)}
+        df["order"] = df["statement"].map(order).fillna(len(order))
+        df = df.sort_values("order", kind="stable").drop_duplicates(["entity", "period", "item"], keep="last")
+        return df.pivot(index=["entity", "item"], columns="period", values="amount").sort_index(axis=1)
+
+
+# 数据库路径 -> StatementStore，每个进程每个路径只打开一次，批量 / 监视 / 服务中的各任务共用
+_open_stores: dict[str, StatementStore] = {}
+_open_lock = threading.Lock()
+
+
+def open_store(store) -> StatementStore | None:
+    """
+    store 可以是 StatementStore 或数据库路径（供工作进程各自打开）
+    同一路径在进程内返回同一个 StatementStore，不为每个任务新建连接
+    """
+    if store is None or isinstance(store, StatementStore):
+        return store
+    path = os.path.abspath(store)
+    with _open_lock:
+        opened = _open_stores.get(path)
+        if opened is None:
+            opened = _open_stores[path] = StatementStore(path)
+    return opened
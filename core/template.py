@@ -0,0 +1,132 @@
+"""
+模板填充计划：预先编译模板 Sheet1 的 项目名称 -> 行号 索引
+
+同一模板（按文件内容哈希）只扫描一次，结果缓存在内存与磁盘中，
+后续写入时直接定位到目标行，不再逐行读取 B 列
+
+本模块只在编译计划时导入 openpyxl，界面可直接引用 YEAR_COLUMNS
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+
+from core.files import cache_dir, file_hash
+from core.matching import match_key
+
+# 年份 -> 模板写入列（默认值，可通过 year_columns 参数 / config.yaml 的 YEARS 覆盖）
+YEAR_COLUMNS = {
+    "2022": "C",
+    "2023": "D",
+    "2024": "F",
+    "2025": "H",
+}
+
+# 计划格式版本，修改编译逻辑时递增以使旧缓存失效
+PLAN_VERSION = 2
+
+_plans: dict[str, "FillPlan"] = {}
+
+
+@dataclass
+class FillPlan:
+    sheet: str
+    item_column: int
+    # 项目名称 -> 所在行（同名项目可能出现在多行）
+    rows: dict[str, list[int]] = field(default_factory=dict)
+    # 年份 -> 写入列序号
+    columns: dict[str, int] = field(default_factory=dict)
+    # 项目名称 -> 规范化键，用于精确匹配失败时的模糊匹配
+    keys: dict[str, str | None] = field(default_factory=dict)
+
+    def column_for(self, year) -> int:
+        year = str(year)
+        if year not in self.columns:
+            raise ValueError(f"不支持的年份: {year}")
+        return self.columns[year]
+
+    def to_dict(self) -> dict:
+        return {
+            "version": PLAN_VERSION,
+            "sheet": self.sheet,
+            "item_column": self.item_column,
+            "rows": self.rows,
+            "columns": self.columns,
+            "keys": self.keys,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FillPlan":
+        return cls(data["sheet"], data["item_column"], data["rows"], data["columns"], data["keys"])
+
+
+def normalize_item(value):
+    """模板中的项目名称，非字符串或空白返回 None"""
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    return value or None
+
+
+def _plan_key(template_path, sheet, item_column, year_columns) -> str:
+    payload = json.dumps(
+        [PLAN_VERSION, file_hash(template_path), sheet, item_column, year_columns],
+        ensure_ascii=False, sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def compile_plan(template_path, year_columns: dict, sheet="Sheet1", item_column="B") -> FillPlan:
+    """以只读流式方式扫描一次模板，生成填充计划"""
+    import openpyxl
+    from openpyxl.utils import column_index_from_string
+
+    item_idx = column_index_from_string(item_column)
+    workbook = openpyxl.load_workbook(template_path, read_only=True)
+    try:
+        ws = workbook[sheet]
+        rows: dict[str, list[int]] = {}
+        for row, (value,) in enumerate(
+            ws.iter_rows(min_row=2, min_col=item_idx, max_col=item_idx, values_only=True), start=2
+        ):
+            item = normalize_item(value)
+            if item is not None:
+                rows.setdefault(item, []).append(row)
+    finally:
+        workbook.close()
+    columns = {str(y): column_index_from_string(c) for y, c in year_columns.items()}
+    keys = {item: match_key(item) for item in rows}
+    return FillPlan(sheet, item_idx, rows, columns, keys)
+
+
+def load_plan(template_path, year_columns: dict, sheet="Sheet1", item_column="B", use_cache=True) -> FillPlan:
+    """
+    获取模板的填充计划，按 模板内容哈希 + 参数 缓存
+    依次查找：进程内缓存 -> 磁盘缓存 -> 重新编译
+    """
+    if not use_cache:
+        return compile_plan(template_path, year_columns, sheet, item_column)
+
+    key = _plan_key(template_path, sheet, item_column, year_columns)
+    plan = _plans.get(key)
+    if plan is not None:
+        return plan
+
+    plan_file = cache_dir("plans") / f"{key}.json"
+    if plan_file.exists():
+        try:
+            data = json.loads(plan_file.read_text(encoding="utf-8"))
+            if data.get("version") == PLAN_VERSION:
+                plan = FillPlan.from_dict(data)
+        except (OSError, ValueError, KeyError):
+            plan = None
+
+    if plan is None:
+        plan = compile_plan(template_path, year_columns, sheet, item_column)
+        tmp = plan_file.with_name(f"{key}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(plan.to_dict(), ensure_ascii=False), encoding="utf-8")
+        tmp.replace(plan_file)
+
+    _plans[key] = plan
+    return plan
@@ -0,0 +1,327 @@
+"""
+监视模式：轮询任务清单中的输入文件与监视目录，内容变化或放入新报表后自动重新生成对应的输出
+
+- 任务清单中的任务只 stat 列出的模板与报表；
+- 监视目录（见 FolderRule）每次轮询列出一层（或递归）文件，按命名规则把新导出的报表归入任务，
+  如 "{entity}_{year}_{flag}.xlsx" 匹配 "甲公司_2024_利润表.xlsx"，同一单位同一输出的报表合为一个任务；
+- 去抖：文件大小/修改时间与上一次轮询不同，或最后修改距今不足 debounce 秒时视为仍在写入，暂不处理；
+- 稳定后计算内容哈希，与上次生成时记录的哈希比较，只有模板或任一报表内容变化（或输出文件不存在）才重新生成；
+- 待生成任务进入有界队列，由固定数量的工作线程执行，队列满时留到下一次轮询；
+- 每个输出对应的输入哈希保存在 .quickfinance_cache/watch/ 中，重启后不会重复生成
+"""
+
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from core.batch import Job, JobResult, read_rows, resolve_path, run_job
+from core.files import cache_dir, file_hash
+
+# 文件名中表示报表类型的写法
+FLAG_NAMES = {
+    "OFP": ("OFP", "资产负债表", "资产负债"),
+    "PROFIT": ("PROFIT", "利润表", "利润"),
+    "FLOW": ("FLOW", "现金流量表", "现金流量", "流量表"),
+}
+STATEMENT_SUFFIXES = (".xls", ".xlsx")
+DEFAULT_PATTERN = "{entity}_{year}_{flag}.*"
+
+
+@dataclass
+class FolderRule:
+    """
+    监视目录：directory 中文件名匹配 pattern 的报表填入 template，输出到 output
+
+    pattern 中可用 {entity}（单位）、{year}（四位年份）、{flag}（报表类型，见 FLAG_NAMES）与通配符 *，
+    其余字符按原样匹配（不区分大小写）；output 中可用 {entity} 与 {year}，
+    不含 {year} 时同一单位各年份的报表写入同一个输出文件
+    """
+    directory: str
+    template: str
+    output: str
+    pattern: str = DEFAULT_PATTERN
+    # pattern 中没有 {year} 时使用的年份
+    year: str = ""
+    recursive: bool = False
+
+    def __post_init__(self):
+        if "{flag}" not in self.pattern:
+            raise ValueError(f"监视目录 {self.directory} 的命名规则缺少 {{flag}}: {self.pattern}")
+        if "{year}" not in self.pattern and not self.year:
+            raise ValueError(f"监视目录 {self.directory} 的命名规则缺少 {{year}}，需要指定 year")
+        self.regex = pattern_regex(self.pattern)
+        try:
+            self.output.format(entity="", year="")
+        except (KeyError, IndexError, ValueError):
+            raise ValueError(f"监视目录 {self.directory} 的输出只能使用 {{entity}} 与 {{year}}: {self.output}") from None
+
+    def match(self, name) -> tuple[str, str, str] | None:
+        """文件名 -> (单位, 年份, 报表类型)，不匹配时返回 None"""
+        if name.startswith(("~$", ".")) or os.path.splitext(name)[1].lower() not in STATEMENT_SUFFIXES:
+            return None
+        m = self.regex.fullmatch(name)
+        if m is None:
+            return None
+        groups = m.groupdict()
+        flag = next(f for f, names in FLAG_NAMES.items()
+                    if groups["flag"].casefold() in (n.casefold() for n in names))
+        return groups.get("entity", "").strip(), groups.get("year") or self.year, flag
+
+
+def pattern_regex(pattern) -> re.Pattern:
+    flags = sorted((n for names in FLAG_NAMES.values() for n in names), key=len, reverse=True)
+    fields = {
+        "entity": r"(?P<entity>.+?)",
+        "year": r"(?P<year>\d{4})",
+        "flag": "(?P<flag>" + "|".join(map(re.escape, flags)) + ")",
+    }
+    parts = []
+    for token in re.split(r"(\{\w+\}|\*)", pattern):
+        if token == "*":
+            parts.append(".*?")
+        elif token.startswith("{") and token.endswith("}"):
+            if token[1:-1] not in fields:
+                raise ValueError(f"命名规则中未知的字段 {token}: {pattern}")
+            parts.append(fields[token[1:-1]])
+        else:
+            parts.append(re.escape(token))
+    return re.compile("".join(parts), re.IGNORECASE)
+
+
+def load_folders(path) -> list[FolderRule]:
+    """
+    读取监视目录配置：.yaml/.json 为 {folders: [{dir, template, output, pattern, year, recursive}]}，
+    .csv 表头相同；相对路径以配置文件所在目录为基准
+    """
+    path = Path(path)
+    rules = []
+    for i, row in enumerate(read_rows(path, "folders"), start=1):
+        missing = [k for k in ("dir", "template", "output") if not row.get(k)]
+        if missing:
+            raise ValueError(f"监视目录配置第 {i} 条缺少字段: {', '.join(missing)}")
+        recursive = row.get("recursive")
+        if isinstance(recursive, str):
+            recursive = recursive.strip().lower() in ("1", "true", "yes", "y")
+        rules.append(FolderRule(resolve_path(path.parent, row["dir"]), resolve_path(path.parent, row["template"]),
+                                resolve_path(path.parent, row["output"]), str(row.get("pattern") or DEFAULT_PATTERN),
+                                str(row.get("year") or ""), bool(recursive)))
+    return rules
+
+
+def _list_files(directory, recursive):
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return
+    for entry in entries:
+        if entry.is_file():
+            yield entry
+        elif recursive and entry.is_dir():
+            yield from _list_files(entry.path, recursive)
+
+
+def scan_folder(rule: FolderRule) -> list[Job]:
+    """
+    列出监视目录中匹配命名规则的报表，按输出文件归为任务；缺少资产负债表的单位/年份暂不生成
+    同一单位、年份、报表类型有多个文件（如 .xls 与 .xlsx）时使用最近修改的一个
+    """
+    found: dict[tuple, tuple] = {}
+    for entry in _list_files(rule.directory, rule.recursive):
+        matched = rule.match(entry.name)
+        if matched is None:
+            continue
+        try:
+            mtime = entry.stat().st_mtime_ns
+        except OSError:
+            continue
+        if matched not in found or mtime > found[matched][0]:
+            found[matched] = (mtime, entry.path)
+
+    years: dict[tuple, dict] = {}
+    for (entity, year, flag), (_, path) in found.items():
+        years.setdefault((entity, year), {})[flag] = path
+    jobs: dict[str, Job] = {}
+    for (entity, year), paths in sorted(years.items()):
+        if "OFP" not in paths:
+            continue
+        output = rule.output.format(entity=entity, year=year)
+        job = jobs.setdefault(output, Job(rule.template, output, entity=entity or Path(output).stem))
+        job.years[year] = (paths["OFP"], paths.get("PROFIT", ""), paths.get("FLOW", ""))
+    return list(jobs.values())
+
+
+def job_inputs(job: Job) -> list[str]:
+    """任务依赖的所有输入文件：模板与各年份的报表"""
+    paths = [job.template]
+    for sources in job.years.values():
+        paths.extend(p for p in sources if p)
+    return paths
+
+
+class Watcher:
+    def __init__(self, jobs: list[Job], options: dict | None = None, debounce=2.0, workers=1,
+                 queue_size=64, state_path=None, on_result=None, folders: list[FolderRule] | None = None):
+        """
+        options: 透传给 pipeline.generate_years 的参数
+        on_result: 每完成一个任务回调一次（在工作线程中调用）
+        folders: 监视目录，每次轮询重新列出，新放入的报表自动成为任务
+        """
+        self.manifest_jobs = list(jobs)
+        self.folders = list(folders or [])
+        self.jobs = self.manifest_jobs + [job for rule in self.folders for job in scan_folder(rule)]
+        self.options = dict(options or {})
+        self.options.setdefault("parallel", workers == 1)
+        self.debounce = debounce
+        self.workers = workers
+        self.on_result = on_result
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.state_path = state_path or self._default_state_path()
+        # 输出 -> {"inputs": {路径: 哈希}, "ok": bool}
+        self.state: dict[str, dict] = self._load_state()
+        # 路径 -> 上一次轮询看到的 (大小, 修改时间)
+        self._seen: dict[str, tuple] = {}
+        # 已入队或正在执行的输出
+        self._active: set[str] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def _default_state_path(self):
+        # 监视目录中的任务随文件增减，按目录规则而不是当前的输出计算
+        outputs = sorted(os.path.abspath(job.output) for job in self.manifest_jobs)
+        folders = sorted([os.path.abspath(r.directory), r.pattern, os.path.abspath(r.output)] for r in self.folders)
+        key = hashlib.sha256(json.dumps([outputs, folders], ensure_ascii=False).encode("utf-8")).hexdigest()
+        return cache_dir("watch") / f"{key[:16]}.json"
+
+    def _load_state(self) -> dict:
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        tmp = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp, self.state_path)
+
+    def _stable(self, path, now) -> bool:
+        """文件存在且写入已结束（两次轮询之间没有变化，且最后修改已超过 debounce 秒）"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._seen.pop(path, None)
+            return False
+        signature = (stat.st_size, stat.st_mtime_ns)
+        previous = self._seen.get(path)
+        self._seen[path] = signature
+        if previous is not None and previous != signature:
+            return False
+        return now - stat.st_mtime >= self.debounce
+
+    def changed_jobs(self, now) -> list[tuple[Job, dict]]:
+        """返回需要重新生成的 [(任务, {输入路径: 哈希})]"""
+        changed = []
+        for job in self.jobs:
+            with self._lock:
+                if job.output in self._active:
+                    continue
+            inputs = job_inputs(job)
+            # 先检查所有输入都已稳定，避免读取到写了一半的文件（每个文件都要 stat，以更新 _seen）
+            if not all([self._stable(p, now) for p in inputs]):
+                continue
+            hashes = {p: file_hash(p) for p in inputs}
+            previous = self.state.get(job.output)
+            if previous is not None and previous["inputs"] == hashes:
+                # 上次失败的任务在输入变化前不再重试；成功的任务在输出被删除时重新生成
+                if not previous["ok"] or os.path.exists(job.output):
+                    continue
+            changed.append((job, hashes))
+        return changed
+
+    def poll_once(self, now=None) -> int:
+        """检查一次输入文件，将需要重新生成的任务放入队列，返回入队数量"""
+        now = time.time() if now is None else now
+        if self.folders:
+            self.jobs = self.manifest_jobs + [job for rule in self.folders for job in scan_folder(rule)]
+        queued = 0
+        for job, hashes in self.changed_jobs(now):
+            try:
+                self.queue.put_nowait((job, hashes))
+            except queue.Full:
+                # 队列已满，下次轮询时仍会检测到变化
+                break
+            with self._lock:
+                self._active.add(job.output)
+            queued += 1
+        return queued
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+            job, hashes = item
+            try:
+                result = run_job(job, self.options)
+            except Exception as e:
+                result = JobResult(job, False, 0.0, f"{type(e).__name__}: {e}")
+            with self._lock:
+                # 记录的是入队时的输入哈希，执行期间输入再变化时下次轮询会再生成一次
+                self.state[job.output] = {"inputs": hashes, "ok": result.ok}
+                self._save_state()
+                self._active.discard(job.output)
+            if self.on_result:
+                self.on_result(result)
+            self.queue.task_done()
+
+    def start(self):
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._work, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def run(self, interval=2.0, once=False):
+        """
+        轮询直到 stop() 被调用
+        once: 只检查一次，等队列中的任务全部完成后返回
+        """
+        self.start()
+        try:
+            if once:
+                self.poll_once()
+                self.queue.join()
+                return
+            while not self._stop.is_set():
+                self.poll_once()
+                self._stop.wait(interval)
+        finally:
+            self.shutdown()
+
+    def stop(self):
+        self._stop.set()
+
+    def shutdown(self):
+        """通知工作线程退出，等待正在执行的任务完成（队列中未开始的任务会被丢弃）"""
+        self._stop.set()
+        try:
+            while True:
+                job, _ = self.queue.get_nowait()
+                with self._lock:
+                    self._active.discard(job.output)
+                self.queue.task_done()
+        except queue.Empty:
+            pass
+        for _ in self._threads:
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads.clear()
@@ -0,0 +1,492 @@
+"""
+xlsx 压缩包级别的补丁写入
+
+不经过 openpyxl 建立整个工作簿对象模型：逐个复制模板压缩包中的条目，
+只改写目标工作表的 XML（以及为数字格式追加样式时的 styles.xml），
+其余部件原样复制。遇到无法安全处理的结构时抛出 PatchUnsupported，
+由调用方回退到 openpyxl 写入。
+"""
+
+import os
+import posixpath
+import re
+import shutil
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+from openpyxl.styles.numbers import BUILTIN_FORMATS_REVERSE
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.cell import coordinate_from_string, column_index_from_string, range_boundaries
+
+_SHEET_RE = re.compile(r'<(?:\w+:)?sheet\b[^>]*>')
+_REL_RE = re.compile(r'<(?:\w+:)?Relationship\b[^>]*>')
+_ATTR_RE = re.compile(r'([\w:]+)\s*=\s*("[^"]*"|\'[^\']*\')')
+_ROW_RE = re.compile(r'<(?P<p>\w+:)?row\b[^>]*?(?:/>|>.*?</(?P=p)?row>)', re.S)
+_CELL_RE = re.compile(r'<(?P<p>\w+:)?c\b[^>]*?(?:/>|>.*?</(?P=p)?c>)', re.S)
+_OPEN_TAG_RE = re.compile(r'<[^>]*>')
+_SHEETDATA_RE = re.compile(r'<(?P<p>\w+:)?sheetData\b[^>]*?(?:/>|>(?P<body>.*?)</(?P=p)?sheetData>)', re.S)
+_DIMENSION_RE = re.compile(r'(<(?:\w+:)?dimension\b[^>]*\bref=")([^"]*)(")')
+_CELLXFS_RE = re.compile(r'<(?P<p>\w+:)?cellXfs\b[^>]*?(?:/>|>(?P<body>.*?)</(?P=p)?cellXfs>)', re.S)
+_XF_RE = re.compile(r'<(?P<p>\w+:)?xf\b[^>]*?(?:/>|>.*?</(?P=p)?xf>)', re.S)
+_NUMFMTS_RE = re.compile(r'<(?P<p>\w+:)?numFmts\b[^>]*?(?:/>|>(?P<body>.*?)</(?P=p)?numFmts>)', re.S)
+_NUMFMT_RE = re.compile(r'<(?:\w+:)?numFmt\b[^>]*>')
+_F_RE = re.compile(r'<(?P<p>\w+:)?f\b[^>]*?(?:/>|>.*?</(?P=p)?f>)', re.S)
+_V_RE = re.compile(r'<(?P<p>\w+:)?v\b[^>]*?(?:/>|>.*?</(?P=p)?v>)', re.S)
+_CALCPR_RE = re.compile(r'<(?:\w+:)?calcPr\b[^>]*>')
+_WORKBOOK_RE = re.compile(r'<(?P<p>\w+:)?workbook\b[^>]*>')
+# workbook.xml 中位于 calcPr 之后的元素，缺少 calcPr 时插入到其中第一个之前
+_AFTER_CALCPR = ("oleSize", "customWorkbookViews", "pivotCaches", "smartTagPr", "smartTagTypes",
+                 "webPublishing", "fileRecoveryPr", "webPublishObjects", "extLst")
+
+
+class PatchUnsupported(Exception):
+    """模板结构无法用补丁方式安全写入"""
+
+
+def _attrs(tag: str) -> dict:
+    """解析开始标签中的属性"""
+    return {k: v[1:-1] for k, v in _ATTR_RE.findall(tag)}
+
+
+def _set_attr(tag: str, name: str, value) -> str:
+    """设置（或追加）开始标签中的属性"""
+    value = quoteattr(str(value))
+    pattern = re.compile(r'(\s%s\s*=\s*)("[^"]*"|\'[^\']*\')' % re.escape(name))
+    if pattern.search(tag):
+        return pattern.sub(lambda m: m.group(1) + value, tag, count=1)
+    end = -2 if tag.endswith("/>") else -1
+    return f"{tag[:end].rstrip()} {name}={value}{tag[end:]}"
+
+
+def _del_attr(tag: str, name: str) -> str:
+    return re.sub(r'\s%s\s*=\s*("[^"]*"|\'[^\']*\')' % re.escape(name), "", tag, count=1)
+
+
+def _drop_cached(cell: str) -> str:
+    """删除公式单元格中模板保存的计算结果（<v> 与 t 属性），由 Excel 打开时重新计算"""
+    if _F_RE.search(cell) is None or _V_RE.search(cell) is None:
+        return cell
+    head = _OPEN_TAG_RE.match(cell).group(0)
+    return _del_attr(head, "t") + _V_RE.sub("", cell[len(head):])
+
+
+def _drop_cached_row(row_xml: str) -> str:
+    if _F_RE.search(row_xml) is None:
+        return row_xml
+    return _CELL_RE.sub(lambda m: _drop_cached(m.group(0)), row_xml)
+
+
+def _full_calc_on_load(xml: str) -> str:
+    """workbook.xml 的 calcPr 设置 fullCalcOnLoad，Excel 打开时重新计算全部公式（与 openpyxl 保存的一致）"""
+    m = _CALCPR_RE.search(xml)
+    if m:
+        return xml[:m.start()] + _set_attr(m.group(0), "fullCalcOnLoad", 1) + xml[m.end():]
+    root = _WORKBOOK_RE.search(xml)
+    if root is None:
+        raise PatchUnsupported("workbook.xml 中没有 workbook 元素")
+    prefix = root.group("p") or ""
+    names = "|".join(_AFTER_CALCPR)
+    after = re.search(r'<(?:\w+:)?(?:%s)\b|</(?:\w+:)?workbook>' % names, xml)
+    return xml[:after.start()] + f'<{prefix}calcPr fullCalcOnLoad="1"/>' + xml[after.start():]
+
+
+def _sheet_part(zin: zipfile.ZipFile, sheet: str) -> str:
+    """根据工作表名称找到对应的 xml 部件路径"""
+    workbook = zin.read("xl/workbook.xml").decode("utf-8")
+    rid = None
+    for tag in _SHEET_RE.findall(workbook):
+        attrs = _attrs(tag)
+        if attrs.get("name") == sheet:
+            rid = next((v for k, v in attrs.items() if k.endswith(":id") or k == "id"), None)
+            break
+    if rid is None:
+        raise KeyError(f"模板中不存在工作表: {sheet}")
+
+    rels = zin.read("xl/_rels/workbook.xml.rels").decode("utf-8")
+    for tag in _REL_RE.findall(rels):
+        attrs = _attrs(tag)
+        if attrs.get("Id") == rid:
+            target = attrs["Target"]
+            if target.startswith("/"):
+                return target.lstrip("/")
+            return posixpath.normpath(posixpath.join("xl", target))
+    raise PatchUnsupported(f"找不到工作表 {sheet} 的关系定义")
+
+
+class _Styles:
+    """为目标单元格派生带数字格式的样式（追加 xf，不改动已有样式）"""
+
+    def __init__(self, xml: str):
+        self.xml = xml
+        m = _CELLXFS_RE.search(xml)
+        if m is None or m.group("body") is None:
+            raise PatchUnsupported("styles.xml 中没有 cellXfs")
+        self.prefix = m.group("p") or ""
+        self.xfs = [x.group(0) for x in _XF_RE.finditer(m.group("body"))]
+        self.count = len(self.xfs)
+        self.new_xfs: list[str] = []
+        self.new_numfmts: list[str] = []
+        self.fmt_ids: dict[str, int] = {}
+        self.derived: dict[tuple, int] = {}
+
+    def _fmt_id(self, fmt: str) -> int:
+        if fmt in self.fmt_ids:
+            return self.fmt_ids[fmt]
+        if fmt in BUILTIN_FORMATS_REVERSE:
+            fid = BUILTIN_FORMATS_REVERSE[fmt]
+        else:
+            existing = {}
+            m = _NUMFMTS_RE.search(self.xml)
+            if m and m.group("body"):
+                for tag in _NUMFMT_RE.findall(m.group("body")):
+                    attrs = _attrs(tag)
+                    existing[attrs.get("formatCode")] = int(attrs["numFmtId"])
+            fid = existing.get(fmt)
+            if fid is None:
+                used = list(existing.values()) + [163]
+                fid = max(used) + 1 + len(self.new_numfmts)
+                self.new_numfmts.append(f'<{self.prefix}numFmt numFmtId="{fid}" formatCode={quoteattr(fmt)}/>')
+        self.fmt_ids[fmt] = fid
+        return fid
+
+    def with_format(self, style: int, fmt: str) -> int:
+        """返回 样式 style 改为数字格式 fmt 之后的样式序号"""
+        key = (style, fmt)
+        if key in self.derived:
+            return self.derived[key]
+        fid = self._fmt_id(fmt)
+        base = self.xfs[style] if style < len(self.xfs) else self.xfs[0]
+        head = _OPEN_TAG_RE.match(base).group(0)
+        if _attrs(head).get("numFmtId") == str(fid):
+            self.derived[key] = style
+            return style
+        new_head = _set_attr(_set_attr(head, "numFmtId", fid), "applyNumberFormat", 1)
+        self.new_xfs.append(new_head + base[len(head):])
+        index = self.count + len(self.new_xfs) - 1
+        self.derived[key] = index
+        return index
+
+    def render(self) -> str | None:
+        """没有新增样式时返回 None，表示 styles.xml 原样复制"""
+        if not self.new_xfs:
+            return None
+        xml = self.xml
+        if self.new_numfmts:
+            m = _NUMFMTS_RE.search(xml)
+            if m:
+                head = _OPEN_TAG_RE.match(m.group(0)).group(0)
+                total = int(_attrs(head).get("count", 0)) + len(self.new_numfmts)
+                body = (m.group("body") or "") + "".join(self.new_numfmts)
+                close = f'</{m.group("p") or ""}numFmts>'
+                head = _set_attr(head.replace("/>", ">") if head.endswith("/>") else head, "count", total)
+                xml = xml[:m.start()] + head + body + close + xml[m.end():]
+            else:
+                # numFmts 必须位于 styleSheet 的第一个子元素
+                root = re.search(r'<(?:\w+:)?styleSheet\b[^>]*>', xml)
+                block = f'<{self.prefix}numFmts count="{len(self.new_numfmts)}">{"".join(self.new_numfmts)}</{self.prefix}numFmts>'
+                xml = xml[:root.end()] + block + xml[root.end():]
+        m = _CELLXFS_RE.search(xml)
+        head = _OPEN_TAG_RE.match(m.group(0)).group(0)
+        head = _set_attr(head, "count", self.count + len(self.new_xfs))
+        close = f'</{m.group("p") or ""}cellXfs>'
+        xml = xml[:m.start()] + head + m.group("body") + "".join(self.new_xfs) + close + xml[m.end():]
+        return xml
+
+
+def _cell_xml(prefix: str, ref: str, value, style) -> str:
+    s = f' s="{style}"' if style else ""
+    if isinstance(value, str):
+        space = ' xml:space="preserve"' if value != value.strip() else ""
+        return f'<{prefix}c r="{ref}"{s} t="inlineStr"><{prefix}is><{prefix}t{space}>{escape(value)}</{prefix}t></{prefix}is></{prefix}c>'
+    if isinstance(value, bool):
+        return f'<{prefix}c r="{ref}"{s} t="b"><{prefix}v>{int(value)}</{prefix}v></{prefix}c>'
+    return f'<{prefix}c r="{ref}"{s}><{prefix}v>{float(value)!r}</{prefix}v></{prefix}c>'
+
+
+class _SheetPatcher:
+    def __init__(self, xml: str, cells: dict, formats: dict, styles: _Styles | None):
+        self.xml = xml
+        self.styles = styles
+        self.formats = formats
+        # 行号 -> {列号: 值}
+        self.rows: dict[int, dict[int, object]] = {}
+        for (row, col), value in cells.items():
+            self.rows.setdefault(row, {})[col] = value
+        self.dropped_formula = False
+        self.min_row = min(self.rows, default=0)
+        self.max_row = max(self.rows, default=0)
+        self.min_col = min((c for cols in self.rows.values() for c in cols), default=0)
+        self.max_col = max((c for cols in self.rows.values() for c in cols), default=0)
+
+    def _style_for(self, row, col, current) -> int:
+        fmt = self.formats.get((row, col))
+        if fmt is None or self.styles is None:
+            return current
+        return self.styles.with_format(current, fmt)
+
+    def _patch_row(self, prefix: str, row_xml: str, row: int, values: dict) -> str:
+        head = _OPEN_TAG_RE.match(row_xml).group(0)
+        body = "" if head.endswith("/>") else row_xml[len(head):row_xml.rindex("<")]
+        closing = f"</{prefix}row>"
+        head = _del_attr(head, "spans")
+        if head.endswith("/>"):
+            head = head[:-2].rstrip() + ">"
+
+        row_style = 0
+        head_attrs = _attrs(head)
+        if head_attrs.get("customFormat") in ("1", "true"):
+            row_style = int(head_attrs.get("s", 0))
+
+        out = []
+        pending = sorted(values.items())
+        i = 0
+        for m in _CELL_RE.finditer(body):
+            cell = m.group(0)
+            cell_head = _OPEN_TAG_RE.match(cell).group(0)
+            attrs = _attrs(cell_head)
+            ref = attrs.get("r")
+            if ref is None:
+                raise PatchUnsupported(f"第 {row} 行存在未标注坐标的单元格")
+            col = column_index_from_string(coordinate_from_string(ref)[0])
+            while i < len(pending) and pending[i][0] < col:
+                c, v = pending[i]
+                out.append(_cell_xml(prefix, f"{get_column_letter(c)}{row}", v, self._style_for(row, c, row_style)))
+                i += 1
+            if i < len(pending) and pending[i][0] == col:
+                if re.search(r'<(?:\w+:)?f\b[^>]*\bref=', cell):
+                    # 共享公式的主单元格被覆盖会破坏其它单元格
+                    raise PatchUnsupported(f"{ref} 是共享公式的主单元格")
+                if re.search(r'<(?:\w+:)?f\b', cell):
+                    self.dropped_formula = True
+                style = int(attrs.get("s", 0))
+                out.append(_cell_xml(prefix, ref, pending[i][1], self._style_for(row, col, style)))
+                i += 1
+            else:
+                out.append(_drop_cached(cell))
+        for c, v in pending[i:]:
+            out.append(_cell_xml(prefix, f"{get_column_letter(c)}{row}", v, self._style_for(row, c, row_style)))
+        return head + "".join(out) + closing
+
+    def _new_row(self, prefix: str, row: int, values: dict) -> str:
+        cells = "".join(
+            _cell_xml(prefix, f"{get_column_letter(c)}{row}", v, self._style_for(row, c, 0))
+            for c, v in sorted(values.items())
+        )
+        return f'<{prefix}row r="{row}">{cells}</{prefix}row>'
+
+    def chunks(self):
+        """逐段生成改写后的工作表 XML"""
+        m = _SHEETDATA_RE.search(self.xml)
+        if m is None:
+            raise PatchUnsupported("工作表中没有 sheetData")
+        prefix = m.group("p") or ""
+
+        head = self.xml[:m.start()]
+        yield self._patch_dimension(head)
+
+        body = m.group("body") or ""
+        yield f"<{prefix}sheetData>"
+        pending = sorted(self.rows)
+        i = 0
+        last_row = 0
+        for rm in _ROW_RE.finditer(body):
+            row_xml = rm.group(0)
+            attrs = _attrs(_OPEN_TAG_RE.match(row_xml).group(0))
+            row = int(attrs["r"]) if "r" in attrs else last_row + 1
+            last_row = row
+            while i < len(pending) and pending[i] < row:
+                yield self._new_row(prefix, pending[i], self.rows[pending[i]])
+                i += 1
+            if i < len(pending) and pending[i] == row:
+                if "r" not in attrs:
+                    raise PatchUnsupported(f"第 {row} 行未标注行号")
+                yield self._patch_row(prefix, row_xml, row, self.rows[row])
+                i += 1
+            else:
+                yield _drop_cached_row(row_xml)
+        for r in pending[i:]:
+            yield self._new_row(prefix, r, self.rows[r])
+        yield f"</{prefix}sheetData>"
+        yield self.xml[m.end():]
+
+    def _patch_dimension(self, head: str) -> str:
+        m = _DIMENSION_RE.search(head)
+        if m is None or not self.rows:
+            return head
+        try:
+            min_col, min_row, max_col, max_row = range_boundaries(m.group(2))
+        except ValueError:
+            return head
+        min_col, min_row = min(min_col or 1, self.min_col), min(min_row or 1, self.min_row)
+        max_col, max_row = max(max_col or 1, self.max_col), max(max_row or 1, self.max_row)
+        ref = f"{get_column_letter(min_col)}{min_row}:{get_column_letter(max_col)}{max_row}"
+        return head[:m.start()] + m.group(1) + ref + m.group(3) + head[m.end():]
+
+
+def _drop_part(xml: str, part_name: str, attr: str) -> str:
+    """从关系/内容类型清单中删除指向 part_name 的条目"""
+    def keep(m):
+        value = _attrs(m.group(0)).get(attr, "")
+        return "" if value.lstrip("/").endswith(part_name) else m.group(0)
+    return re.sub(r'<(?:\w+:)?(?:Relationship|Override)\b[^>]*/>', keep, xml)
+
+
+def patch_workbook(template_path, output_path, sheet: str, cells: dict, formats: dict | None = None):
+    """
+    将 cells {(行, 列): 值} 写入 template_path 的工作表 sheet，结果保存到 output_path
+    formats {(行, 列): 数字格式} 为需要设置数字格式的单元格
+    与 openpyxl 写入一致，各工作表中公式单元格的旧计算结果被删除，并设置打开时重新计算
+    """
+    formats = formats or {}
+    if not zipfile.is_zipfile(template_path):
+        raise PatchUnsupported("模板不是 xlsx 压缩包")
+
+    with zipfile.ZipFile(template_path) as zin:
+        names = set(zin.namelist())
+        sheet_part = _sheet_part(zin, sheet)
+        styles = None
+        if formats:
+            if "xl/styles.xml" not in names:
+                raise PatchUnsupported("模板缺少 styles.xml")
+            styles = _Styles(zin.read("xl/styles.xml").decode("utf-8"))
+
+        patcher = _SheetPatcher(zin.read(sheet_part).decode("utf-8"), cells, formats, styles)
+        # 样式表、计算链及其引用取决于工作表改写的结果（新增的数字格式、是否覆盖了公式），
+        # 在压缩包中位于工作表之前时推迟到工作表写完之后再写入（部件顺序不影响读取）
+        dependent = {"xl/styles.xml", "xl/calcChain.xml", "xl/_rels/workbook.xml.rels", "[Content_Types].xml"}
+        deferred = []
+        sheet_done = False
+
+        def write_part(info):
+            name = info.filename
+            drop_calc_chain = patcher.dropped_formula and "xl/calcChain.xml" in names
+            if name == "xl/styles.xml" and styles is not None and (styles_xml := styles.render()) is not None:
+                zout.writestr(info, styles_xml.encode("utf-8"))
+            elif drop_calc_chain and name == "xl/calcChain.xml":
+                # 被覆盖的公式单元格会使计算链失效，Excel 打开时会自动重建
+                return
+            elif drop_calc_chain and name in ("xl/_rels/workbook.xml.rels", "[Content_Types].xml"):
+                attr = "Target" if name.endswith(".rels") else "PartName"
+                xml = _drop_part(zin.read(name).decode("utf-8"), "calcChain.xml", attr)
+                zout.writestr(info, xml.encode("utf-8"))
+            elif name == "xl/workbook.xml":
+                # 写入的单元格可能被公式引用，模板中的计算结果已失效
+                zout.writestr(info, _full_calc_on_load(zin.read(name).decode("utf-8")).encode("utf-8"))
+            elif _is_worksheet(name) and _F_RE.search(xml := zin.read(info).decode("utf-8")):
+                _write_chunks(zout, info, _cache_cells(xml, {}))
+            else:
+                _copy_part(zin, zout, info)
+
+        # 工作表边生成边写入，不支持的内容可能在写到一半时才发现，先写入临时文件
+        tmp = f"{output_path}.{os.getpid()}.tmp"
+        try:
+            with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_DEFLATED) as zout:
+                for info in zin.infolist():
+                    if info.filename == sheet_part:
+                        # 改写后的工作表边生成边压缩写入，不在内存中拼出整个 XML
+                        _write_chunks(zout, info, patcher.chunks())
+                        sheet_done = True
+                        for part in deferred:
+                            write_part(part)
+                    elif info.filename in dependent and not sheet_done:
+                        deferred.append(info)
+                    else:
+                        write_part(info)
+        except BaseException:
+            os.remove(tmp)
+            raise
+    os.replace(tmp, output_path)
+
+
+def _is_worksheet(name: str) -> bool:
+    return name.startswith("xl/worksheets/") and name.endswith(".xml") and "/_rels/" not in name
+
+
+def _copy_part(zin: zipfile.ZipFile, zout: zipfile.ZipFile, info):
+    with zin.open(info) as src, zout.open(info, "w") as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+
+
+def _write_chunks(zout: zipfile.ZipFile, info, chunks, buffer_size=1 << 20):
+    """把逐段生成的 XML 写入压缩包，积累约 buffer_size 个字符编码写入一次"""
+    with zout.open(info, "w") as dst:
+        buffer, size = [], 0
+        for chunk in chunks:
+            buffer.append(chunk)
+            size += len(chunk)
+            if size >= buffer_size:
+                dst.write("".join(buffer).encode("utf-8"))
+                buffer, size = [], 0
+        if buffer:
+            dst.write("".join(buffer).encode("utf-8"))
+
+
+def _value_xml(prefix: str, value) -> tuple[str | None, str]:
+    """公式缓存值：返回 (单元格 t 属性, <v> 元素)；错误值为带 code 属性的对象（如 formula.CellError）"""
+    if hasattr(value, "code"):
+        return "e", f"<{prefix}v>{escape(value.code)}</{prefix}v>"
+    if isinstance(value, bool):
+        return "b", f"<{prefix}v>{int(value)}</{prefix}v>"
+    if isinstance(value, str):
+        return "str", f"<{prefix}v>{escape(value)}</{prefix}v>"
+    return None, f"<{prefix}v>{float(value)!r}</{prefix}v>"
+
+
+def _cache_cells(xml: str, values: dict):
+    """
+    为 values {(行, 列): 值} 中的公式单元格写入缓存值，保留公式本身；
+    其余公式单元格删除旧的缓存值（留给 Excel 计算）；逐段生成改写后的 XML
+    """
+    def replace(m):
+        cell = m.group(0)
+        f = _F_RE.search(cell)
+        if f is None:
+            return cell
+        head = _OPEN_TAG_RE.match(cell).group(0)
+        ref = _attrs(head).get("r")
+        if ref is None:
+            return _drop_cached(cell)
+        col, row = coordinate_from_string(ref)
+        key = (row, column_index_from_string(col))
+        if key not in values:
+            return _drop_cached(cell)
+        prefix = m.group("p") or ""
+        t, v = _value_xml(prefix, values[key])
+        head = _del_attr(head, "t")
+        if t:
+            head = _set_attr(head, "t", t)
+        return f"{head}{f.group(0)}{v}</{prefix}c>"
+
+    pos = 0
+    for m in _CELL_RE.finditer(xml):
+        yield xml[pos:m.start()]
+        yield replace(m)
+        pos = m.end()
+    yield xml[pos:]
+
+
+def set_cached_values(path, values: dict):
+    """
+    为已保存的 xlsx 中的公式单元格写入缓存值（<v>），values 为 {工作表: {(行, 列): 值}}
+    只改写涉及的工作表，其余部件原样复制；pandas / openpyxl(data_only=True) 读取时即可得到公式结果
+    这些工作表中不在 values 里的公式单元格（无法在进程内计算）删除旧的缓存值，
+    并设置打开时重新计算，由 Excel 给出结果
+    """
+    if not values:
+        return
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with zipfile.ZipFile(path) as zin:
+        parts = {_sheet_part(zin, sheet): cells for sheet, cells in values.items()}
+        try:
+            with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_DEFLATED) as zout:
+                for info in zin.infolist():
+                    if info.filename in parts:
+                        _write_chunks(zout, info, _cache_cells(zin.read(info).decode("utf-8"), parts[info.filename]))
+                    elif info.filename == "xl/workbook.xml":
+                        zout.writestr(info, _full_calc_on_load(zin.read(info).decode("utf-8")).encode("utf-8"))
+                    else:
+                        _copy_part(zin, zout, info)
+        except BaseException:
+            os.remove(tmp)
+            raise
+    os.replace(tmp, path)
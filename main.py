@@ -1,15 +1,20 @@
+import time
+_T0 = time.perf_counter()
 import sys
-import pandas as pd
 import os
-import re
-import openpyxl
+import threading
+import multiprocessing
 from datetime import datetime
 from views.Ui_main import Ui_MainForm
+from views.generate_worker import FanoutWorker, ServiceWorker, SessionWorker
+from views.preview_model import PreviewModel
+from core.preview import STATUSES
+from core.template import YEAR_COLUMNS
 from omegaconf import OmegaConf
 from qfluentwidgets import CommandBar,Action,FluentIcon,CommandBarView
-from PySide6.QtWidgets import QApplication, QWidget, QMessageBox, QFileDialog, QMenuBar,QWidgetAction
+from PySide6.QtWidgets import QApplication, QWidget, QMessageBox, QFileDialog, QMenuBar,QWidgetAction, QHeaderView
 from PySide6.QtGui import QIcon,QDesktopServices
-from PySide6.QtCore import Qt, QUrl
+from PySide6.QtCore import Qt, QUrl, QThreadPool, QTimer
 import resource_rc
 
 if sys.platform == 'win32':
@@ -21,9 +26,35 @@ if sys.platform == 'win32':
 
 CONFIG_FILE = "config.yaml"
 
+STAGE_NAMES = {"reading": "读取", "parsing": "解析", "writing": "写入", "saving": "保存",
+               "queued": "排队", "running": "服务端生成"}
+
+# 设置后窗口首帧绘制完即打印耗时并退出，供 benchmarks/bench_startup.py 使用
+STARTUP_PROBE = os.environ.get("QUICKFINANCE_STARTUP_PROBE") == "1"
+
+def prewarm():
+    """首帧绘制后在后台线程预先导入 pandas / openpyxl 等数据处理库"""
+    import core.pipeline  # noqa: F401
+
 def ensure_config():
     if not os.path.exists(CONFIG_FILE):
-        cfg = OmegaConf.create({"PATH": {"OSFP": "", "PROFIT": "", "FLOW": "", "TMP": ""}})
+        cfg = OmegaConf.create({
+            "PATH": {"OSFP": "", "PROFIT": "", "FLOW": "", "TMP": ""},
+            "CACHE": {"ENABLED": True},
+            "YEARS": dict(YEAR_COLUMNS),
+            # 别名表（别名 -> 模板项目名称，.csv/.yaml），留空则不使用
+            "ALIASES": "",
+            # DEFER_SAVE 为 true 时“开始生成”只更新内存中的工作簿，点击“保存”才写入文件
+            "SESSION": {"DEFER_SAVE": False},
+            # 分阶段指标日志（JSON 行），留空则不记录
+            "METRICS": {"LOG": ""},
+            # 本地生成服务地址（如 http://127.0.0.1:8765），设置后由服务生成，本程序只提交任务与下载结果
+            "SERVICE": {"URL": ""},
+            # 模板清单（每个模板的工作表、项目列、年份列与输出文件），设置后报表只读取一次并填入清单中的所有模板
+            "TARGETS": "",
+            # 为 true 时在程序内计算模板中的公式并写入结果，生成的文件不用 Excel 打开也能读到指标值
+            "FORMULAS": False,
+        })
         OmegaConf.save(cfg, CONFIG_FILE)
     return OmegaConf.load(CONFIG_FILE)
 class MainWindow(QWidget, Ui_MainForm):
@@ -32,21 +63,35 @@ class MainWindow(QWidget, Ui_MainForm):
         self.setupUi(self)
         self.setWindowTitle("QuickFine - ZinkCas v0.1")
         self.setWindowIcon(QIcon(":/imgs/logo.png"))
+        # 生成任务在后台线程中逐个执行
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.worker = None
+        # 内存中的模板与填充结果，重复生成时只改写变化的单元格
+        self.session = None
+        # 首次绘制完成后才加载数据处理库（只触发一次）
+        self._first_painted = False
         self.init_signal()
         self.init_status()
         self.init_menu()
+        self.init_preview()
 
     def init_menu(self):
         # 创建菜单栏
         commandBar = CommandBar()
         commandBar.addAction(Action(FluentIcon.GITHUB, '分享', triggered=lambda: QDesktopServices.openUrl(QUrl("https://github.com/Leaderzhangyi/QuickFinance"))))
+        commandBar.addAction(Action(FluentIcon.VIEW, '预览', triggered=lambda: self.start_generate(preview=True)))
+        commandBar.addAction(Action(FluentIcon.SAVE, '保存', triggered=self.save_session))
+        commandBar.addAction(Action(FluentIcon.DELETE, '清除缓存', triggered=self.clear_cache))
   
 
         self.verticalLayout.insertWidget(0, commandBar)
      
     def init_status(self):
-        self.comboBox.addItems(["2022", "2023", "2024", "2025"])
         self.config = ensure_config()
+        # 年份 -> 模板列，可在 config.yaml 的 YEARS 中修改
+        self.year_columns = {str(k): str(v) for k, v in (self.config.get("YEARS") or YEAR_COLUMNS).items()}
+        self.comboBox.addItems(list(self.year_columns))
         self.path_map = {
             "TMP": self.lineEdit,
             "OSFP": self.lineEdit_2,
@@ -70,7 +115,40 @@ class MainWindow(QWidget, Ui_MainForm):
         for btn, (title, ffilter, key) in button_map.items():
             btn.clicked.connect(lambda _, t=title, f=ffilter, k=key: self.select_file(t, f, k))
 
-        self.startButton.clicked.connect(self.start_generate)
+        self.startButton.clicked.connect(lambda: self.start_generate())
+        self.cancelButton.clicked.connect(self.cancel_generate)
+
+    def init_preview(self):
+        """匹配明细预览：表格只渲染可见的行，搜索与筛选只改变显示的行号"""
+        self.preview_model = PreviewModel(self)
+        self.previewTable.setModel(self.preview_model)
+        self.previewTable.setSortingEnabled(True)
+        self.previewTable.verticalHeader().hide()
+        # 固定行高，视图无需逐行测量
+        self.previewTable.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.previewTable.verticalHeader().setDefaultSectionSize(28)
+        self.previewTable.horizontalHeader().setStretchLastSection(True)
+        self.filterBox.addItems(["全部", *STATUSES])
+        self.filterBox.currentIndexChanged.connect(self.apply_filter)
+        # 输入停顿后再筛选，避免每敲一个字都扫描整张表
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(250)
+        self.search_timer.timeout.connect(self.apply_filter)
+        self.searchEdit.textChanged.connect(lambda _: self.search_timer.start())
+        self.searchEdit.searchSignal.connect(lambda _: self.apply_filter())
+        self.searchEdit.clearSignal.connect(self.apply_filter)
+
+    def apply_filter(self):
+        index = self.filterBox.currentIndex()
+        self.preview_model.set_filter(self.searchEdit.text(), STATUSES[index - 1] if index > 0 else None)
+
+    def on_preview(self, table):
+        self.preview_model.set_table(table)
+        counts = self.preview_model.counts()
+        self.filterBox.setItemText(0, f"全部 ({len(table):,})")
+        for i, status in enumerate(STATUSES, start=1):
+            self.filterBox.setItemText(i, f"{status} ({counts.get(status, 0):,})")
 
     def select_file(self, title, file_filter, key):
         file_name, _ = QFileDialog.getOpenFileName(self, title, "", file_filter)
@@ -82,116 +160,176 @@ class MainWindow(QWidget, Ui_MainForm):
             OmegaConf.save(self.config, CONFIG_FILE)
 
 
-    def start_generate(self):
+    def default_output_path(self):
         today = int(datetime.now().timestamp())
-        output_path = f'{today}_自动填充表.xlsx'
+        return f'{today}_自动填充表.xlsx'
+
+    def start_generate(self, preview=False):
+        """preview 为 True 时只读取、匹配并显示预览，不保存（确认无误后点击“保存”）"""
+        if self.worker is not None:
+            return
+        defer_save = preview or self.config.get("SESSION", {}).get("DEFER_SAVE", False)
+        output_path = None if defer_save else self.default_output_path()
         template_path = self.lineEdit.text() 
         input_ofp_path = self.lineEdit_2.text() 
         input_profit_path = self.lineEdit_3.text() 
         input_flow_path = self.lineEdit_4.text() 
-        if template_path == '':
+        # 预览总是在本机的内存会话中进行
+        targets_path = None if preview else self.config.get("TARGETS")
+        if template_path == '' and not targets_path:
             QMessageBox.critical(self, "错误", "请选择模板文件")
             return
         elif input_ofp_path == '':
             QMessageBox.critical(self, "错误", "请选择资产负债表文件")
             return
-        try:
-            clean_data = self._process_data(input_ofp_path,input_profit_path,input_flow_path)
-            self._write_data(clean_data, template_path, output_path)
-            QMessageBox.information(self, "成功", f"数据成功写入 {output_path}")
-        except Exception as e:
-            QMessageBox.critical(self, "错误", str(e))
-
-    def _get_data(self, path) -> pd.DataFrame:
-        data = pd.read_excel(path, header=3,na_values=['0'])
-        data.columns = data.columns.str.replace(" ", "", regex=False)
-         # 自定义去重逻辑，给重复列名加下标
-        seen = {}
-        new_cols = []
-        for c in data.columns:
-            if c not in seen:
-                seen[c] = 0
-                new_cols.append(c)
-            else:
-                seen[c] += 1
-                new_cols.append(f"{c}.{seen[c]}")
-        data.columns = new_cols
-        return data
-
-
-    def _parse_data(self,pdfunit:tuple) -> pd.Series:
-
-        """
-        解析df单元格数据
-        """
-        df,flag = pdfunit
-        if flag == 'OFP':
-            colName = '期末余额'
+
+        if targets_path:
+            from core.fanout import load_targets
+            try:
+                count = len(load_targets(targets_path))
+            except (ValueError, OSError) as e:
+                QMessageBox.critical(self, "错误", f"模板清单读取失败: {e}")
+                return
+            worker = FanoutWorker(
+                targets_path,
+                sources={self.comboBox.currentText(): (input_ofp_path, input_profit_path, input_flow_path)},
+                use_cache=self.config.get("CACHE", {}).get("ENABLED", True),
+                year_columns=self.year_columns,
+                aliases=self.config.get("ALIASES") or None,
+                formulas=self.config.get("FORMULAS", False),
+                metrics_log=self.config.get("METRICS", {}).get("LOG") or None,
+            )
+            # 每张报表 读取+解析 两步，每个模板 写入、保存 两步
+            files = 3 if input_profit_path != '' or input_flow_path != '' else 1
+            self._run(worker, files * 2 + count * 2)
+            return
+
+        service_url = None if preview else self.config.get("SERVICE", {}).get("URL")
+        if service_url:
+            request = {
+                "template": template_path, "ofp": input_ofp_path, "profit": input_profit_path,
+                "flow": input_flow_path, "year": self.comboBox.currentText(),
+                "year_columns": self.year_columns,
+                "aliases": self.config.get("ALIASES") or None,
+                "formulas": self.config.get("FORMULAS", False),
+            }
+            worker = ServiceWorker(service_url, request, output_path or self.default_output_path(),
+                                   metrics_log=self.config.get("METRICS", {}).get("LOG") or None)
+            # 排队、执行、下载
+            self._run(worker, 3)
+            return
+
+        worker = SessionWorker(
+            session=self.session,
+            template_path=template_path,
+            year=self.comboBox.currentText(),
+            sources=(input_ofp_path, input_profit_path, input_flow_path),
+            output_path=output_path,
+            use_cache=self.config.get("CACHE", {}).get("ENABLED", True),
+            year_columns=self.year_columns,
+            aliases=self.config.get("ALIASES") or None,
+            formulas=self.config.get("FORMULAS", False),
+            metrics_log=self.config.get("METRICS", {}).get("LOG") or None,
+        )
+        # 每张报表 读取+解析 两步，再加 写入、保存
+        files = 3 if input_profit_path != '' or input_flow_path != '' else 1
+        self._run(worker, files * 2 + 2)
+
+    def save_session(self):
+        """将会话中的工作簿保存到文件（DEFER_SAVE 模式下使用，也可随时另存）"""
+        if self.worker is not None:
+            return
+        if self.session is None:
+            QMessageBox.information(self, "提示", "请先点击“开始生成”")
+            return
+        output_path, _ = QFileDialog.getSaveFileName(self, "保存", self.default_output_path(), "Excel Files (*.xlsx)")
+        if not output_path:
+            return
+        worker = SessionWorker(session=self.session, template_path=self.session.template_path,
+                               output_path=output_path, **self.session.args)
+        self._run(worker, 1)
+
+    def _run(self, worker, progress_total):
+        worker.signals.progress.connect(self.on_progress)
+        worker.signals.succeeded.connect(self.on_succeeded)
+        worker.signals.failed.connect(self.on_failed)
+        worker.signals.cancelled.connect(self.on_cancelled)
+        worker.signals.preview.connect(self.on_preview)
+        self.progress_total = progress_total
+        self.progress_done = 0
+        self.progressBar.setValue(0)
+        self.worker = worker
+        self.startButton.setEnabled(False)
+        self.cancelButton.setEnabled(True)
+        self.pool.start(worker)
+
+    def cancel_generate(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.cancelButton.setEnabled(False)
+            self.statusLabel.setText("正在取消...")
+
+    def on_progress(self, stage, detail):
+        self.progress_done += 1
+        self.progressBar.setValue(int(self.progress_done * 100 / self.progress_total))
+        self.statusLabel.setText(f"正在{STAGE_NAMES.get(stage, stage)} {detail}".strip())
+
+    def _finish_run(self, message):
+        self.worker = None
+        self.startButton.setEnabled(True)
+        self.cancelButton.setEnabled(False)
+        self.statusLabel.setText(message)
+
+    def on_succeeded(self, output_path, metrics):
+        self.progressBar.setValue(100)
+        # 模板清单 / 生成服务的任务不经过会话，保留上一次的会话供之后单个模板的修改使用
+        if isinstance(self.worker, SessionWorker):
+            self.session = self.worker.session
+        files = "，".join(f"{k} {v:.2f}s" for k, v in metrics.file_timings().items())
+        self._finish_run(f"生成完成（{files}）" if files else "生成完成")
+        if output_path:
+            QMessageBox.information(self, "成功", f"数据成功写入 {output_path}\n\n{metrics.summary()}")
         else:
-            colName = '本期金额'
-        df1 = df.loc[:,["项目",colName]]
-        df2 = df.loc[:,["项目.1",f"{colName}.1"]]
-        # import ipdb;ipdb.set_trace()
-        df2.columns = df1.columns
-        df = pd.concat([df1, df2], axis=0).reset_index(drop=True)
-        df = df.dropna(subset=[colName])
-        # 只保留字符串
-        df = df[df['项目'].apply(lambda x: isinstance(x, str))]
-        # 去掉 '0' 和空字符串
-        df = df[~df['项目'].str.strip().isin(["0", ""])]
-        # 去掉开头符号
-        df.loc[:, '项目'] = df['项目'].apply(lambda x: re.sub(r'^[△☆▲*# ]', '', x.strip()))
-        # 去掉序号 (一、二、三... / （一）（二）... / 1. 2. ...)
-        df.loc[:, '项目'] = df['项目'].apply(lambda x: re.sub(r'^[一二三四五六七八九十]+、|^（[一二三四五六七八九十]+）|^\d+\.', '', x.strip()).strip())
-        # 去掉空格
-        df.loc[:, '项目'] = df['项目'].str.replace(' ', '', regex=False)
-        # 转成 Series
-        dseries = df.set_index('项目')[colName]
-        return dseries
-
-
-
-    def _process_data(self, input_ofp_path,input_profit_path,input_flow_path) -> dict:
-        # data load ``
-        ofpDf = self._get_data(input_ofp_path)
-        pseries = pd.Series()
-        fseries = pd.Series()
-        if input_profit_path != '' or input_flow_path != '':
-            profitDf = self._get_data(input_profit_path)
-            flowDf = self._get_data(input_flow_path)
-            pseries = self._parse_data((profitDf,'PROFIT'))
-            fseries = self._parse_data((flowDf,'FLOW'))
-
-        oseries = self._parse_data((ofpDf,'OFP'))
-        print(oseries)
-
-        return dict(oseries) | dict(pseries) | dict(fseries)
-
-    def _write_data(self, data, temp_path, output_path):
-        print(data.keys())
-        worksheet = openpyxl.load_workbook(temp_path)
-        accounting_format = '#,##0.00'
-        sheet = worksheet['Sheet1']
-        year = self.comboBox.currentText()
-        if year == "2022":
-            col = "C"
-        elif year == "2023":
-            col = "D"
-        elif year == "2024":
-            col = "F"
-        elif year == "2025":
-            col = "H"
-        sheet[f"{col}1"] = f"{year}-12-31"
-        for row in range(2, sheet.max_row + 1):
-            item = sheet[f"B{row}"].value
-            if item:
-                item = item.strip()
-                if item in data.keys():
-                    sheet[f"{col}{row}"] = data[item]
-                    sheet[f"{col}{row}"].number_format = accounting_format
-        worksheet.save(output_path)
+            self.statusLabel.setText(f"已更新，尚未保存（{metrics.total_seconds:.2f}s）")
+
+    def on_failed(self, error):
+        self.progressBar.setValue(0)
+        self._finish_run("生成失败")
+        QMessageBox.critical(self, "错误", error)
+
+    def on_cancelled(self):
+        self.progressBar.setValue(0)
+        self._finish_run("已取消")
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._first_painted:
+            self._first_painted = True
+            # 本次绘制提交到屏幕后再执行
+            QTimer.singleShot(0, self.on_first_paint)
+
+    def on_first_paint(self):
+        if STARTUP_PROBE:
+            print(f"first-paint-ms: {(time.perf_counter() - _T0) * 1000:.1f}", flush=True)
+            QApplication.quit()
+            return
+        threading.Thread(target=prewarm, daemon=True).start()
+
+    def clear_cache(self):
+        from core import pipeline
+        removed = pipeline.statement_cache().clear()
+        QMessageBox.information(self, "提示", f"已清除 {removed} 条解析缓存")
+
+    def closeEvent(self, event):
+        # 关闭窗口时取消正在进行的任务并等待线程退出
+        if self.worker is not None:
+            self.worker.cancel()
+        self.pool.waitForDone()
+        super().closeEvent(event)
 
 if __name__ == "__main__":
+    # 打包为 exe 时子进程解码报表需要
+    multiprocessing.freeze_support()
     QApplication.setHighDpiScaleFactorRoundingPolicy(Qt.HighDpiScaleFactorRoundingPolicy.PassThrough)
     app = QApplication(sys.argv)
     demo = MainWindow()
@@ -0,0 +1,37 @@
+"""
+测试公共设置：项目根目录加入 sys.path，缓存目录指向临时目录（需在导入 core 之前设置）
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("QUICKFINANCE_CACHE", tempfile.mkdtemp(prefix="quickfinance-test-cache-"))
+os.environ.setdefault("QUICKFINANCE_SHARED", tempfile.mkdtemp(prefix="quickfinance-test-shared-"))
+
+import openpyxl  # noqa: E402
+import pytest  # noqa: E402
+
+from benchmarks.generators import generate_dataset, write_statement  # noqa: E402
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    """合成的 OFP/PROFIT/FLOW 报表与模板，见 benchmarks.generators.generate_dataset"""
+    return generate_dataset(tmp_path / "data", rows=60)
+
+
+@pytest.fixture
+def rewrite_statement():
+    """用另一个随机种子重新生成某张报表（同样的项目，不同的金额）"""
+    def rewrite(path, flag, seed):
+        write_statement(path, flag, 60, seed)
+    return rewrite
+
+
+def sheet_values(path, sheet="Sheet1") -> list[list]:
+    book = openpyxl.load_workbook(path)
+    return [[cell.value for cell in row] for row in book[sheet].iter_rows()]
@@ -0,0 +1,159 @@
+"""公式计算：结果写入 openpyxl 保存的输出文件，再用 openpyxl(data_only=True) 读取比较"""
+
+import re
+import shutil
+import zipfile
+
+import openpyxl
+import pytest
+
+from core.formula import DIV0, CellError, Unsupported, evaluate, load_graph, parse_formula
+from core.pipeline import write_formula_values
+from core.xlsx_patch import set_cached_values
+
+FORMULAS = {
+    "B1": "=SUM(A1:A2)",
+    "B2": "=IFERROR(A1/A3,-1)",
+    "B3": '="合计"&A1&"元"',
+    "B4": "=ROUND(A1/3,2)",
+    "B5": "=Sheet2!A1*2+'Sheet2'!A2",
+    "B6": '=TEXT(A1,"0")',
+    "B7": "=B6+1",
+    "B8": "=A1/A3",
+    "B9": "=ROUND(2.5,0)+ROUNDDOWN(-1.55,1)",
+    "B10": "=AND(A1>5,A2>=20)",
+    "B11": "=SUM(B1,B4,B5)-A1%",
+    "C1": "=C2+1",
+    "C2": "=C1+1",
+}
+
+
+@pytest.fixture
+def template(tmp_path):
+    path = tmp_path / "formulas.xlsx"
+    book = openpyxl.Workbook()
+    ws = book.active
+    ws.title = "Sheet1"
+    ws["A1"], ws["A2"], ws["A3"] = 10, 20, 0
+    for ref, formula in FORMULAS.items():
+        ws[ref] = formula
+    other = book.create_sheet("Sheet2")
+    other["A1"], other["A2"] = 7, 0.5
+    book.save(path)
+    return path
+
+
+def cached(template, output, changes=None):
+    """按 changes 修改模板后保存（openpyxl），写入公式结果，返回 data_only 读取的 Sheet1 与公式视图"""
+    graph = load_graph(str(template), use_cache=False)
+    book = openpyxl.load_workbook(template)
+    for (sheet, row, col), value in (changes or {}).items():
+        book[sheet].cell(row=row, column=col, value=value)
+    recalculated = graph.recalc(changes or {})
+    book.save(output)
+    set_cached_values(output, graph.cached_values())
+    return (openpyxl.load_workbook(output, data_only=True)["Sheet1"], openpyxl.load_workbook(output)["Sheet1"],
+            recalculated)
+
+
+def test_cached_values(template, tmp_path):
+    ws, formulas, _ = cached(template, tmp_path / "out.xlsx")
+    assert ws["B1"].value == 30
+    assert ws["B2"].value == -1
+    assert ws["B3"].value == "合计10元"
+    assert ws["B4"].value == 3.33
+    assert ws["B5"].value == 14.5
+    assert ws["B8"].value == "#DIV/0!"
+    assert ws["B9"].value == pytest.approx(1.5)
+    assert ws["B10"].value is True
+    assert ws["B11"].value == pytest.approx(30 + 3.33 + 14.5 - 0.1)
+    # 公式本身保留
+    assert formulas["B1"].value == "=SUM(A1:A2)"
+
+
+def test_unsupported_cells_have_no_cached_value(template, tmp_path):
+    ws, formulas, _ = cached(template, tmp_path / "out.xlsx")
+    # 未知函数、依赖它的单元格与循环引用都留给 Excel 计算
+    for ref in ("B6", "B7", "C1", "C2"):
+        assert ws[ref].value is None
+        assert formulas[ref].value == FORMULAS[ref]
+    graph = load_graph(str(template), use_cache=False)
+    assert {(r, c) for _, r, c in graph.unsupported} == {(6, 2), (7, 2), (1, 3), (2, 3)}
+
+
+def test_recalc_only_dependents(template, tmp_path):
+    ws, _, recalculated = cached(template, tmp_path / "out.xlsx", {("Sheet1", 3, 1): 4.0})
+    # A3 只被 B2、B8 引用
+    assert {(r, c) for _, r, c in recalculated} == {(2, 2), (8, 2)}
+    assert ws["B2"].value == 2.5
+    assert ws["B8"].value == 2.5
+    assert ws["B1"].value == 30
+
+    ws, _, recalculated = cached(template, tmp_path / "out2.xlsx", {("Sheet2", 1, 1): 1.0})
+    assert {(r, c) for _, r, c in recalculated} == {(5, 2), (11, 2)}
+    assert ws["B5"].value == 2.5
+
+
+def test_cached_graph_matches_fresh(template):
+    fresh = load_graph(str(template), use_cache=False)
+    # 第一次构建并写入磁盘缓存，第二次从缓存读取
+    load_graph(str(template))
+    cached_graph = load_graph(str(template))
+    assert cached_graph.cached_values() == fresh.cached_values()
+
+
+def with_stale_results(path):
+    """模拟 Excel 保存的文件：每个公式单元格都带有（过期的）计算结果，打开时不强制重新计算"""
+    with zipfile.ZipFile(path) as zin:
+        entries = {info.filename: zin.read(info) for info in zin.infolist()}
+    for name in entries:
+        if name.startswith("xl/worksheets/sheet"):
+            entries[name] = entries[name].replace(b"<v />", b"<v>999</v>")
+    entries["xl/workbook.xml"] = re.sub(rb"<calcPr\b[^>]*/>", b'<calcPr calcId="191029"/>', entries["xl/workbook.xml"])
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zout:
+        for name, data in entries.items():
+            zout.writestr(name, data)
+
+
+def test_stale_results_of_unsupported_cells_are_dropped(template, tmp_path):
+    book = openpyxl.load_workbook(template)
+    # 只有无法计算的公式的工作表
+    book.create_sheet("Sheet3")["A1"] = '=TEXT(1,"0")'
+    book.save(template)
+    output = tmp_path / "out.xlsx"
+    shutil.copy(template, output)
+    with_stale_results(output)
+    assert openpyxl.load_workbook(output, data_only=True)["Sheet1"]["B6"].value == 999
+
+    write_formula_values(str(template), str(output), "Sheet1", {})
+    book = openpyxl.load_workbook(output, data_only=True)
+    assert book["Sheet1"]["B1"].value == 30
+    for ref in ("B6", "B7", "C1", "C2"):
+        assert book["Sheet1"][ref].value is None
+    assert book["Sheet3"]["A1"].value is None
+    assert openpyxl.load_workbook(output)["Sheet3"]["A1"].value == '=TEXT(1,"0")'
+    with zipfile.ZipFile(output) as z:
+        assert 'fullCalcOnLoad="1"' in z.read("xl/workbook.xml").decode("utf-8")
+
+
+def evaluate_text(formula, values=None):
+    values = values or {}
+    ast = parse_formula(formula, "Sheet1", {"Sheet1": (10, 10)})
+    return evaluate(ast, lambda sheet, row, col: values.get((sheet, row, col)))
+
+
+def test_tokenizer_and_evaluator():
+    a1, a2 = ("Sheet1", 1, 1), ("Sheet1", 2, 1)
+    assert evaluate_text("=1+2*3^2") == 19
+    assert evaluate_text("=-2^2") == 4
+    assert evaluate_text('="a"&1&TRUE') == "a1TRUE"
+    assert evaluate_text("=SUM(A1:A3)", {a1: 1.0, a2: 2.0}) == 3
+    assert evaluate_text("=SUM(A:A)", {a1: 1.0, a2: "文字"}) == 1
+    assert evaluate_text("=IF(A1>1,\"大\",\"小\")", {a1: 2.0}) == "大"
+    assert evaluate_text("=1/0") == DIV0
+    assert evaluate_text("=IFERROR(1/0,\"x\")") == "x"
+    assert isinstance(evaluate_text('="a"+1'), CellError)
+    with pytest.raises(Unsupported):
+        parse_formula("=VLOOKUP(A1,B1:C2,2)", "Sheet1", {"Sheet1": (10, 10)})
+    with pytest.raises(Unsupported):
+        parse_formula("=收入*2", "Sheet1", {"Sheet1": (10, 10)})
@@ -0,0 +1,58 @@
+import threading
+from concurrent.futures import Future
+
+from core.batch import JobResult
+from core.service import GenerationService
+
+
+class DoneExecutor:
+    """submit 返回已经完成的 Future，模拟极快完成或立即失败的任务"""
+
+    def __init__(self, error=None):
+        self.error = error
+
+    def submit(self, fn, job, options):
+        future = Future()
+        if self.error:
+            future.set_exception(self.error)
+        else:
+            future.set_result(JobResult(job, True, 0.0))
+        return future
+
+    def shutdown(self, **kwargs):
+        pass
+
+
+def submit_with_timeout(service, request, timeout=5):
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(job=service.submit(request)), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "submit 死锁"
+    return result["job"]
+
+
+def service_for(dataset, tmp_path, executor):
+    service = GenerationService(workers=1, results_dir=tmp_path)
+    service.executor.shutdown()
+    service.executor = executor
+    request = {"template": str(dataset["TMP"]), "ofp": str(dataset["OFP"]), "year": "2024"}
+    return service, request
+
+
+def test_submit_already_finished_job(dataset, tmp_path):
+    finished = []
+    service, request = service_for(dataset, tmp_path, DoneExecutor())
+    service.on_result = finished.append
+    job, duplicate = submit_with_timeout(service, request)
+    assert not duplicate
+    assert job.result is not None and job.result.ok
+    assert finished == [job]
+    assert service.get(job.id) is job
+
+
+def test_submit_immediate_failure(dataset, tmp_path):
+    service, request = service_for(dataset, tmp_path, DoneExecutor(RuntimeError("worker died")))
+    job, _ = submit_with_timeout(service, request)
+    assert not job.result.ok
+    assert "worker died" in job.result.error
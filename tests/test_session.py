@@ -0,0 +1,53 @@
+import pytest
+
+from conftest import sheet_values
+from core import pipeline
+from core.session import WorkbookSession
+
+
+def cancel_at(stage, detail):
+    def progress(current, current_detail):
+        if (current, current_detail) == (stage, detail):
+            raise pipeline.GenerationCancelled()
+    return progress
+
+
+def expected(dataset, path):
+    pipeline.generate(str(dataset["TMP"]), str(dataset["OFP"]), str(dataset["PROFIT"]), str(dataset["FLOW"]),
+                      "2024", str(path), use_cache=False, parallel=False)
+    return sheet_values(path)
+
+
+def update(session, dataset, progress=None):
+    return session.update("2024", str(dataset["OFP"]), str(dataset["PROFIT"]), str(dataset["FLOW"]), progress)
+
+
+def test_update_then_unchanged(dataset, tmp_path):
+    session = WorkbookSession(str(dataset["TMP"]), use_cache=False)
+    assert update(session, dataset) > 0
+    assert update(session, dataset) == 0
+    session.save(tmp_path / "out.xlsx")
+    assert sheet_values(tmp_path / "out.xlsx") == expected(dataset, tmp_path / "full.xlsx")
+
+
+@pytest.mark.parametrize("stage, detail", [("reading", "FLOW"), ("writing", "")])
+def test_cancel_then_retry_rewrites_changed_statement(dataset, rewrite_statement, tmp_path, stage, detail):
+    session = WorkbookSession(str(dataset["TMP"]), use_cache=False)
+    update(session, dataset)
+    rewrite_statement(dataset["PROFIT"], "PROFIT", seed=1)
+
+    with pytest.raises(pipeline.GenerationCancelled):
+        update(session, dataset, cancel_at(stage, detail))
+    # 重试时利润表的新数据仍需写入
+    assert update(session, dataset) > 0
+    session.save(tmp_path / "out.xlsx")
+    assert sheet_values(tmp_path / "out.xlsx") == expected(dataset, tmp_path / "full.xlsx")
+
+
+def test_cancelled_first_update_writes_on_retry(dataset, tmp_path):
+    session = WorkbookSession(str(dataset["TMP"]), use_cache=False)
+    with pytest.raises(pipeline.GenerationCancelled):
+        update(session, dataset, cancel_at("writing", ""))
+    assert update(session, dataset) > 0
+    session.save(tmp_path / "out.xlsx")
+    assert sheet_values(tmp_path / "out.xlsx") == expected(dataset, tmp_path / "full.xlsx")
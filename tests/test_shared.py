@@ -0,0 +1,47 @@
+import pandas as pd
+
+from core import pipeline
+from core.metrics import RunMetrics
+from core.shared import attach, release, share
+
+ITEMS = ["营业收入", "营业成本", "营业收入", "净利润", "营业成本"]
+AMOUNTS = [1.0, 2.0, 3.0, 4.0, 5.0]
+
+
+def shared_tables(tables):
+    path = share(tables)
+    try:
+        with attach(path) as data:
+            yield data
+    finally:
+        release(path)
+
+
+def test_duplicate_items_match_dict():
+    series = pd.Series(AMOUNTS, index=pd.Index(ITEMS, name="项目"), name="2024")
+    expected = dict(zip(ITEMS, AMOUNTS))
+    for data in shared_tables({"series": series, "dict": {"营业收入": 1.0, "净利润": 4.0}}):
+        table = data["series"]
+        assert len(table) == len(expected) == 3
+        assert list(table) == list(expected)
+        assert list(table.items()) == list(expected.items())
+        assert dict(table) == expected
+        assert table["营业收入"] == 3.0
+        assert "利润总额" not in table
+        # series 保留原始各行
+        assert data.series("series").tolist() == AMOUNTS
+        assert data.series("series").index.tolist() == ITEMS
+        assert dict(data["dict"]) == {"营业收入": 1.0, "净利润": 4.0}
+
+
+def test_record_matches_same_as_dict():
+    series = pd.Series(AMOUNTS, index=ITEMS)
+    values = {(2, 2): 3.0, (3, 2): 5.0}
+    counts = []
+    for data in shared_tables({"2024": series}):
+        for table in (dict(zip(ITEMS, AMOUNTS)), data["2024"]):
+            metrics = RunMetrics()
+            pipeline.record_matches(metrics, "2024", table, values, [])
+            counts.append(metrics.counts)
+    assert counts[0] == counts[1]
+    assert counts[1]["unmatched_source"] == 1
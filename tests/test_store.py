@@ -0,0 +1,24 @@
+from core import pipeline
+from core.store import StatementStore, open_store
+
+
+def test_open_store_reuses_one_store_per_path(tmp_path):
+    path = tmp_path / "statements.sqlite"
+    store = open_store(str(path))
+    assert open_store(path) is store
+    assert open_store(str(tmp_path / "." / "statements.sqlite")) is store
+    assert open_store(store) is store
+    assert open_store(None) is None
+    other = StatementStore(tmp_path / "other.sqlite")
+    assert open_store(other) is other
+
+
+def test_jobs_share_the_store(dataset, tmp_path):
+    path = str(tmp_path / "statements.sqlite")
+    for year in ("2023", "2024"):
+        pipeline.process_data(str(dataset["OFP"]), str(dataset["PROFIT"]), str(dataset["FLOW"]),
+                              use_cache=False, parallel=False, store=path, entity="甲", period=year)
+    store = open_store(path)
+    assert store._connect() is open_store(path)._connect()
+    assert set(store.statements("甲")["period"]) == {"2023", "2024"}
+    assert store.data("甲", "2024")
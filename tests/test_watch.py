@@ -0,0 +1,78 @@
+import os
+import shutil
+
+import pytest
+
+from conftest import sheet_values
+from core import pipeline
+from core.watch import FolderRule, Watcher, load_folders, scan_folder
+
+
+def drop(dataset, folder, entity, year, names=("资产负债表", "利润表", "现金流量表")):
+    for flag, name in zip(("OFP", "PROFIT", "FLOW"), names):
+        shutil.copy(dataset[flag], folder / f"{entity}_{year}_{name}.xlsx")
+
+
+def run_once(rule, tmp_path):
+    results = []
+    watcher = Watcher([], {"use_cache": False}, debounce=0, state_path=tmp_path / "state.json",
+                      on_result=results.append, folders=[rule])
+    watcher.run(once=True)
+    return results
+
+
+def test_rule_match():
+    rule = FolderRule("in", "t.xlsx", "out/{entity}_{year}.xlsx")
+    assert rule.match("甲公司_2024_利润表.xlsx") == ("甲公司", "2024", "PROFIT")
+    assert rule.match("乙_公司_2023_ofp.xls") == ("乙_公司", "2023", "OFP")
+    assert rule.match("~$甲公司_2024_利润表.xlsx") is None
+    assert rule.match("甲公司_2024_利润表.csv") is None
+    assert rule.match("甲公司_24_利润表.xlsx") is None
+    with pytest.raises(ValueError):
+        FolderRule("in", "t.xlsx", "out.xlsx", pattern="{entity}.xlsx")
+    with pytest.raises(ValueError):
+        FolderRule("in", "t.xlsx", "out/{name}.xlsx")
+
+
+def test_scan_groups_by_output(dataset, tmp_path):
+    folder = tmp_path / "in"
+    folder.mkdir()
+    drop(dataset, folder, "甲", "2023")
+    drop(dataset, folder, "甲", "2024")
+    # 只有利润表，缺少资产负债表时暂不生成
+    shutil.copy(dataset["PROFIT"], folder / "乙_2024_利润表.xlsx")
+    rule = FolderRule(str(folder), str(dataset["TMP"]), str(tmp_path / "out" / "{entity}.xlsx"))
+    jobs = scan_folder(rule)
+    assert len(jobs) == 1
+    assert jobs[0].entity == "甲"
+    assert sorted(jobs[0].years) == ["2023", "2024"]
+
+
+def test_new_exports_are_picked_up(dataset, tmp_path):
+    folder, out = tmp_path / "in", tmp_path / "out"
+    folder.mkdir()
+    out.mkdir()
+    rule = FolderRule(str(folder), str(dataset["TMP"]), str(out / "{entity}_{year}.xlsx"))
+    drop(dataset, folder, "甲", "2024")
+    assert [r.ok for r in run_once(rule, tmp_path)] == [True]
+
+    expected = tmp_path / "expected.xlsx"
+    pipeline.generate(str(dataset["TMP"]), str(dataset["OFP"]), str(dataset["PROFIT"]), str(dataset["FLOW"]),
+                      "2024", str(expected), use_cache=False, parallel=False)
+    assert sheet_values(out / "甲_2024.xlsx") == sheet_values(expected)
+
+    # 新放入的单位被生成，已生成且未变化的不再重复
+    drop(dataset, folder, "乙", "2024", names=("OFP", "PROFIT", "FLOW"))
+    results = run_once(rule, tmp_path)
+    assert [os.path.basename(r.job.output) for r in results] == ["乙_2024.xlsx"]
+    assert run_once(rule, tmp_path) == []
+
+
+def test_load_folders(tmp_path):
+    config = tmp_path / "folders.csv"
+    config.write_text("dir,template,output,pattern,year\nin,t.xlsx,out/{entity}.xlsx,{entity}-{flag}.xlsx,2024\n",
+                      encoding="utf-8")
+    rule, = load_folders(config)
+    assert rule.directory == str(tmp_path / "in")
+    assert rule.year == "2024"
+    assert rule.match("甲-OFP.xlsx") == ("甲", "2024", "OFP")
@@ -0,0 +1,178 @@
+"""补丁写入与 openpyxl 写入同样的单元格，读取结果应一致"""
+
+import re
+import zipfile
+
+import openpyxl
+import pytest
+
+from conftest import sheet_values
+from core import pipeline
+from core.xlsx_patch import PatchUnsupported, patch_workbook
+
+CALC_CHAIN = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+              '<calcChain xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><c r="C3" i="1"/></calcChain>')
+
+
+def rewrite_parts(path, parts: dict):
+    """parts: {部件名: 新内容或 函数(旧内容) -> 新内容}，不存在的部件追加到压缩包"""
+    with zipfile.ZipFile(path) as zin:
+        entries = {info.filename: zin.read(info) for info in zin.infolist()}
+    for name, content in parts.items():
+        if callable(content):
+            content = content(entries[name].decode("utf-8"))
+        entries[name] = content.encode("utf-8")
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zout:
+        for name, data in entries.items():
+            zout.writestr(name, data)
+
+
+@pytest.fixture
+def template(tmp_path):
+    path = tmp_path / "template.xlsx"
+    book = openpyxl.Workbook()
+    ws = book.active
+    ws.title = "Sheet1"
+    ws["A1"], ws["B1"] = "项目", "金额"
+    ws["A2"], ws["C2"] = "营业收入", "备注"
+    ws["A3"], ws["B3"], ws["C3"] = "营业成本", 5, "=B3*2"
+    ws["A5"] = "净利润"
+    ws["B5"].number_format = "0.0%"
+    book.create_sheet("Sheet2")["A1"] = "其它"
+    book.save(path)
+    return path
+
+
+def with_openpyxl(template, output, cells, formats):
+    book = openpyxl.load_workbook(template)
+    ws = book["Sheet1"]
+    for (row, col), value in cells.items():
+        cell = ws.cell(row=row, column=col, value=value)
+        if (row, col) in formats:
+            cell.number_format = formats[(row, col)]
+    book.save(output)
+
+
+def number_formats(path, cells):
+    ws = openpyxl.load_workbook(path)["Sheet1"]
+    return {pos: ws.cell(*pos).number_format for pos in cells}
+
+
+def assert_same_as_openpyxl(template, tmp_path, cells, formats=None):
+    formats = formats or {}
+    patched, expected = tmp_path / "patched.xlsx", tmp_path / "expected.xlsx"
+    patch_workbook(template, patched, "Sheet1", cells, formats)
+    with_openpyxl(template, expected, cells, formats)
+    assert sheet_values(patched) == sheet_values(expected)
+    assert sheet_values(patched, "Sheet2") == sheet_values(expected, "Sheet2")
+    assert number_formats(patched, cells) == number_formats(expected, cells)
+    return patched
+
+
+def sheet_xml(path):
+    with zipfile.ZipFile(path) as z:
+        return z.read("xl/worksheets/sheet1.xml").decode("utf-8")
+
+
+def test_splice_into_existing_row(template, tmp_path):
+    patched = assert_same_as_openpyxl(template, tmp_path, {(2, 2): 1200.5, (1, 4): "2024-12-31"})
+    # 单元格在行内按列顺序插入
+    row = re.search(r'<row r="2".*?</row>', sheet_xml(patched)).group(0)
+    assert re.findall(r'<c r="(\w+)"', row) == ["A2", "B2", "C2"]
+
+
+def test_new_rows(template, tmp_path):
+    patched = assert_same_as_openpyxl(template, tmp_path, {(4, 2): -3.25, (8, 2): 7.0, (5, 2): 0.5})
+    assert re.findall(r'<row r="(\d+)"', sheet_xml(patched)) == ["1", "2", "3", "4", "5", "8"]
+
+
+def test_widens_dimension(template, tmp_path):
+    patched = assert_same_as_openpyxl(template, tmp_path, {(12, 8): 1.0})
+    assert re.search(r'<dimension ref="([^"]+)"', sheet_xml(patched)).group(1) == "A1:H12"
+
+
+def test_number_format_adds_xf(template, tmp_path):
+    cells = {(2, 2): 1234.5, (4, 2): 1.0, (5, 2): 0.25}
+    formats = {(2, 2): pipeline.ACCOUNTING_FORMAT, (4, 2): "0.000", (5, 2): pipeline.ACCOUNTING_FORMAT}
+    patched = assert_same_as_openpyxl(template, tmp_path, cells, formats)
+    with zipfile.ZipFile(template) as z:
+        before = z.read("xl/styles.xml").decode("utf-8")
+    with zipfile.ZipFile(patched) as z:
+        after = z.read("xl/styles.xml").decode("utf-8")
+    count = lambda xml: int(re.search(r'<cellXfs count="(\d+)"', xml).group(1))  # noqa: E731
+    assert count(after) > count(before)
+    assert 'formatCode="0.000"' in after
+
+
+def test_overwriting_formula_drops_calc_chain(template, tmp_path):
+    rewrite_parts(template, {
+        "xl/calcChain.xml": CALC_CHAIN,
+        "xl/_rels/workbook.xml.rels": lambda xml: xml.replace(
+            "</Relationships>",
+            '<Relationship Id="rIdCalc" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+            'calcChain" Target="calcChain.xml"/></Relationships>'),
+        "[Content_Types].xml": lambda xml: xml.replace(
+            "</Types>",
+            '<Override PartName="/xl/calcChain.xml" ContentType="application/vnd.openxmlformats-officedocument.'
+            'spreadsheetml.calcChain+xml"/></Types>'),
+    })
+    # 不覆盖公式时计算链保留
+    kept = tmp_path / "kept.xlsx"
+    patch_workbook(template, kept, "Sheet1", {(2, 2): 1.0})
+    assert "xl/calcChain.xml" in zipfile.ZipFile(kept).namelist()
+
+    patched = assert_same_as_openpyxl(template, tmp_path, {(3, 3): 10.0})
+    with zipfile.ZipFile(patched) as z:
+        assert "xl/calcChain.xml" not in z.namelist()
+        assert "calcChain" not in z.read("xl/_rels/workbook.xml.rels").decode("utf-8")
+        assert "calcChain" not in z.read("[Content_Types].xml").decode("utf-8")
+
+
+def test_shared_formula_master_falls_back(template, tmp_path):
+    rewrite_parts(template, {"xl/worksheets/sheet1.xml": lambda xml: xml.replace(
+        "<f>B3*2</f>", '<f t="shared" ref="C3:C4" si="0">B3*2</f>')})
+    output = tmp_path / "out.xlsx"
+    with pytest.raises(PatchUnsupported):
+        patch_workbook(template, output, "Sheet1", {(3, 3): 1.0})
+    # 不留下写了一半的输出
+    assert not output.exists()
+
+    # 流程中自动回退到 openpyxl，结果与 openpyxl 写入一致
+    data = {"营业成本": 8.0}
+    pipeline.write_years({"2024": data}, str(template), str(output), writer="patch",
+                         year_columns={"2024": "C"}, item_column="A")
+    expected = tmp_path / "expected.xlsx"
+    pipeline.write_years({"2024": data}, str(template), str(expected), writer="openpyxl",
+                         year_columns={"2024": "C"}, item_column="A")
+    assert sheet_values(output) == sheet_values(expected)
+    assert openpyxl.load_workbook(output)["Sheet1"]["C3"].value == 8.0
+
+
+def with_cached_results(template, calc_pr='<calcPr calcId="191029"/>'):
+    """模拟 Excel 保存的模板：公式带有计算结果，打开时不强制重新计算"""
+    rewrite_parts(template, {
+        "xl/worksheets/sheet1.xml": lambda xml: xml.replace("<f>B3*2</f><v />", "<f>B3*2</f><v>10</v>"),
+        "xl/worksheets/sheet2.xml": lambda xml: xml.replace("<f>Sheet1!B3+1</f><v />",
+                                                            '<f>Sheet1!B3+1</f><v>6</v>'),
+        "xl/workbook.xml": lambda xml: re.sub(r"<calcPr\b[^>]*/>", calc_pr, xml),
+    })
+
+
+@pytest.mark.parametrize("calc_pr", ['<calcPr calcId="191029"/>', ""])
+def test_drops_stale_formula_results(template, tmp_path, calc_pr):
+    book = openpyxl.load_workbook(template)
+    book["Sheet2"]["A2"] = "=Sheet1!B3+1"
+    book.save(template)
+    with_cached_results(template, calc_pr)
+    cached = openpyxl.load_workbook(template, data_only=True)
+    assert (cached["Sheet1"]["C3"].value, cached["Sheet2"]["A2"].value) == (10, 6)
+
+    patched = assert_same_as_openpyxl(template, tmp_path, {(3, 2): 700.0})
+    # 依赖写入单元格的公式不再带有模板中的旧结果，与 openpyxl 写入一致
+    values = openpyxl.load_workbook(patched, data_only=True)
+    assert values["Sheet1"]["C3"].value is None
+    assert values["Sheet2"]["A2"].value is None
+    assert openpyxl.load_workbook(patched)["Sheet1"]["C3"].value == "=B3*2"
+    with zipfile.ZipFile(patched) as z:
+        calc = re.findall(r"<calcPr\b[^>]*>", z.read("xl/workbook.xml").decode("utf-8"))
+    assert len(calc) == 1 and 'fullCalcOnLoad="1"' in calc[0]
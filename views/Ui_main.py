@@ -3,7 +3,7 @@
 ################################################################################
 ## Form generated from reading UI file 'main.ui'
 ##
-## Created by: Qt User Interface Compiler version 6.9.2
+## Created by: Qt User Interface Compiler version 6.12.0
 ##
 ## WARNING! All changes made in this file will be lost when recompiling UI file!
 ################################################################################
@@ -15,16 +15,17 @@ from PySide6.QtGui import (QBrush, QColor, QConicalGradient, QCursor,
     QFont, QFontDatabase, QGradient, QIcon,
     QImage, QKeySequence, QLinearGradient, QPainter,
     QPalette, QPixmap, QRadialGradient, QTransform)
-from PySide6.QtWidgets import (QApplication, QHBoxLayout, QSizePolicy, QVBoxLayout,
-    QWidget)
+from PySide6.QtWidgets import (QApplication, QHBoxLayout, QHeaderView, QSizePolicy,
+    QTableView, QVBoxLayout, QWidget)
 
-from qfluentwidgets import (ComboBox, LineEdit, PrimaryPushButton, PushButton)
+from qfluentwidgets import (CaptionLabel, ComboBox, LineEdit, PrimaryPushButton,
+    ProgressBar, PushButton, SearchLineEdit)
 
 class Ui_MainForm(object):
     def setupUi(self, MainForm):
         if not MainForm.objectName():
             MainForm.setObjectName(u"MainForm")
-        MainForm.resize(377, 384)
+        MainForm.resize(720, 640)
         self.verticalLayout = QVBoxLayout(MainForm)
         self.verticalLayout.setObjectName(u"verticalLayout")
         self.horizontalLayout = QHBoxLayout()
@@ -102,6 +103,48 @@ class Ui_MainForm(object):
 
         self.verticalLayout.addLayout(self.horizontalLayout_5)
 
+        self.horizontalLayout_6 = QHBoxLayout()
+        self.horizontalLayout_6.setObjectName(u"horizontalLayout_6")
+        self.progressBar = ProgressBar(MainForm)
+        self.progressBar.setObjectName(u"progressBar")
+        self.progressBar.setValue(0)
+
+        self.horizontalLayout_6.addWidget(self.progressBar)
+
+        self.cancelButton = PushButton(MainForm)
+        self.cancelButton.setObjectName(u"cancelButton")
+        self.cancelButton.setEnabled(False)
+
+        self.horizontalLayout_6.addWidget(self.cancelButton)
+
+
+        self.verticalLayout.addLayout(self.horizontalLayout_6)
+
+        self.statusLabel = CaptionLabel(MainForm)
+        self.statusLabel.setObjectName(u"statusLabel")
+
+        self.verticalLayout.addWidget(self.statusLabel)
+
+        self.horizontalLayout_7 = QHBoxLayout()
+        self.horizontalLayout_7.setObjectName(u"horizontalLayout_7")
+        self.searchEdit = SearchLineEdit(MainForm)
+        self.searchEdit.setObjectName(u"searchEdit")
+
+        self.horizontalLayout_7.addWidget(self.searchEdit)
+
+        self.filterBox = ComboBox(MainForm)
+        self.filterBox.setObjectName(u"filterBox")
+
+        self.horizontalLayout_7.addWidget(self.filterBox)
+
+
+        self.verticalLayout.addLayout(self.horizontalLayout_7)
+
+        self.previewTable = QTableView(MainForm)
+        self.previewTable.setObjectName(u"previewTable")
+
+        self.verticalLayout.addWidget(self.previewTable)
+
 
         self.retranslateUi(MainForm)
 
@@ -121,5 +164,8 @@ class Ui_MainForm(object):
         self.lineEdit_4.setPlaceholderText(QCoreApplication.translate("MainForm", u"\u53ef\u9009", None))
         self.comboBox.setPlaceholderText(QCoreApplication.translate("MainForm", u"\u8bf7\u9009\u62e9\u5e74\u4efd", None))
         self.startButton.setText(QCoreApplication.translate("MainForm", u"\u5f00\u59cb\u751f\u6210", None))
+        self.cancelButton.setText(QCoreApplication.translate("MainForm", u"\u53d6\u6d88", None))
+        self.statusLabel.setText("")
+        self.searchEdit.setPlaceholderText(QCoreApplication.translate("MainForm", u"\u641c\u7d22\u9879\u76ee / \u6a21\u677f\u9879\u76ee", None))
     # retranslateUi
 
@@ -0,0 +1,177 @@
+"""
+后台生成任务：在线程池中执行 读取 -> 解析 -> 写入 -> 保存，避免阻塞界面
+GenerateWorker 只提供信号与取消，界面使用 SessionWorker（单个模板）、FanoutWorker（模板清单）
+与 ServiceWorker（提交给本地生成服务）
+
+core.pipeline 依赖 pandas / openpyxl，只在任务运行时导入，不拖慢窗口启动
+"""
+
+import threading
+
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+
+class WorkerSignals(QObject):
+    progress = Signal(str, str)   # 阶段, 说明（如报表类型）
+    succeeded = Signal(str, object) # 输出文件路径, RunMetrics
+    failed = Signal(str)          # 错误信息
+    cancelled = Signal()
+    preview = Signal(object)      # 匹配明细 DataFrame（见 core.preview），保存之前发出
+
+
+class GenerateWorker(QRunnable):
+    """
+    后台任务的公共部分：信号与取消；run 由子类 SessionWorker / FanoutWorker / ServiceWorker 实现
+    """
+
+    def __init__(self, metrics_log=None, **kwargs):
+        """
+        kwargs 由子类使用（如 FanoutWorker 透传给 fanout.generate_targets）
+        metrics_log: 设置后每次成功生成都将分阶段指标以 JSON 行追加到该文件
+        """
+        super().__init__()
+        self.kwargs = kwargs
+        self.metrics_log = metrics_log
+        self.signals = WorkerSignals()
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _progress(self, stage, detail):
+        """传给 core 的进度回调：已请求取消时抛出 GenerationCancelled，在阶段之间中止"""
+        if self._cancel.is_set():
+            from core.pipeline import GenerationCancelled
+            raise GenerationCancelled()
+        self.signals.progress.emit(stage, detail)
+
+
+class SessionWorker(GenerateWorker):
+    """
+    基于 WorkbookSession 的生成：模板只在首次（或内容变化时）加载，之后只重算变化的单元格
+    session: 上一次的会话，None 或模板/参数不同时新建，完成后通过 self.session 取回
+    output_path: 为 None 时只更新内存中的工作簿，不保存
+    """
+
+    def __init__(self, session=None, template_path="", year=None, sources=None, output_path=None,
+                 year_columns=None, aliases=None, use_cache=True, formulas=False, metrics_log=None):
+        super().__init__(metrics_log=metrics_log)
+        self.session = session
+        self.template_path = template_path
+        self.year = year
+        self.sources = sources
+        self.output_path = output_path
+        self.session_args = {"year_columns": year_columns, "aliases": aliases, "use_cache": use_cache,
+                             "formulas": formulas}
+
+    def _session(self):
+        from core.session import WorkbookSession
+
+        session = self.session
+        if (session is None or session.template_path != self.template_path
+                or session.args != self.session_args):
+            session = WorkbookSession(self.template_path, **self.session_args)
+        return session
+
+    def run(self):
+        from core import pipeline
+        from core.metrics import RunMetrics
+
+        metrics = RunMetrics(label=self.output_path or self.template_path)
+        try:
+            try:
+                session = self._session()
+                self.session = session
+                if self.sources is not None:
+                    # 界面一次只填一个年份，切换年份时撤销之前年份写入的列
+                    for year in session.years:
+                        if year != str(self.year):
+                            session.remove_year(year)
+                    session.update(self.year, *self.sources, progress=self._progress, metrics=metrics)
+                    # 在后台线程中算好匹配明细，界面只按需显示可见的行
+                    self.signals.preview.emit(session.preview(self.year))
+                if self.output_path:
+                    session.save(self.output_path, progress=self._progress, metrics=metrics)
+            finally:
+                # 失败或取消时同样结束计时
+                metrics.finish()
+            if self.metrics_log:
+                metrics.append_jsonl(self.metrics_log)
+        except pipeline.GenerationCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.succeeded.emit(self.output_path or "", metrics)
+
+
+class FanoutWorker(GenerateWorker):
+    """报表只读取一次，填入模板清单中的所有模板；kwargs 透传给 fanout.generate_targets"""
+
+    def __init__(self, targets_path, metrics_log=None, **kwargs):
+        super().__init__(metrics_log=metrics_log, **kwargs)
+        self.targets_path = targets_path
+
+    def run(self):
+        from core import pipeline
+        from core.fanout import generate_targets, load_targets
+        from core.metrics import RunMetrics
+
+        metrics = RunMetrics(label=self.targets_path)
+        try:
+            try:
+                outputs = generate_targets(load_targets(self.targets_path), **self.kwargs,
+                                           progress=self._progress, metrics=metrics)
+            finally:
+                # 失败或取消时同样结束计时
+                metrics.finish()
+            if self.metrics_log:
+                metrics.append_jsonl(self.metrics_log)
+        except pipeline.GenerationCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.succeeded.emit("\n".join(outputs), metrics)
+
+
+class ServiceWorker(GenerateWorker):
+    """
+    瘦客户端：把任务提交给本地生成服务（python cli.py serve），等待完成后下载结果
+    解析与写入都在服务进程中进行，界面进程不导入 pandas / openpyxl
+    取消只是停止等待，服务端的任务会继续执行，结果可被相同的任务复用
+    """
+
+    def __init__(self, url, request, output_path, metrics_log=None):
+        super().__init__(metrics_log=metrics_log)
+        self.url = url
+        self.request = request
+        self.output_path = output_path
+
+    def _on_status(self, status):
+        # 结束状态由下面的下载 / 报错处理
+        if status in ("queued", "running"):
+            self.signals.progress.emit(status, "")
+
+    def run(self):
+        from core.client import ServiceClient
+        from core.metrics import RunMetrics, append_jsonl
+
+        client = ServiceClient(self.url)
+        try:
+            job = client.submit(**self.request)
+            info = client.wait(job["id"], on_status=self._on_status, cancelled=self._cancel.is_set)
+            if self._cancel.is_set():
+                self.signals.cancelled.emit()
+                return
+            if info["status"] == "failed":
+                raise RuntimeError(info.get("error") or "生成失败")
+            self.signals.progress.emit("saving", "")
+            client.download(job["id"], self.output_path)
+            metrics = RunMetrics.from_dict(info.get("metrics") or {})
+            if self.metrics_log and info.get("metrics"):
+                append_jsonl(self.metrics_log, info["metrics"])
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.succeeded.emit(self.output_path, metrics)
@@ -0,0 +1,101 @@
+"""
+预览表格模型：只保存匹配明细表（core.preview.match_table）与当前筛选出的行号，
+视图滚动时按需取值，十万行的报表也只格式化可见的几十行；筛选、排序只改变行号，不复制表格
+
+numpy / pandas 在首次设置数据时才导入，不拖慢窗口启动
+"""
+
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PySide6.QtGui import QColor
+
+from core.preview import PREVIEW_COLUMNS, TEMPLATE_UNMATCHED, UNUSED
+
+AMOUNT_COLUMN = PREVIEW_COLUMNS.index("金额")
+STATUS_COLUMN = PREVIEW_COLUMNS.index("状态")
+# 未使用的源数据、未匹配的模板项目用醒目的颜色标出
+STATUS_COLORS = {UNUSED: QColor(200, 120, 0), TEMPLATE_UNMATCHED: QColor(210, 50, 50)}
+
+
+class PreviewModel(QAbstractTableModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.table = None
+        # 各列的 numpy 数组（DataFrame 列的视图）
+        self._columns = []
+        # 当前显示的行在 table 中的行号
+        self._rows = None
+        self.text = ""
+        self.status = None
+        # (列, 是否降序)
+        self._sort = None
+
+    def set_table(self, table):
+        self.beginResetModel()
+        self.table = table
+        self._columns = [table[c].to_numpy() for c in PREVIEW_COLUMNS]
+        self._rows = self._select()
+        self.endResetModel()
+
+    def set_filter(self, text="", status=None):
+        """text: 项目或模板项目中包含的关键字；status: 只显示该状态的行，None 为全部"""
+        self.text, self.status = text, status
+        if self.table is None:
+            return
+        self.beginResetModel()
+        self._rows = self._select()
+        self.endResetModel()
+
+    def _select(self):
+        from core.preview import search_mask
+
+        rows = search_mask(self.table, self.text, self.status)
+        return self._sorted(rows) if self._sort else rows
+
+    def _sorted(self, rows):
+        import pandas as pd
+
+        column, descending = self._sort
+        keys = pd.Series(self._columns[column][rows])
+        # 稳定排序，空值始终在最后
+        order = keys.sort_values(ascending=not descending, kind="stable", na_position="last").index.to_numpy()
+        return rows[order]
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        if self.table is None:
+            return
+        self.layoutAboutToBeChanged.emit()
+        self._sort = (column, order == Qt.SortOrder.DescendingOrder)
+        self._rows = self._sorted(self._rows)
+        self.layoutChanged.emit()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() or self._rows is None else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(PREVIEW_COLUMNS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or self._rows is None:
+            return None
+        row, col = self._rows[index.row()], index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            value = self._columns[col][row]
+            if col == AMOUNT_COLUMN:
+                return "" if value != value else f"{value:,.2f}"
+            return str(value)
+        if role == Qt.ItemDataRole.TextAlignmentRole and col == AMOUNT_COLUMN:
+            return Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+        if role == Qt.ItemDataRole.ForegroundRole:
+            return STATUS_COLORS.get(self._columns[STATUS_COLUMN][row])
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return PREVIEW_COLUMNS[section]
+        return None
+
+    def counts(self) -> dict:
+        """各状态的行数"""
+        if self.table is None or self.table.empty:
+            return {}
+        return self.table["状态"].value_counts().to_dict()